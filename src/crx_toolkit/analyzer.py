@@ -0,0 +1,163 @@
+import os
+import json
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from .crx_reader import CrxReader
+from .metadata import archive_extension_id
+from .api_scanner import scan, permission_report
+
+# 作为归档处理的文件扩展名
+ARCHIVE_SUFFIXES = ('.crx', '.zip')
+
+
+def find_targets(paths: Iterable[str]) -> List[str]:
+    """将参数展开为待分析的扩展列表
+
+    包含 manifest.json 的目录视为已解压的扩展，其他目录递归查找 *.crx 和 *.zip。
+    """
+    targets = []
+    for path in paths:
+        if os.path.isdir(path):
+            if os.path.isfile(os.path.join(path, 'manifest.json')):
+                targets.append(path)
+                continue
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.lower().endswith(ARCHIVE_SUFFIXES):
+                        targets.append(os.path.join(root, name))
+        else:
+            targets.append(path)
+    return targets
+
+
+def manifest_apis(manifest: Dict[str, Any]) -> List[str]:
+    """manifest 中声明的权限（permissions 和 optional_permissions）"""
+    apis = set()
+    for field in ('permissions', 'optional_permissions'):
+        values = manifest.get(field)
+        if isinstance(values, list):
+            apis.update(value for value in values if isinstance(value, str))
+    return sorted(apis)
+
+
+def _load_manifest(data: bytes) -> Dict[str, Any]:
+    manifest = json.loads(data.decode('utf-8-sig'))
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _fill_manifest(result: Dict[str, Any], manifest: Dict[str, Any]) -> None:
+    result['name'] = manifest.get('name')
+    result['version'] = manifest.get('version')
+    result['declared'] = manifest_apis(manifest)
+
+
+def _scan_archive(
+    path: str,
+    result: Dict[str, Any],
+    counts: Counter,
+    permissions: Dict[str, Tuple[str, ...]]
+) -> None:
+    with CrxReader(path) as reader, reader.open_zip() as zf:
+        try:
+            manifest = _load_manifest(zf.read('manifest.json'))
+        except KeyError:
+            manifest = {}
+        _fill_manifest(result, manifest)
+        result['extension_id'] = archive_extension_id(reader, manifest)
+        for info in zf.infolist():
+            if info.is_dir() or not info.filename.lower().endswith('.js'):
+                continue
+            data = zf.read(info)
+            result['js_files'] += 1
+            result['js_bytes'] += len(data)
+            scan(data, counts, permissions)
+
+
+def _scan_directory(
+    directory: str,
+    result: Dict[str, Any],
+    counts: Counter,
+    permissions: Dict[str, Tuple[str, ...]]
+) -> None:
+    with open(os.path.join(directory, 'manifest.json'), 'rb') as f:
+        _fill_manifest(result, _load_manifest(f.read()))
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            if not name.lower().endswith('.js'):
+                continue
+            with open(os.path.join(root, name), 'rb') as f:
+                data = f.read()
+            result['js_files'] += 1
+            result['js_bytes'] += len(data)
+            scan(data, counts, permissions)
+
+
+def analyze_extension(path: str) -> Dict[str, Any]:
+    """分析单个扩展使用的 Chrome API
+
+    CRX/ZIP 文件直接从归档中读取 JS 成员，不需要先解压。API 调用由
+    api_scanner 单次扫描识别（含 browser.*、方括号访问和可选链），并与
+    manifest 声明的权限对比。
+
+    Args:
+        path: CRX/ZIP 文件或已解压的扩展目录
+
+    Returns:
+        dict: path、extension_id、name、version、declared（manifest 声明的权限）、
+        apis（API -> 出现次数）、permissions（required、unused、undeclared，
+        见 permission_report）、js_files、js_bytes、seconds、error
+    """
+    start = time.perf_counter()
+    result = {
+        'path': path,
+        'extension_id': None,
+        'name': None,
+        'version': None,
+        'declared': [],
+        'apis': {},
+        'permissions': None,
+        'js_files': 0,
+        'js_bytes': 0,
+        'seconds': 0.0,
+        'error': None,
+    }
+    counts: Counter = Counter()
+    permissions: Dict[str, Tuple[str, ...]] = {}
+    try:
+        if os.path.isdir(path):
+            _scan_directory(path, result, counts, permissions)
+        else:
+            _scan_archive(path, result, counts, permissions)
+    except Exception as e:
+        result['error'] = str(e)
+    result['apis'] = dict(sorted(counts.items()))
+    result['permissions'] = permission_report(result['declared'], permissions)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def analyze_many(paths: Iterable[str], jobs: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """在进程池中并行分析多个扩展，按输入顺序逐个产出结果
+
+    Args:
+        paths: CRX/ZIP 文件、扩展目录或包含它们的目录
+        jobs: 工作进程数，默认等于 CPU 核心数
+
+    Yields:
+        dict: 每个扩展的 analyze_extension 结果
+    """
+    targets = find_targets(paths)
+    if not targets:
+        return
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(targets)))
+    if jobs == 1:
+        for target in targets:
+            yield analyze_extension(target)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, min(16, len(targets) // (jobs * 4)))
+        yield from executor.map(analyze_extension, targets, chunksize=chunksize)
@@ -0,0 +1,286 @@
+import re
+from functools import lru_cache
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Chrome 扩展 API 命名空间 -> 所需权限，None 表示不需要权限
+API_PERMISSIONS: Dict[str, Optional[str]] = {
+    'action': None,
+    'alarms': 'alarms',
+    'bookmarks': 'bookmarks',
+    'browserAction': None,
+    'browsingData': 'browsingData',
+    'certificateProvider': 'certificateProvider',
+    'commands': None,
+    'contentSettings': 'contentSettings',
+    'contextMenus': 'contextMenus',
+    'cookies': 'cookies',
+    'debugger': 'debugger',
+    'declarativeContent': 'declarativeContent',
+    'declarativeNetRequest': 'declarativeNetRequest',
+    'declarativeWebRequest': 'declarativeWebRequest',
+    'desktopCapture': 'desktopCapture',
+    'devtools.inspectedWindow': None,
+    'devtools.network': None,
+    'devtools.panels': None,
+    'devtools.performance': None,
+    'devtools.recorder': None,
+    'documentScan': 'documentScan',
+    'dom': None,
+    'downloads': 'downloads',
+    'enterprise.deviceAttributes': 'enterprise.deviceAttributes',
+    'enterprise.hardwarePlatform': 'enterprise.hardwarePlatform',
+    'enterprise.networkingAttributes': 'enterprise.networkingAttributes',
+    'enterprise.platformKeys': 'enterprise.platformKeys',
+    'events': None,
+    'extension': None,
+    'extensionTypes': None,
+    'fileBrowserHandler': 'fileBrowserHandler',
+    'fileSystemProvider': 'fileSystemProvider',
+    'fontSettings': 'fontSettings',
+    'gcm': 'gcm',
+    'history': 'history',
+    'i18n': None,
+    'identity': 'identity',
+    'idle': 'idle',
+    'input.ime': 'input',
+    'instanceID': 'gcm',
+    'loginState': 'loginState',
+    'management': 'management',
+    'notifications': 'notifications',
+    'offscreen': 'offscreen',
+    'omnibox': None,
+    'pageAction': None,
+    'pageCapture': 'pageCapture',
+    'permissions': None,
+    'platformKeys': 'platformKeys',
+    'power': 'power',
+    'printerProvider': 'printerProvider',
+    'printing': 'printing',
+    'printingMetrics': 'printingMetrics',
+    'privacy': 'privacy',
+    'processes': 'processes',
+    'proxy': 'proxy',
+    'readingList': 'readingList',
+    'runtime': None,
+    'scripting': 'scripting',
+    'search': 'search',
+    'sessions': 'sessions',
+    'sidePanel': 'sidePanel',
+    'storage': 'storage',
+    'system.cpu': 'system.cpu',
+    'system.display': 'system.display',
+    'system.memory': 'system.memory',
+    'system.storage': 'system.storage',
+    'tabCapture': 'tabCapture',
+    'tabGroups': 'tabGroups',
+    'tabs': 'tabs',
+    'topSites': 'topSites',
+    'tts': 'tts',
+    'ttsEngine': 'ttsEngine',
+    'types': None,
+    'userScripts': 'userScripts',
+    'vpnProvider': 'vpnProvider',
+    'wallpaper': 'wallpaper',
+    'webNavigation': 'webNavigation',
+    'webRequest': 'webRequest',
+    'windows': None,
+}
+
+# 需要额外权限的方法
+METHOD_PERMISSIONS: Dict[str, str] = {
+    'downloads.open': 'downloads.open',
+    'downloads.setShelfEnabled': 'downloads.shelf',
+    'downloads.setUiOptions': 'downloads.ui',
+    'runtime.connectNative': 'nativeMessaging',
+    'runtime.sendNativeMessage': 'nativeMessaging',
+}
+
+# 不声明权限也能调用、权限只解锁部分字段的 API，不报告为未声明
+OPTIONAL_PERMISSION_APIS = {'tabs'}
+
+# 能满足其他权限要求的权限
+PERMISSION_ALIASES = {
+    'declarativeNetRequestWithHostAccess': 'declarativeNetRequest',
+}
+
+_IDENT = rb'[A-Za-z_$][\w$]*'
+
+# 之后出现的 / 开始正则字面量而不是除号的关键字
+_REGEX_KEYWORDS = (
+    b'return', b'typeof', b'case', b'void', b'in', b'of', b'delete', b'throw', b'yield', b'await',
+    b'instanceof', b'new', b'else', b'do',
+)
+
+# 注释、字符串和正则表达式字面量，其中的 API 名称不是调用。正则字面量只在
+# ( , = : [ ! & | ? { } ; 和 _REGEX_KEYWORDS 之后识别，与除号区分。关键字前
+# 先用首字母的前瞻断言过滤，避免在每个位置都计算后顾断言
+_SKIP_CODE = (
+    rb'//[^\n]*'
+    rb'|/\*[\s\S]*?\*/'
+    rb'|"(?:[^"\\\n]|\\[\s\S])*"'
+    rb"|'(?:[^'\\\n]|\\[\s\S])*'"
+    rb'|(?:[(,=:\[!&|?{};}]|(?=[' + bytes(sorted({kw[0] for kw in _REGEX_KEYWORDS})) + rb'])(?<![\w$.])(?:'
+    + b'|'.join(_REGEX_KEYWORDS) + rb'))'
+    rb'\s*/(?![*/])(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/'
+)
+
+# 不含 ${} 的模板字符串整体跳过
+_SKIP = _SKIP_CODE + rb'|`(?:[^`\\]|\\[\s\S])*`'
+
+# 模板字符串的一段文本，到结束的反引号或 ${ 为止
+_TEMPLATE_TEXT = re.compile(rb'(?:[^`\\$]|\\[\s\S]|\$(?!\{))*(?:`|\$\{)?')
+
+# 访问下一段的方式：.name、?.name、["name"]、?.["name"]
+_DOT = rb'\s*\??\.\s*'
+_BRACKET = rb'\s*(?:\?\.)?\[\s*["\'`]%s["\'`]\s*\]'
+
+
+def _build_pattern() -> 're.Pattern':
+    """把整个 API 目录编译为一个正则，每个文件只需扫描一遍
+
+    根对象为 chrome 或 browser，第一段必须是目录中的顶层命名空间，之后可以
+    有任意多段。根对象的字面量放在最前面，由正则引擎快速定位候选位置，再用
+    后顾断言排除 mychrome 之类的标识符。
+    """
+    roots = sorted({key.split('.')[0] for key in API_PERMISSIONS}, key=lambda name: (-len(name), name))
+    namespace = rb'(?:' + b'|'.join(re.escape(name.encode('ascii')) for name in roots) + rb')(?![\w$])'
+    first = rb'(?:' + _DOT + namespace + rb'|' + _BRACKET % namespace + rb')'
+    rest = rb'(?:' + _DOT + _IDENT + rb'|' + _BRACKET % _IDENT + rb')'
+    root = rb'(?:chrome|browser)(?<![\w$]chrome)(?<![\w$]browser)'
+    return re.compile(root + first + rest + rb'*')
+
+
+API_PATTERN = _build_pattern()
+
+# 同一次扫描中先匹配注释和字面量并丢弃，只有代码中的调用进入第 1 组
+_SCAN_PATTERN = re.compile(_SKIP + rb'|(' + API_PATTERN.pattern + rb')')
+
+# 含 ${} 的源码逐个匹配：第 1 组为模板字符串开头，第 2 组为 API 调用，
+# 第 3 组为花括号，用来找到 ${} 表达式的结尾
+_TEMPLATE_SCAN_PATTERN = re.compile(_SKIP_CODE + rb'|(`)|(' + API_PATTERN.pattern + rb')|([{}])')
+
+_SEGMENT = re.compile(_IDENT)
+
+
+def resolve(segments: List[str]) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    """根据名称段（不含 chrome/browser）查找 API，返回 (API 名称, 所需权限)
+
+    命名空间按最长前缀匹配，API 名称为命名空间加一个成员，例如
+    storage.local.get 报告为 chrome.storage.local，devtools.inspectedWindow.eval
+    报告为 chrome.devtools.inspectedWindow.eval。只引用命名空间本身时（例如
+    const panels = chrome.devtools.panels）报告命名空间。不在目录中时返回None。
+    """
+    for depth in range(len(segments), 0, -1):
+        namespace = '.'.join(segments[:depth])
+        if namespace not in API_PERMISSIONS:
+            continue
+        member = namespace + '.' + segments[depth] if depth < len(segments) else namespace
+        permissions = []
+        if API_PERMISSIONS[namespace] is not None:
+            permissions.append(API_PERMISSIONS[namespace])
+        if member in METHOD_PERMISSIONS:
+            permissions.append(METHOD_PERMISSIONS[member])
+        return 'chrome.' + member, tuple(permissions)
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _resolve_match(text: bytes) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    segments = [name.decode('ascii') for name in _SEGMENT.findall(text)]
+    return resolve(segments[1:])
+
+
+def _template_text(data: bytes, pos: int, frames: List[int]) -> int:
+    """跳过从 pos 开始的模板字符串文本，遇到 ${ 时压入新的表达式，返回文本结束位置"""
+    match = _TEMPLATE_TEXT.match(data, pos)
+    if match.group(0).endswith(b'${'):
+        frames.append(0)
+    return match.end()
+
+
+def _find_calls(data: bytes) -> List[bytes]:
+    """找出代码中的 API 调用文本（可能含空字符串，调用方忽略）
+
+    没有 ${ 时模板字符串整体跳过，一次 findall 完成。否则逐个匹配，用栈
+    记录每个未结束的 ${} 表达式中打开的花括号数，表达式内按代码扫描，
+    表达式结束后回到模板文本。
+    """
+    if b'${' not in data:
+        return _SCAN_PATTERN.findall(data)
+    calls = []
+    frames: List[int] = []
+    pos = 0
+    while True:
+        match = _TEMPLATE_SCAN_PATTERN.search(data, pos)
+        if match is None:
+            return calls
+        pos = match.end()
+        if match.group(1):
+            pos = _template_text(data, pos, frames)
+        elif match.group(2):
+            calls.append(match.group(2))
+        elif frames:
+            # 花括号或以花括号开头的正则字面量
+            brace = match.group(0)[:1]
+            if brace == b'{':
+                frames[-1] += 1
+            elif brace == b'}':
+                if frames[-1]:
+                    frames[-1] -= 1
+                else:
+                    frames.pop()
+                    pos = _template_text(data, match.start() + 1, frames)
+
+
+def scan(data: bytes, counts: Counter, permissions: Optional[Dict[str, Tuple[str, ...]]] = None) -> None:
+    """单次扫描 JS 源码，统计 API 调用次数
+
+    browser.* 与 chrome.* 合并统计为 chrome.*。注释和字符串等字面量中的 API
+    名称不计入。先按匹配文本计数，相同的调用写法只解析一次。
+
+    Args:
+        data: JS 源码字节
+        counts: API 名称 -> 出现次数，原地累加
+        permissions: 提供时记录每个 API 所需的权限（API 名称 -> 权限元组）
+    """
+    for text, count in Counter(_find_calls(data)).items():
+        if not text:
+            continue
+        resolved = _resolve_match(text)
+        if resolved is None:
+            continue
+        api, required = resolved
+        counts[api] += count
+        if permissions is not None and required:
+            permissions[api] = required
+
+
+def permission_report(declared: Iterable[str], api_permissions: Dict[str, Tuple[str, ...]]) -> Dict[str, Any]:
+    """对比 manifest 声明的权限和使用的 API
+
+    Args:
+        declared: manifest 中声明的权限（含可选权限）
+        api_permissions: scan() 记录的 API 名称 -> 所需权限
+
+    Returns:
+        dict: required（使用的 API 需要的权限）、unused（声明了但没有 API 使用的 API 权限，
+        activeTab 等与具体 API 无关的权限不在此列）、undeclared（权限 -> 使用了该权限
+        却未声明的 API 列表）
+    """
+    declared = set(declared)
+    satisfied = declared | {PERMISSION_ALIASES[p] for p in declared if p in PERMISSION_ALIASES}
+    required = {p for permissions in api_permissions.values() for p in permissions}
+    known = {p for p in API_PERMISSIONS.values() if p is not None} | set(METHOD_PERMISSIONS.values())
+    unused = sorted(
+        p for p in declared
+        if PERMISSION_ALIASES.get(p, p) in known and PERMISSION_ALIASES.get(p, p) not in required
+    )
+    undeclared: Dict[str, List[str]] = {}
+    for api, permissions in sorted(api_permissions.items()):
+        if api.split('.')[1] in OPTIONAL_PERMISSION_APIS:
+            continue
+        for permission in permissions:
+            if permission not in satisfied:
+                undeclared.setdefault(permission, []).append(api)
+    return {'required': sorted(required), 'unused': unused, 'undeclared': undeclared}
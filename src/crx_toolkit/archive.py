@@ -0,0 +1,388 @@
+import io
+import os
+import time
+import shutil
+import struct
+import logging
+import tempfile
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, Optional, Tuple
+from .compression import CompressionPolicy, CompressionReport
+
+# 流式复制时的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 并行压缩时单个条目在内存中缓冲的上限，超过后落盘
+SPOOL_SIZE = 8 * 1024 * 1024
+
+
+class StreamWriter(io.RawIOBase):
+    """只追加写入的归档输出流
+
+    对 zipfile 表现为不可 seek 的流，zipfile 会为每个条目写入数据描述符
+    而不是回写本地文件头，因此所有字节严格按顺序写出一次。写出的字节可以
+    同时送入一个增量哈希对象，用于在压缩的同时计算签名摘要。
+
+    Args:
+        fp: 底层输出文件对象
+        hasher: 可选的增量哈希对象（需提供 update 方法）
+    """
+
+    def __init__(self, fp: BinaryIO, hasher=None):
+        super().__init__()
+        self._fp = fp
+        self._hasher = hasher
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        raise io.UnsupportedOperation("StreamWriter 不支持 seek")
+
+    def tell(self) -> int:
+        return self._pos
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._fp.write(data)
+        if self._hasher is not None:
+            self._hasher.update(data)
+        self._pos += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        self._fp.flush()
+
+    def close(self) -> None:
+        # 不关闭底层文件，调用方还需要回写 CRX 头部
+        super().close()
+
+
+def file_crc32(file_path: str) -> int:
+    """计算文件的 CRC-32"""
+    crc = 0
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xffffffff
+
+
+def deflate_flag_bits(level: Optional[int]) -> int:
+    """按 APPNOTE 4.4.4 将 DEFLATE 级别编码为通用标志位的压缩选项
+
+    与 Info-ZIP 相同：1 为超快，2 为快速，8、9 为最大，其余（含默认级别）为普通。
+    """
+    if level is None or level < 0:
+        return 0
+    if level == 1:
+        return 0x06
+    if level == 2:
+        return 0x04
+    if level >= 8:
+        return 0x02
+    return 0
+
+
+# 记录 DEFLATE 精确级别的私有扩展字段（APPNOTE 4.5.2，ID 不与已登记的字段冲突），
+# 数据为 1 字节的级别。标志位只能区分四类级别，增量打包以此字段判断级别是否变化
+LEVEL_EXTRA_ID = 0x4c56
+
+
+def _effective_level(level: Optional[int]) -> int:
+    """zlib 默认级别（None 或 -1）实际为 6"""
+    return 6 if level is None or level < 0 else level
+
+
+def level_extra(level: Optional[int]) -> bytes:
+    """生成记录 DEFLATE 级别的扩展字段"""
+    return struct.pack('<HHB', LEVEL_EXTRA_ID, 1, _effective_level(level))
+
+
+def recorded_level(extra: bytes) -> Optional[int]:
+    """从扩展字段中读取 level_extra 记录的级别，没有记录时返回None"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, size = struct.unpack_from('<HH', extra, pos)
+        if header_id == LEVEL_EXTRA_ID and size == 1 and pos + 5 <= len(extra):
+            return extra[pos + 4]
+        pos += 4 + size
+    return None
+
+
+class PreviousArchive:
+    """上一次打包产物的只读索引，用于原样复用未变化的压缩条目
+
+    CRX 文件可以直接打开，zipfile 会根据中央目录自动修正前置头部的偏移。
+
+    Args:
+        path: 上一次生成的 CRX 或 ZIP 文件路径
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with zipfile.ZipFile(path, 'r') as zf:
+            self.entries: Dict[str, zipfile.ZipInfo] = {info.filename: info for info in zf.infolist()}
+        self._fp = open(path, 'rb')
+
+    def match(
+        self,
+        arc_name: str,
+        file_path: str,
+        compression: int,
+        level: Optional[int] = None
+    ) -> Optional[zipfile.ZipInfo]:
+        """返回可复用的旧条目
+
+        压缩方式和 DEFLATE 级别（扩展字段记录的精确级别，没有记录的旧条目不复用）
+        相同、大小和 CRC-32 都一致时视为未变化。DOS 时间戳只有 2 秒精度，不能用来判断内容是否变化，因此总是
+        计算 CRC-32；只读取文件而不压缩，仍比重新压缩快得多。
+        """
+        info = self.entries.get(arc_name)
+        if info is None or info.compress_type != compression or info.flag_bits & 0x1:
+            return None
+        if compression == zipfile.ZIP_DEFLATED and recorded_level(info.extra) != _effective_level(level):
+            return None
+        if info.file_size != os.path.getsize(file_path):
+            return None
+        if info.CRC != file_crc32(file_path):
+            return None
+        return info
+
+    def copy_raw(self, info: zipfile.ZipInfo, out: BinaryIO) -> None:
+        """将旧条目的压缩数据原样复制到 out"""
+        self._fp.seek(info.header_offset)
+        header = self._fp.read(zipfile.sizeFileHeader)
+        if len(header) != zipfile.sizeFileHeader or header[0:4] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"本地文件头损坏: {info.filename}")
+        name_len, extra_len = struct.unpack('<HH', header[26:30])
+        self._fp.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+        remaining = info.compress_size
+        while remaining > 0:
+            chunk = self._fp.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"压缩数据不完整: {info.filename}")
+            out.write(chunk)
+            remaining -= len(chunk)
+
+    def close(self) -> None:
+        self._fp.close()
+
+    def __enter__(self) -> 'PreviousArchive':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def _append_entry(zf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, copy_data: Callable[[BinaryIO], None]) -> None:
+    """写入已压缩好的条目，zinfo 中的 CRC 和大小必须已知"""
+    # 大小和 CRC 已知，本地文件头直接写入真实值，无需数据描述符
+    zinfo.flag_bits &= ~0x08
+    zinfo.header_offset = zf.fp.tell()
+    zf.fp.write(zinfo.FileHeader())
+    copy_data(zf.fp)
+    # zipfile 没有公开的原始写入接口，这里按 _ZipWriteFile.close 的方式登记条目
+    zf.start_dir = zf.fp.tell()
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+    zf._didModify = True
+
+
+def _write_raw_entry(
+    zf: zipfile.ZipFile,
+    previous: PreviousArchive,
+    old: zipfile.ZipInfo,
+    arc_name: str,
+    file_path: str
+) -> None:
+    """把旧条目的压缩数据作为新条目写入 zf，不做解压和重新压缩"""
+    zinfo = zipfile.ZipInfo.from_file(file_path, arc_name)
+    zinfo.compress_type = old.compress_type
+    zinfo.CRC = old.CRC
+    zinfo.file_size = old.file_size
+    zinfo.compress_size = old.compress_size
+    zinfo.flag_bits = old.flag_bits
+    level = recorded_level(old.extra)
+    if level is not None:
+        zinfo.extra = level_extra(level)
+    _append_entry(zf, zinfo, lambda out: previous.copy_raw(old, out))
+
+
+def compress_file(
+    file_path: str,
+    arc_name: str,
+    compression: int = zipfile.ZIP_DEFLATED,
+    level: Optional[int] = None
+) -> Tuple[zipfile.ZipInfo, BinaryIO]:
+    """在内存（较大时落盘）中压缩单个文件，可在线程池中并行执行
+
+    zlib 在压缩时会释放 GIL，因此多个线程可以同时占用多个核心。
+
+    Args:
+        file_path: 源文件路径
+        arc_name: 归档内路径
+        compression: 压缩方式，仅支持 ZIP_STORED 和 ZIP_DEFLATED
+        level: DEFLATE 级别，为None时使用 zlib 默认级别
+
+    Returns:
+        Tuple[ZipInfo, BinaryIO]: 填好 CRC 和大小的条目信息，以及定位到开头的压缩数据
+    """
+    zinfo = zipfile.ZipInfo.from_file(file_path, arc_name)
+    zinfo.compress_type = compression
+    buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    compressor = None
+    if compression == zipfile.ZIP_DEFLATED:
+        zinfo.flag_bits |= deflate_flag_bits(level)
+        zinfo.extra = level_extra(level)
+        compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, -15
+        )
+    crc = 0
+    size = 0
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            buf.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        buf.write(compressor.flush())
+    zinfo.CRC = crc & 0xffffffff
+    zinfo.file_size = size
+    zinfo.compress_size = buf.tell()
+    buf.seek(0)
+    return zinfo, buf
+
+
+def _compress_timed(
+    file_path: str,
+    arc_name: str,
+    compression: int,
+    level: Optional[int]
+) -> Tuple[zipfile.ZipInfo, BinaryIO, float]:
+    start = time.thread_time()
+    zinfo, buf = compress_file(file_path, arc_name, compression, level)
+    return zinfo, buf, time.thread_time() - start
+
+
+def _write_compressed_entry(zf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, buf: BinaryIO) -> None:
+    try:
+        _append_entry(zf, zinfo, lambda out: shutil.copyfileobj(buf, out, CHUNK_SIZE))
+    finally:
+        buf.close()
+
+
+def write_zip(
+    fp: BinaryIO,
+    entries: Iterable[Tuple[str, str]],
+    hasher=None,
+    compression: int = zipfile.ZIP_DEFLATED,
+    previous: Optional[str] = None,
+    jobs: Optional[int] = None,
+    policy: Optional[CompressionPolicy] = None,
+    report: Optional[CompressionReport] = None
+) -> int:
+    """将文件流式压缩写入 fp
+
+    每个文件按块读取并直接压缩到输出流，峰值内存与归档大小无关。
+    jobs 大于 1 时在线程池中并行压缩，结果仍按 entries 的顺序写出，
+    因此输出与串行压缩一致。指定 previous 时，未变化的文件直接复制
+    上一次产物中的压缩数据。
+
+    Args:
+        fp: 输出文件对象，ZIP 数据从其当前位置开始写入
+        entries: (归档内路径, 源文件路径) 列表
+        hasher: 可选的增量哈希对象，接收写出的全部 ZIP 字节
+        compression: 未指定 policy 时所有条目使用的压缩方式
+        previous: 上一次生成的 CRX 或 ZIP 文件路径，用于增量打包
+        jobs: 并行压缩的线程数，默认等于 CPU 核心数
+        policy: 按文件决定压缩方式和级别的策略
+        report: 可选的压缩统计，记录每类文件节省的字节数和 CPU 耗时
+
+    Returns:
+        int: 写出的 ZIP 数据字节数
+    """
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    if policy is None and compression not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        jobs = 1
+    stream = StreamWriter(fp, hasher)
+    prev = None
+    if previous:
+        try:
+            prev = PreviousArchive(previous)
+            logging.info(f"增量打包，参考上一次产物: {previous}")
+        except (OSError, zipfile.BadZipFile) as e:
+            logging.warning(f"无法读取上一次产物，将完整打包: {str(e)}")
+
+    def decide(arc_name: str, file_path: str) -> Tuple[int, Optional[int]]:
+        if policy is not None:
+            return policy.decide(arc_name, file_path)
+        return compression, None
+
+    def record(zinfo: zipfile.ZipInfo, cpu_time: float) -> None:
+        if report is not None:
+            report.record(zinfo.filename, zinfo.compress_type, zinfo.file_size, zinfo.compress_size, cpu_time)
+
+    reused = 0
+    compressed = 0
+    try:
+        with zipfile.ZipFile(stream, 'w', compression) as zf:
+            if jobs == 1:
+                for arc_name, file_path in entries:
+                    compress_type, level = decide(arc_name, file_path)
+                    old = prev.match(arc_name, file_path, compress_type, level) if prev else None
+                    if old is not None:
+                        _write_raw_entry(zf, prev, old, arc_name, file_path)
+                        record(zf.filelist[-1], 0.0)
+                        reused += 1
+                    elif compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                        # 与并行路径相同，由 compress_file 写入带压缩级别标志位的条目
+                        zinfo, buf, cpu_time = _compress_timed(file_path, arc_name, compress_type, level)
+                        _write_compressed_entry(zf, zinfo, buf)
+                        record(zinfo, cpu_time)
+                        compressed += 1
+                    else:
+                        start = time.thread_time()
+                        zf.write(file_path, arc_name, compress_type=compress_type, compresslevel=level)
+                        record(zf.filelist[-1], time.thread_time() - start)
+                        compressed += 1
+            else:
+                # 限制在途条目数量，使内存占用与归档大小无关
+                window = jobs * 4
+                pending = deque()
+                with ThreadPoolExecutor(max_workers=jobs) as executor:
+                    def drain(limit: int) -> None:
+                        while len(pending) > limit:
+                            kind, payload = pending.popleft()
+                            if kind == 'raw':
+                                _write_raw_entry(zf, prev, *payload)
+                                record(zf.filelist[-1], 0.0)
+                            else:
+                                zinfo, buf, cpu_time = payload.result()
+                                _write_compressed_entry(zf, zinfo, buf)
+                                record(zinfo, cpu_time)
+
+                    for arc_name, file_path in entries:
+                        compress_type, level = decide(arc_name, file_path)
+                        old = prev.match(arc_name, file_path, compress_type, level) if prev else None
+                        if old is not None:
+                            pending.append(('raw', (old, arc_name, file_path)))
+                            reused += 1
+                        else:
+                            future = executor.submit(_compress_timed, file_path, arc_name, compress_type, level)
+                            pending.append(('compress', future))
+                            compressed += 1
+                        drain(window)
+                    drain(0)
+    finally:
+        if prev is not None:
+            prev.close()
+    if prev is not None:
+        logging.info(f"增量打包: 复用 {reused} 个条目，重新压缩 {compressed} 个条目")
+    return stream.tell()
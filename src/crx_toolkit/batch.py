@@ -0,0 +1,197 @@
+import os
+import glob
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from .packer import pack_extension, setup_logging, get_terser_pool
+
+# 工作进程内的打包配置，由 _init_worker 设置
+_worker_options: Dict[str, Any] = {}
+
+
+def resolve_sources(sources: List[str]) -> List[str]:
+    """将目录和 glob 模式展开为包含 manifest.json 的扩展目录列表（去重并保持顺序）
+
+    Args:
+        sources: 扩展目录或 glob 模式列表
+
+    Returns:
+        List[str]: 扩展目录列表
+    """
+    resolved = []
+    seen = set()
+    for source in sources:
+        if glob.has_magic(source):
+            matches = sorted(glob.glob(source, recursive=True))
+        else:
+            matches = [source]
+        for path in matches:
+            if os.path.isfile(path) and os.path.basename(path) == 'manifest.json':
+                path = os.path.dirname(path)
+            if not os.path.isfile(os.path.join(path, 'manifest.json')) and glob.has_magic(source):
+                continue
+            # 显式指定但不含 manifest.json 的目录也保留下来，由 pack_extension 报告错误
+            key = os.path.realpath(path)
+            if key not in seen:
+                seen.add(key)
+                resolved.append(path)
+    return resolved
+
+
+@lru_cache(maxsize=None)
+def _load_key(private_key_path: str) -> rsa.RSAPrivateKey:
+    """在工作进程内按路径缓存已解析的私钥"""
+    with open(private_key_path, 'rb') as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    """工作进程初始化：配置日志并预热私钥和 terser"""
+    _worker_options.update(options)
+    setup_logging(verbose=options.get('verbose', False), log_file=options.get('log_file', 'crx_pack.log'))
+    if options.get('private_key_path') and not options.get('use_zip'):
+        try:
+            _load_key(options['private_key_path'])
+        except Exception as e:
+            logging.error(f"加载私钥失败: {str(e)}")
+
+
+def _pack_one(source_dir: str, private_key_path: Optional[str]) -> Dict[str, Any]:
+    options = _worker_options
+    start = time.perf_counter()
+    result = {'source': source_dir, 'output': None, 'seconds': 0.0, 'error': None}
+    try:
+        private_key = None
+        if private_key_path and not options.get('use_zip'):
+            private_key = _load_key(private_key_path)
+        terser_pool = None
+        if options.get('use_terser'):
+            terser_pool = get_terser_pool(size=options.get('threads'))
+        result['output'] = pack_extension(
+            source_dir=source_dir,
+            private_key_path=private_key_path,
+            output_dir=options['output_dir'],
+            force=options.get('force', True),
+            verbose=options.get('verbose', False),
+            no_verify=options.get('no_verify', False),
+            use_terser=options.get('use_terser', False),
+            use_zip=options.get('use_zip', False),
+            terser_pool=terser_pool,
+            incremental=options.get('incremental', False),
+            jobs=options.get('threads'),
+            private_key=private_key
+        )
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def pack_all(
+    sources: List[str],
+    output_dir: str,
+    private_key_path: Optional[str] = None,
+    key_map: Optional[Dict[str, str]] = None,
+    processes: Optional[int] = None,
+    fail_fast: bool = False,
+    force: bool = True,
+    verbose: bool = False,
+    no_verify: bool = False,
+    use_terser: bool = False,
+    use_zip: bool = False,
+    incremental: bool = False
+) -> List[Dict[str, Any]]:
+    """在进程池中批量打包多个扩展
+
+    每个工作进程只配置一次日志、只探测一次 Node.js 工具链，并且每个私钥
+    在每个工作进程内只解析一次。
+
+    Args:
+        sources: 扩展目录或 glob 模式列表
+        output_dir: 输出目录路径
+        private_key_path: 所有扩展共用的私钥文件路径
+        key_map: 扩展目录 -> 私钥文件路径，优先于 private_key_path
+        processes: 工作进程数，默认等于 CPU 核心数
+        fail_fast: 任一扩展打包失败时是否取消尚未开始的任务
+        force: 是否强制覆盖已存在的文件
+        verbose: 是否启用详细日志
+        no_verify: 是否跳过签名验证
+        use_terser: 是否使用 terser 混淆 JavaScript 代码
+        use_zip: 是否使用zip格式打包
+        incremental: 是否增量打包
+
+    Returns:
+        List[Dict[str, Any]]: 按输入顺序排列的结果，包含 source、output、seconds、error
+    """
+    source_dirs = resolve_sources(sources)
+    if not source_dirs:
+        raise ValueError("没有找到需要打包的扩展目录")
+    key_map = {os.path.abspath(k): v for k, v in (key_map or {}).items()}
+
+    cpu_count = os.cpu_count() or 1
+    processes = max(1, min(processes or cpu_count, len(source_dirs)))
+    options = {
+        'output_dir': output_dir,
+        'private_key_path': private_key_path,
+        'force': force,
+        'verbose': verbose,
+        'no_verify': no_verify,
+        'use_terser': use_terser,
+        'use_zip': use_zip,
+        'incremental': incremental,
+        # 进程之间平分 CPU，避免压缩线程过度订阅
+        'threads': max(1, cpu_count // processes),
+    }
+    logging.info(f"批量打包 {len(source_dirs)} 个扩展，使用 {processes} 个进程")
+
+    # 按输入位置保存结果，同一目录即使出现多次也不会互相覆盖
+    results: List[Optional[Dict[str, Any]]] = [None] * len(source_dirs)
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(options,)) as executor:
+        futures = {
+            executor.submit(
+                _pack_one,
+                source_dir,
+                key_map.get(os.path.abspath(source_dir), private_key_path)
+            ): index
+            for index, source_dir in enumerate(source_dirs)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            source_dir = source_dirs[index]
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                # 工作进程异常退出
+                result = {'source': source_dir, 'output': None, 'seconds': 0.0, 'error': str(e)}
+            results[index] = result
+            if result['error']:
+                logging.error(f"打包失败 {source_dir}: {result['error']}")
+                if fail_fast:
+                    for pending in futures:
+                        pending.cancel()
+            else:
+                logging.info(f"打包完成 {source_dir}: {result['output']} ({result['seconds']:.2f}s)")
+
+    return [
+        result or {'source': source_dir, 'output': None, 'seconds': 0.0, 'error': '已取消'}
+        for source_dir, result in zip(source_dirs, results)
+    ]
+
+
+def format_summary(results: List[Dict[str, Any]]) -> str:
+    """生成每个扩展的耗时汇总"""
+    lines = []
+    width = max([len(r['source']) for r in results] + [4])
+    for r in results:
+        status = 'OK' if not r['error'] else f"FAILED: {r['error']}"
+        lines.append(f"{r['source']:<{width}}  {r['seconds']:8.2f}s  {status}")
+    ok = sum(1 for r in results if not r['error'])
+    total = sum(r['seconds'] for r in results)
+    lines.append(f"成功 {ok}/{len(results)}，累计耗时 {total:.2f}s")
+    return '\n'.join(lines)
@@ -0,0 +1,125 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import requests
+from .downloader import download_crx, DEFAULT_RETRIES
+from .utils.network_utils import create_session
+from .download_cache import DownloadCache
+
+
+def read_targets(list_file: str) -> List[str]:
+    """读取扩展ID或URL列表文件，每行一个，忽略空行和 # 开头的注释"""
+    targets = []
+    with open(list_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                targets.append(line)
+    return targets
+
+
+def download_many(
+    targets: List[str],
+    output_dir: str,
+    workers: int = 16,
+    per_host: Optional[int] = 8,
+    force: bool = True,
+    no_verify: bool = False,
+    session: Optional[requests.Session] = None,
+    hedge_delay: Optional[float] = None,
+    retries: int = DEFAULT_RETRIES,
+    cache: Optional[DownloadCache] = None,
+    sources: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """并发下载多个扩展
+
+    所有工作线程共享同一个带连接池的 requests.Session，复用 TCP/TLS 连接，
+    并按主机限制同时进行的请求数。
+
+    Args:
+        targets: 扩展ID或URL列表
+        output_dir: 输出目录路径
+        workers: 工作线程数
+        per_host: 每个主机的最大并发请求数，为None时不限制
+        force: 是否强制覆盖已存在的文件
+        no_verify: 是否跳过签名验证
+        session: 自定义的 requests.Session，为None时自动创建
+        hedge_delay: 对冲下载的备用链接启动延迟（秒），为None时按顺序尝试下载链接
+        retries: 每个链接在连接中断时的最大重试次数
+        cache: 下载缓存，未更新的扩展直接复用缓存文件
+        sources: 目标 -> {download_urls, expected_sha256}，指定目标的下载链接和期望的
+            SHA-256（例如更新检查返回的 codebase 和 hash_sha256）
+
+    Returns:
+        dict: results 为按输入顺序排列的每个目标的结果，其余字段为吞吐量统计
+    """
+    workers = max(1, workers)
+    owns_session = session is None
+    if owns_session:
+        session = create_session(pool_size=workers, per_host=per_host)
+    os.makedirs(output_dir, exist_ok=True)
+
+    def fetch(target: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = {'target': target, 'output': None, 'bytes': 0, 'seconds': 0.0, 'error': None}
+        try:
+            output = download_crx(
+                url=target,
+                output_dir=output_dir,
+                force=force,
+                no_verify=no_verify,
+                session=session,
+                hedge_delay=hedge_delay,
+                retries=retries,
+                cache=cache,
+                **(sources or {}).get(target, {})
+            )
+            result['output'] = output
+            result['bytes'] = os.path.getsize(output)
+        except Exception as e:
+            result['error'] = str(e)
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    hits_before = cache.hits if cache is not None else 0
+    logging.info(f"开始批量下载 {len(targets)} 个扩展，{workers} 个线程")
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(fetch, targets))
+    finally:
+        if owns_session:
+            session.close()
+    elapsed = time.perf_counter() - start
+
+    total_bytes = sum(r['bytes'] for r in results)
+    succeeded = sum(1 for r in results if not r['error'])
+    return {
+        'results': results,
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'bytes': total_bytes,
+        'seconds': elapsed,
+        'throughput': total_bytes / elapsed if elapsed > 0 else 0.0,
+        'rate': len(results) / elapsed if elapsed > 0 else 0.0,
+        'cache_hits': cache.hits - hits_before if cache is not None else 0,
+    }
+
+
+def format_report(summary: Dict[str, Any]) -> str:
+    """生成批量下载的吞吐量报告"""
+    lines = []
+    for r in summary['results']:
+        status = r['output'] if not r['error'] else f"FAILED: {r['error']}"
+        lines.append(f"{r['target']}  {r['seconds']:7.2f}s  {r['bytes']:>12}  {status}")
+    lines.append(
+        f"成功 {summary['succeeded']}/{summary['total']}，"
+        f"共 {summary['bytes'] / 1024 / 1024:.2f} MB，耗时 {summary['seconds']:.2f}s，"
+        f"吞吐量 {summary['throughput'] / 1024 / 1024:.2f} MB/s，{summary['rate']:.2f} 个/秒"
+    )
+    if summary.get('cache_hits'):
+        lines.append(f"缓存命中 {summary['cache_hits']} 个（服务器返回 304，未重新下载）")
+    return '\n'.join(lines)
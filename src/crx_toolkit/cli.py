@@ -1,13 +1,34 @@
 import os
 import sys
+import json
+import time
 import argparse
 import logging
 from typing import List, Optional
 from .packer import pack_extension, setup_logging
-from .downloader import download_crx
+from .downloader import download_crx, DEFAULT_HEDGE_DELAY, DEFAULT_RETRIES
+from .compression import CompressionPolicy
+from .batch import pack_all, format_summary
+from .sign_server import serve as serve_signer
+from .verifier import verify_many, find_crx_files
+from .bulk_downloader import download_many, read_targets, format_report
+from .download_cache import DownloadCache
+from .extractor import extract_many, format_extract_report
+from .update_check import update_extensions, format_update_report, DEFAULT_BATCH_SIZE
+from .indexer import build_index, query_index, DEFAULT_INDEX_PATH
+from .store import ContentStore, store_many
+from .differ import diff_many, read_pairs, format_diff_report
+from .delta import make_delta, apply_delta
+from .analyzer import analyze_many
+from .signer import load_private_key
+from .sign_server import RemoteSigner
 
 def clean_logs():
-    """清理所有日志文件"""
+    """清理所有日志文件
+
+    提示信息写到 stderr，与日志输出一致，不会混入 analyze、diff --json 等
+    写到 stdout 的机器可读结果。
+    """
     log_files = [
         'crx_pack.log',
         'crx_download.log',  # 下载相关的日志
@@ -27,9 +48,34 @@ def clean_logs():
                     
                 # 然后删除文件
                 os.remove(log_file)
-                print(f"已清理历史日志文件: {log_file}")  # 使用 print 而不是 logging
+                print(f"已清理历史日志文件: {log_file}", file=sys.stderr)  # 使用 print 而不是 logging
         except Exception as e:
-            print(f"清理日志文件 {log_file} 时发生错误: {str(e)}")  # 使用 print 而不是 logging
+            print(f"清理日志文件 {log_file} 时发生错误: {str(e)}", file=sys.stderr)  # 使用 print 而不是 logging
+
+def build_download_cache(parsed_args) -> Optional[DownloadCache]:
+    """根据命令行参数创建下载缓存，未启用时返回None"""
+    if not parsed_args.cache and not parsed_args.cache_dir:
+        return None
+    return DownloadCache(cache_dir=parsed_args.cache_dir, max_bytes=parsed_args.cache_size * 1024 * 1024)
+
+def build_compression_policy(parsed_args: argparse.Namespace) -> CompressionPolicy:
+    """根据命令行参数构建压缩策略，命令行规则优先于配置文件"""
+    if parsed_args.compression_config:
+        policy = CompressionPolicy.from_config(parsed_args.compression_config)
+    else:
+        policy = CompressionPolicy()
+    if parsed_args.compression_level is not None:
+        if not 0 <= parsed_args.compression_level <= 9:
+            raise ValueError(f"无效的压缩级别: {parsed_args.compression_level}")
+        policy.level = parsed_args.compression_level
+    rules = []
+    for rule in parsed_args.compression_rule:
+        pattern, sep, level = rule.rpartition('=')
+        if not sep or not pattern or not level.isdigit() or int(level) > 9:
+            raise ValueError(f"无效的压缩规则: {rule}")
+        rules.append((pattern, int(level)))
+    policy.rules = rules + policy.rules
+    return policy
 
 def main(args: Optional[List[str]] = None) -> int:
     """CLI 入口函数"""
@@ -50,6 +96,46 @@ def main(args: Optional[List[str]] = None) -> int:
     pack_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
     pack_parser.add_argument('--no-verify', action='store_true', help='跳过签名验证')
     pack_parser.add_argument('--use-terser', action='store_true', help='使用terser混淆JavaScript代码')
+    pack_parser.add_argument('--minify-cache-dir', help='混淆结果缓存目录（可在多个构建间共享）')
+    pack_parser.add_argument('--minify-cache-size', type=int, default=512, help='混淆缓存大小上限，单位MB (默认: 512)')
+    pack_parser.add_argument('--no-minify-cache', action='store_true', help='禁用混淆结果缓存')
+    pack_parser.add_argument('--incremental', action='store_true', help='增量打包，复用上一次产物中未变化的压缩条目')
+    pack_parser.add_argument('-j', '--jobs', type=int, help='并行压缩的工作线程数 (默认: CPU核心数)')
+    pack_parser.add_argument('--compression-level', type=int, help='默认DEFLATE压缩级别 0-9，0表示不压缩')
+    pack_parser.add_argument('--compression-rule', action='append', default=[], metavar='PATTERN=LEVEL',
+                             help='按glob模式设置压缩级别，可重复指定，例如 "*.js=9" 或 "models/*=0"')
+    pack_parser.add_argument('--compression-config', help='压缩策略配置文件 (JSON)')
+    pack_parser.add_argument('--report', action='store_true', help='输出按文件类型统计的压缩报告')
+    pack_parser.add_argument('--signer', help='签名服务地址，例如 unix:///run/crx-sign.sock（代替 --key）')
+    pack_parser.add_argument('--signer-key', help='签名服务中使用的私钥（扩展ID），默认使用服务端默认私钥')
+    
+    # pack-all 命令
+    pack_all_parser = subparsers.add_parser('pack-all', help='批量打包多个扩展')
+    pack_all_parser.add_argument('sources', nargs='+', help='扩展源目录或glob模式，例如 "extensions/*"')
+    pack_all_parser.add_argument('-k', '--key', help='私钥文件路径（仅在打包为crx格式时需要）')
+    pack_all_parser.add_argument('-o', '--output', required=True, help='输出目录路径')
+    pack_all_parser.add_argument('--format', choices=['crx', 'zip'], default='crx', help='打包格式: crx 或 zip (默认: crx)')
+    pack_all_parser.add_argument('-f', '--force', action='store_true', help='覆盖已存在的文件')
+    pack_all_parser.add_argument('--no-force', action='store_true', help='不覆盖已存在的文件')
+    pack_all_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    pack_all_parser.add_argument('--no-verify', action='store_true', help='跳过签名验证')
+    pack_all_parser.add_argument('--use-terser', action='store_true', help='使用terser混淆JavaScript代码')
+    pack_all_parser.add_argument('--incremental', action='store_true', help='增量打包，复用上一次产物中未变化的压缩条目')
+    pack_all_parser.add_argument('-p', '--processes', type=int, help='工作进程数 (默认: CPU核心数)')
+    pack_all_parser.add_argument('--fail-fast', action='store_true', help='任一扩展失败时停止剩余任务')
+    
+    # sign-server 命令
+    sign_server_parser = subparsers.add_parser('sign-server', help='启动常驻签名服务')
+    sign_server_parser.add_argument('-k', '--key', action='append', required=True, help='私钥文件路径，可重复指定，第一个为默认私钥')
+    sign_server_parser.add_argument('--socket', required=True, help='Unix 域套接字路径')
+    sign_server_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    
+    # verify 命令
+    verify_parser = subparsers.add_parser('verify', help='校验CRX签名和完整性')
+    verify_parser.add_argument('paths', nargs='+', help='CRX文件或目录（递归查找*.crx）')
+    verify_parser.add_argument('-j', '--jobs', type=int, help='并行校验的进程数 (默认: CPU核心数)')
+    verify_parser.add_argument('--no-members', action='store_true', help='只校验签名，不校验ZIP成员的CRC')
+    verify_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
     
     # download 命令
     download_parser = subparsers.add_parser('download', help='下载扩展')
@@ -59,6 +145,122 @@ def main(args: Optional[List[str]] = None) -> int:
     download_parser.add_argument('--no-force', action='store_true', help='不覆盖已存在的文件')
     download_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
     download_parser.add_argument('--no-verify', action='store_true', help='跳过签名验证')
+    download_parser.add_argument('--hedge', nargs='?', type=float, const=DEFAULT_HEDGE_DELAY, metavar='SECONDS',
+                                 help=f'对冲下载：跳过HEAD请求，主链接在指定秒数内未完成时并发请求备用链接 (默认: {DEFAULT_HEDGE_DELAY})')
+    download_parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                                 help=f'连接中断时每个链接的最大重试次数，未完成的部分会续传 (默认: {DEFAULT_RETRIES})')
+    download_parser.add_argument('--sha256', help='期望的CRX文件SHA-256，不匹配时下载失败')
+    download_parser.add_argument('--cache', action='store_true', help='使用下载缓存，未更新的扩展通过条件请求直接复用')
+    download_parser.add_argument('--cache-dir', help='下载缓存目录（指定时自动启用缓存）')
+    download_parser.add_argument('--cache-size', type=int, default=2048, help='下载缓存大小上限，单位MB (默认: 2048)')
+    
+    # download-many 命令
+    download_many_parser = subparsers.add_parser('download-many', help='并发批量下载扩展')
+    download_many_parser.add_argument('-i', '--input', required=True, help='扩展ID或URL列表文件，每行一个')
+    download_many_parser.add_argument('-o', '--output', required=True, help='输出目录路径')
+    download_many_parser.add_argument('-w', '--workers', type=int, default=16, help='并发下载的线程数 (默认: 16)')
+    download_many_parser.add_argument('--per-host', type=int, default=8, help='每个主机的最大并发请求数 (默认: 8，0表示不限制)')
+    download_many_parser.add_argument('-f', '--force', action='store_true', help='覆盖已存在的文件')
+    download_many_parser.add_argument('--no-force', action='store_true', help='不覆盖已存在的文件')
+    download_many_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    download_many_parser.add_argument('--no-verify', action='store_true', help='跳过签名验证')
+    download_many_parser.add_argument('--hedge', nargs='?', type=float, const=DEFAULT_HEDGE_DELAY, metavar='SECONDS',
+                                      help=f'对冲下载：跳过HEAD请求，主链接在指定秒数内未完成时并发请求备用链接 (默认: {DEFAULT_HEDGE_DELAY})')
+    download_many_parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                                      help=f'连接中断时每个链接的最大重试次数，未完成的部分会续传 (默认: {DEFAULT_RETRIES})')
+    download_many_parser.add_argument('--cache', action='store_true', help='使用下载缓存，未更新的扩展通过条件请求直接复用')
+    download_many_parser.add_argument('--cache-dir', help='下载缓存目录（指定时自动启用缓存）')
+    download_many_parser.add_argument('--cache-size', type=int, default=2048, help='下载缓存大小上限，单位MB (默认: 2048)')
+    
+    # extract 命令
+    extract_parser = subparsers.add_parser('extract', help='并行解压一个或多个 CRX/ZIP 文件')
+    extract_parser.add_argument('paths', nargs='+', help='CRX 文件或目录（递归查找 *.crx）')
+    extract_parser.add_argument('-o', '--output', help='输出目录，每个文件解压到其中的同名子目录 (默认: 文件所在目录)')
+    extract_parser.add_argument('-j', '--jobs', type=int, default=None, help='解压线程数 (默认: CPU 核心数)')
+    extract_parser.add_argument('--store', help='去重存储目录：文件内容按 SHA-256 只保存一次，每个版本解压为硬链接目录（忽略 -o）')
+    extract_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    
+    # store-gc 命令
+    store_gc_parser = subparsers.add_parser('store-gc', help='回收去重存储中未被任何版本引用的内容')
+    store_gc_parser.add_argument('store', help='去重存储目录')
+    store_gc_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    
+    # diff 命令
+    diff_parser = subparsers.add_parser('diff', help='根据中央目录比较两个版本的 CRX/ZIP 文件')
+    diff_parser.add_argument('files', nargs='*', metavar='OLD NEW', help='旧版本和新版本文件')
+    diff_parser.add_argument('--pairs', help='比较列表文件，每行一对文件（旧 新）')
+    diff_parser.add_argument('--content', action='store_true', help='解压变化的文本成员并输出内容差异')
+    diff_parser.add_argument('-U', '--context', type=int, default=3, help='内容差异的上下文行数 (默认: 3)')
+    diff_parser.add_argument('-j', '--jobs', type=int, help='并行比较的进程数 (默认: CPU核心数)')
+    diff_parser.add_argument('--json', action='store_true', help='每对文件输出一行 JSON')
+    diff_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    
+    # make-delta 命令
+    make_delta_parser = subparsers.add_parser(
+        'make-delta',
+        help='生成两个版本之间的差异补丁',
+        description='生成两个版本之间的差异补丁。默认对 DEFLATE 成员的解压内容做差异，应用时重新压缩，'
+                    '只有与生成时相同版本的 zlib 才能得到完全相同的字节，版本不一致时 apply-delta 会拒绝应用；'
+                    '补丁需要在其他 zlib（例如 zlib-ng）上应用时使用 --no-recompress。'
+    )
+    make_delta_parser.add_argument('old', help='旧版本 CRX/ZIP 文件')
+    make_delta_parser.add_argument('new', help='新版本 CRX/ZIP 文件')
+    make_delta_parser.add_argument('-o', '--output', required=True, help='输出的补丁文件路径')
+    make_delta_parser.add_argument('--no-recompress', action='store_true',
+                                   help='只对压缩数据做差异，补丁更大但应用时不依赖 zlib 版本')
+    make_delta_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    
+    # apply-delta 命令
+    apply_delta_parser = subparsers.add_parser('apply-delta', help='将差异补丁应用到旧版本并重新签名')
+    apply_delta_parser.add_argument('old', help='旧版本 CRX/ZIP 文件')
+    apply_delta_parser.add_argument('patch', help='补丁文件')
+    apply_delta_parser.add_argument('-o', '--output', required=True, help='输出文件路径')
+    apply_delta_parser.add_argument('-k', '--key', help='重新签名使用的私钥文件，不提供时输出未签名的 ZIP')
+    apply_delta_parser.add_argument('--signer', help='签名服务地址，例如 unix:///run/crx-sign.sock（代替 --key）')
+    apply_delta_parser.add_argument('--signer-key', help='签名服务中使用的私钥（扩展ID），默认使用服务端默认私钥')
+    apply_delta_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    
+    # analyze 命令
+    analyze_parser = subparsers.add_parser('analyze', help='并行统计扩展使用的 Chrome API 并与声明的权限对比，直接读取 CRX/ZIP 中的 JS')
+    analyze_parser.add_argument('paths', nargs='+', help='CRX/ZIP 文件、已解压的扩展目录，或包含它们的目录')
+    analyze_parser.add_argument('-o', '--output', help='结果输出文件（JSONL，默认输出到标准输出）')
+    analyze_parser.add_argument('-j', '--jobs', type=int, help='并行分析的进程数 (默认: CPU核心数)')
+    analyze_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    
+    # update-check 命令
+    update_parser = subparsers.add_parser('update-check', help='批量检查扩展更新，只下载版本变化的扩展')
+    update_parser.add_argument('--inventory', required=True, help='本地清单文件（JSON，扩展ID -> 版本和路径），不存在时自动创建')
+    update_parser.add_argument('-i', '--input', help='额外检查的扩展ID或URL列表文件，每行一个')
+    update_parser.add_argument('-o', '--output', required=True, help='输出目录路径')
+    update_parser.add_argument('--check-only', action='store_true', help='只检查不下载')
+    update_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                               help=f'每个更新检查请求最多携带的扩展数量 (默认: {DEFAULT_BATCH_SIZE})')
+    update_parser.add_argument('-w', '--workers', type=int, default=16, help='并发下载的线程数 (默认: 16)')
+    update_parser.add_argument('--per-host', type=int, default=8, help='每个主机的最大并发请求数 (默认: 8，0表示不限制)')
+    update_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    update_parser.add_argument('--no-verify', action='store_true', help='跳过签名验证')
+    update_parser.add_argument('--cache', action='store_true', help='使用下载缓存，未更新的扩展通过条件请求直接复用')
+    update_parser.add_argument('--cache-dir', help='下载缓存目录（指定时自动启用缓存）')
+    update_parser.add_argument('--cache-size', type=int, default=2048, help='下载缓存大小上限，单位MB (默认: 2048)')
+    
+    # index 命令
+    index_parser = subparsers.add_parser('index', help='建立或增量更新 CRX 文件的 SQLite 索引')
+    index_parser.add_argument('paths', nargs='+', help='CRX 文件或目录（递归查找 *.crx）')
+    index_parser.add_argument('--db', default=DEFAULT_INDEX_PATH, help=f'索引数据库路径 (默认: {DEFAULT_INDEX_PATH})')
+    index_parser.add_argument('-j', '--jobs', type=int, help='并行解析的进程数 (默认: CPU核心数)')
+    index_parser.add_argument('--no-prune', action='store_true', help='保留已不存在的文件的记录')
+    index_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
+    
+    # query 命令
+    query_parser = subparsers.add_parser('query', help='查询 CRX 索引')
+    query_parser.add_argument('--db', default=DEFAULT_INDEX_PATH, help=f'索引数据库路径 (默认: {DEFAULT_INDEX_PATH})')
+    query_parser.add_argument('--id', dest='extension_id', help='扩展ID')
+    query_parser.add_argument('--permission', help='声明了指定权限的扩展')
+    query_parser.add_argument('--name', help='扩展名称，支持 %% 和 _ 通配符')
+    query_parser.add_argument('--file', dest='file_name', help='包含指定成员的扩展，支持 %% 和 _ 通配符')
+    query_parser.add_argument('--latest', action='store_true', help='每个扩展只显示最新版本')
+    query_parser.add_argument('--json', action='store_true', help='每条记录输出一行 JSON')
+    query_parser.add_argument('-v', '--verbose', action='store_true', help='启用详细日志')
     
     parsed_args = parser.parse_args(args)
     
@@ -68,7 +270,7 @@ def main(args: Optional[List[str]] = None) -> int:
         
     try:
         # 根据命令设置日志文件名
-        log_file = 'crx_pack.log' if parsed_args.command == 'pack' else 'crx_download.log'
+        log_file = 'crx_pack.log' if parsed_args.command in ('pack', 'pack-all', 'sign-server', 'apply-delta') else 'crx_download.log'
         
         # 清理日志并设置日志配置
         clean_logs()
@@ -79,10 +281,12 @@ def main(args: Optional[List[str]] = None) -> int:
             force = parsed_args.force if parsed_args.force else not parsed_args.no_force
             
             # 检查私钥参数
-            if parsed_args.format == 'crx' and not parsed_args.key:
-                logging.error("打包为crx格式时必须提供私钥文件")
+            if parsed_args.format == 'crx' and not parsed_args.key and not parsed_args.signer:
+                logging.error("打包为crx格式时必须提供私钥文件或签名服务地址")
                 return 1
             
+            compression_policy = build_compression_policy(parsed_args)
+            
             pack_extension(
                 source_dir=parsed_args.source,
                 private_key_path=parsed_args.key,
@@ -91,19 +295,208 @@ def main(args: Optional[List[str]] = None) -> int:
                 verbose=parsed_args.verbose,
                 no_verify=parsed_args.no_verify,
                 use_terser=parsed_args.use_terser,
-                use_zip=parsed_args.format == 'zip'
+                use_zip=parsed_args.format == 'zip',
+                use_minify_cache=not parsed_args.no_minify_cache,
+                minify_cache_dir=parsed_args.minify_cache_dir,
+                minify_cache_size=parsed_args.minify_cache_size * 1024 * 1024,
+                incremental=parsed_args.incremental,
+                jobs=parsed_args.jobs,
+                compression_policy=compression_policy,
+                report=parsed_args.report,
+                signer=parsed_args.signer,
+                signer_key=parsed_args.signer_key
             )
+        elif parsed_args.command == 'pack-all':
+            force = parsed_args.force if parsed_args.force else not parsed_args.no_force
+            
+            if parsed_args.format == 'crx' and not parsed_args.key:
+                logging.error("打包为crx格式时必须提供私钥文件")
+                return 1
+            
+            results = pack_all(
+                sources=parsed_args.sources,
+                output_dir=parsed_args.output,
+                private_key_path=parsed_args.key,
+                processes=parsed_args.processes,
+                fail_fast=parsed_args.fail_fast,
+                force=force,
+                verbose=parsed_args.verbose,
+                no_verify=parsed_args.no_verify,
+                use_terser=parsed_args.use_terser,
+                use_zip=parsed_args.format == 'zip',
+                incremental=parsed_args.incremental
+            )
+            print(format_summary(results))
+            if any(r['error'] for r in results):
+                return 1
+        elif parsed_args.command == 'verify':
+            # 每个文件输出一行 JSON，便于其他工具处理
+            total = 0
+            invalid = 0
+            for result in verify_many(parsed_args.paths, jobs=parsed_args.jobs, check_members=not parsed_args.no_members):
+                total += 1
+                if not result['valid']:
+                    invalid += 1
+                print(json.dumps(result, ensure_ascii=False), flush=True)
+            logging.info(f"校验完成: {total} 个文件，{invalid} 个无效")
+            if invalid or not total:
+                return 1
+        elif parsed_args.command == 'sign-server':
+            serve_signer(parsed_args.socket, parsed_args.key)
+        elif parsed_args.command == 'extract':
+            start = time.perf_counter()
+            if parsed_args.store:
+                results = store_many(ContentStore(parsed_args.store), find_crx_files(parsed_args.paths), jobs=parsed_args.jobs)
+                new_bytes = sum(r['new_bytes'] for r in results)
+                logging.info(f"新写入 {sum(r['new_blobs'] for r in results)} 个 blob，共 {new_bytes / 1024 / 1024:.2f} MB")
+            else:
+                results = extract_many(find_crx_files(parsed_args.paths), parsed_args.output, jobs=parsed_args.jobs)
+            print(format_extract_report(results, time.perf_counter() - start))
+            if not results or any(r['error'] for r in results):
+                return 1
+        elif parsed_args.command == 'index':
+            summary = build_index(parsed_args.paths, db_path=parsed_args.db, jobs=parsed_args.jobs,
+                                  prune=not parsed_args.no_prune)
+            print(f"扫描 {summary['scanned']} 个文件：重新索引 {summary['indexed']}，未变化 {summary['unchanged']}，"
+                  f"移除 {summary['removed']}，失败 {summary['failed']}，耗时 {summary['seconds']:.2f}s")
+            if summary['failed']:
+                return 1
+        elif parsed_args.command == 'query':
+            rows = query_index(
+                db_path=parsed_args.db,
+                extension_id=parsed_args.extension_id,
+                permission=parsed_args.permission,
+                name=parsed_args.name,
+                file_name=parsed_args.file_name,
+                latest=parsed_args.latest
+            )
+            for row in rows:
+                if parsed_args.json:
+                    print(json.dumps(row, ensure_ascii=False))
+                else:
+                    print(f"{row['extension_id'] or '-':32}  {row['version'] or '-':>12}  {row['name'] or '-'}  {row['path']}")
+            logging.info(f"共 {len(rows)} 条记录")
+        elif parsed_args.command == 'store-gc':
+            result = ContentStore(parsed_args.store).gc()
+            print(f"删除 {result['removed']} 个 blob，释放 {result['freed'] / 1024 / 1024:.2f} MB，保留 {result['kept']} 个")
+        elif parsed_args.command == 'diff':
+            if len(parsed_args.files) % 2:
+                logging.error("文件参数必须成对出现（旧 新）")
+                return 1
+            pairs = list(zip(parsed_args.files[::2], parsed_args.files[1::2]))
+            if parsed_args.pairs:
+                pairs += read_pairs(parsed_args.pairs)
+            if not pairs:
+                logging.error("没有要比较的文件")
+                return 1
+            failed = 0
+            for result in diff_many(pairs, jobs=parsed_args.jobs, content=parsed_args.content,
+                                    context=parsed_args.context):
+                if result['error']:
+                    failed += 1
+                if parsed_args.json:
+                    print(json.dumps(result, ensure_ascii=False), flush=True)
+                else:
+                    print(format_diff_report(result), flush=True)
+            if failed:
+                return 1
+        elif parsed_args.command == 'make-delta':
+            result = make_delta(parsed_args.old, parsed_args.new, parsed_args.output,
+                                recompress=not parsed_args.no_recompress)
+            print(f"补丁 {result['patch_size']} 字节（目标 {result['target_size']} 字节）："
+                  f"复用 {result['copied']}，修改 {result['changed']}，新增 {result['added']}，"
+                  f"耗时 {result['seconds']:.2f}s")
+        elif parsed_args.command == 'apply-delta':
+            private_key = load_private_key(parsed_args.key) if parsed_args.key else None
+            signer = RemoteSigner(parsed_args.signer, key_id=parsed_args.signer_key) if parsed_args.signer else None
+            try:
+                result = apply_delta(parsed_args.old, parsed_args.patch, parsed_args.output,
+                                     private_key=private_key, signer=signer)
+            finally:
+                if signer is not None:
+                    signer.close()
+            if not result['signed']:
+                logging.warning("未提供私钥或签名服务，输出的是未签名的 ZIP 数据")
+            print(f"{result['output']}  {result['size']} 字节  SHA-256 {result['sha256']}")
+        elif parsed_args.command == 'analyze':
+            # 每个扩展输出一行 JSON，边分析边写出
+            start = time.perf_counter()
+            total = 0
+            failed = 0
+            out = open(parsed_args.output, 'w', encoding='utf-8') if parsed_args.output else sys.stdout
+            try:
+                for result in analyze_many(parsed_args.paths, jobs=parsed_args.jobs):
+                    total += 1
+                    if result['error']:
+                        failed += 1
+                        logging.warning(f"分析失败 {result['path']}: {result['error']}")
+                    elif result['permissions']['undeclared']:
+                        logging.warning(f"{result['path']} 使用了未声明的权限: "
+                                        f"{', '.join(result['permissions']['undeclared'])}")
+                    out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    out.flush()
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            logging.info(f"分析完成: {total} 个扩展，{failed} 个失败，耗时 {time.perf_counter() - start:.2f}s")
+            if failed or not total:
+                return 1
+        elif parsed_args.command == 'update-check':
+            cache = build_download_cache(parsed_args)
+            result = update_extensions(
+                inventory_path=parsed_args.inventory,
+                output_dir=parsed_args.output,
+                extension_ids=read_targets(parsed_args.input) if parsed_args.input else None,
+                check_only=parsed_args.check_only,
+                batch_size=parsed_args.batch_size,
+                workers=parsed_args.workers,
+                per_host=parsed_args.per_host or None,
+                no_verify=parsed_args.no_verify,
+                cache=cache
+            )
+            if cache is not None:
+                cache.evict()
+            print(format_update_report(result))
+            if result['download'] and result['download']['failed']:
+                return 1
+        elif parsed_args.command == 'download-many':
+            force = parsed_args.force if parsed_args.force else not parsed_args.no_force
+            
+            cache = build_download_cache(parsed_args)
+            summary = download_many(
+                targets=read_targets(parsed_args.input),
+                output_dir=parsed_args.output,
+                workers=parsed_args.workers,
+                per_host=parsed_args.per_host or None,
+                force=force,
+                no_verify=parsed_args.no_verify,
+                hedge_delay=parsed_args.hedge,
+                retries=parsed_args.retries,
+                cache=cache
+            )
+            if cache is not None:
+                cache.evict()
+            print(format_report(summary))
+            if summary['failed']:
+                return 1
         elif parsed_args.command == 'download':
             # 处理 force 参数的优先级
             force = parsed_args.force if parsed_args.force else not parsed_args.no_force
             
+            cache = build_download_cache(parsed_args)
             download_crx(
                 url=parsed_args.url,
                 output_dir=parsed_args.output,
                 force=force,
                 verbose=parsed_args.verbose,
-                no_verify=parsed_args.no_verify
+                no_verify=parsed_args.no_verify,
+                hedge_delay=parsed_args.hedge,
+                retries=parsed_args.retries,
+                cache=cache,
+                expected_sha256=parsed_args.sha256
             )
+            if cache is not None:
+                cache.evict()
             
         return 0
         
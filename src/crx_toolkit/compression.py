@@ -0,0 +1,165 @@
+import os
+import json
+import math
+import fnmatch
+import logging
+import threading
+import zipfile
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# 已经压缩过的格式，再做 DEFLATE 几乎没有收益
+DEFAULT_STORE_EXTENSIONS = [
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif',
+    '.woff', '.woff2',
+    '.mp3', '.mp4', '.m4a', '.ogg', '.webm',
+    '.wasm',
+    '.zip', '.gz', '.br', '.crx',
+]
+
+# 采样熵（比特/字节）超过该值时视为不可压缩
+DEFAULT_ENTROPY_THRESHOLD = 7.5
+
+# 熵采样读取的字节数
+ENTROPY_SAMPLE_SIZE = 4096
+
+
+def sample_entropy(file_path: str, sample_size: int = ENTROPY_SAMPLE_SIZE) -> float:
+    """读取文件开头的一段样本，计算其香农熵（比特/字节）"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+    if not sample:
+        return 0.0
+    total = len(sample)
+    entropy = 0.0
+    for count in Counter(sample).values():
+        p = count / total
+        entropy -= p * math.log2(p)
+    return entropy
+
+
+class CompressionPolicy:
+    """按文件决定压缩方式和 DEFLATE 级别
+
+    判断顺序：
+        1. rules 中第一个匹配归档内路径的 glob 规则，级别 0 表示 STORE
+        2. 后缀在 store_extensions 中的文件使用 STORE
+        3. 采样熵超过 entropy_threshold 的文件使用 STORE
+        4. 其余文件使用默认级别 DEFLATE
+
+    Args:
+        level: 默认 DEFLATE 级别 (1-9)，为None时使用 zlib 默认级别
+        store_extensions: 直接存储的文件后缀列表
+        rules: (glob 模式, 级别) 列表
+        entropy_threshold: 熵阈值，为None时不做熵采样
+    """
+
+    def __init__(
+        self,
+        level: Optional[int] = None,
+        store_extensions: Optional[List[str]] = None,
+        rules: Optional[List[Tuple[str, int]]] = None,
+        entropy_threshold: Optional[float] = DEFAULT_ENTROPY_THRESHOLD
+    ):
+        if level is not None and not 0 <= level <= 9:
+            raise ValueError(f"无效的压缩级别: {level}")
+        for pattern, rule_level in rules or []:
+            if not 0 <= rule_level <= 9:
+                raise ValueError(f"无效的压缩级别: {pattern}={rule_level}")
+        self.level = level
+        if store_extensions is None:
+            store_extensions = DEFAULT_STORE_EXTENSIONS
+        self.store_extensions = {ext.lower() if ext.startswith('.') else f".{ext.lower()}" for ext in store_extensions}
+        self.rules = list(rules or [])
+        self.entropy_threshold = entropy_threshold
+
+    @classmethod
+    def from_config(cls, config_path: str) -> 'CompressionPolicy':
+        """从 JSON 配置文件创建策略
+
+        配置示例::
+
+            {
+                "level": 6,
+                "store_extensions": [".png", ".woff2"],
+                "entropy_threshold": 7.5,
+                "rules": {"*.js": 9, "models/*": 0}
+            }
+        """
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        rules = config.get('rules', {})
+        if isinstance(rules, dict):
+            rules = list(rules.items())
+        return cls(
+            level=config.get('level'),
+            store_extensions=config.get('store_extensions'),
+            rules=[(pattern, int(level)) for pattern, level in rules],
+            entropy_threshold=config.get('entropy_threshold', DEFAULT_ENTROPY_THRESHOLD)
+        )
+
+    def decide(self, arc_name: str, file_path: str) -> Tuple[int, Optional[int]]:
+        """决定单个文件的压缩方式
+
+        Returns:
+            Tuple[int, Optional[int]]: (压缩方式, DEFLATE 级别)
+        """
+        name = arc_name.replace(os.sep, '/')
+        for pattern, level in self.rules:
+            if fnmatch.fnmatch(name, pattern):
+                if level == 0:
+                    return zipfile.ZIP_STORED, None
+                return zipfile.ZIP_DEFLATED, level
+        if os.path.splitext(name)[1].lower() in self.store_extensions:
+            return zipfile.ZIP_STORED, None
+        if self.entropy_threshold is not None:
+            try:
+                if sample_entropy(file_path) > self.entropy_threshold:
+                    return zipfile.ZIP_STORED, None
+            except OSError:
+                pass
+        if self.level == 0:
+            return zipfile.ZIP_STORED, None
+        return zipfile.ZIP_DEFLATED, self.level
+
+
+class CompressionReport:
+    """按文件类型统计压缩收益和 CPU 耗时（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def file_type(arc_name: str) -> str:
+        ext = os.path.splitext(arc_name)[1].lower()
+        return ext or '(无后缀)'
+
+    def record(self, arc_name: str, compress_type: int, file_size: int, compress_size: int, cpu_time: float) -> None:
+        key = self.file_type(arc_name)
+        with self._lock:
+            item = self.stats.setdefault(key, {
+                'files': 0, 'stored': 0, 'original': 0, 'compressed': 0, 'cpu_time': 0.0
+            })
+            item['files'] += 1
+            if compress_type == zipfile.ZIP_STORED:
+                item['stored'] += 1
+            item['original'] += file_size
+            item['compressed'] += compress_size
+            item['cpu_time'] += cpu_time
+
+    def format(self) -> str:
+        """生成按节省字节数排序的报告文本"""
+        lines = [f"{'类型':<12}{'文件数':>8}{'存储':>6}{'原始字节':>14}{'压缩后字节':>14}{'节省字节':>14}{'CPU(秒)':>10}{'KB/CPU秒':>12}"]
+        rows = sorted(self.stats.items(), key=lambda kv: kv[1]['original'] - kv[1]['compressed'], reverse=True)
+        for key, item in rows:
+            saved = item['original'] - item['compressed']
+            efficiency = (saved / 1024 / item['cpu_time']) if item['cpu_time'] > 0 else 0.0
+            lines.append(
+                f"{key:<12}{item['files']:>8}{item['stored']:>6}{item['original']:>14}"
+                f"{item['compressed']:>14}{saved:>14}{item['cpu_time']:>10.3f}{efficiency:>12.1f}"
+            )
+        return '\n'.join(lines)
+
+    def log(self) -> None:
+        logging.info("压缩报告:\n" + self.format())
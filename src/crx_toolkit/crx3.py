@@ -0,0 +1,248 @@
+import struct
+import hashlib
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives.asymmetric import utils as asym_utils
+
+# CRX 文件魔数与版本
+CRX_MAGIC = b'Cr24'
+CRX3_VERSION = 3
+
+# CRX3 签名数据的前缀（包含结尾的 \0）
+SIGNATURE_CONTEXT = b'CRX3 SignedData\x00'
+
+# CrxFileHeader / AsymmetricKeyProof / SignedData 的字段编号
+FIELD_SHA256_WITH_RSA = 2
+FIELD_SHA256_WITH_ECDSA = 3
+FIELD_SIGNED_HEADER_DATA = 10000
+FIELD_PUBLIC_KEY = 1
+FIELD_SIGNATURE = 2
+FIELD_CRX_ID = 1
+
+# protobuf 的 wire type
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LENGTH_DELIMITED = 2
+WIRE_FIXED32 = 5
+
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("protobuf varint 不完整")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("protobuf varint 过长")
+
+
+def _encode_bytes_field(field: int, value: bytes) -> bytes:
+    return _encode_varint((field << 3) | WIRE_LENGTH_DELIMITED) + _encode_varint(len(value)) + value
+
+
+def _iter_fields(data: bytes):
+    """遍历 protobuf 消息，产出 (字段编号, wire type, 值)"""
+    pos = 0
+    while pos < len(data):
+        key, pos = _decode_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == WIRE_VARINT:
+            value, pos = _decode_varint(data, pos)
+        elif wire_type == WIRE_LENGTH_DELIMITED:
+            length, pos = _decode_varint(data, pos)
+            if pos + length > len(data):
+                raise ValueError("protobuf 字段长度越界")
+            value = data[pos:pos + length]
+            pos += length
+        elif wire_type == WIRE_FIXED64:
+            value = data[pos:pos + 8]
+            pos += 8
+        elif wire_type == WIRE_FIXED32:
+            value = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"不支持的 protobuf wire type: {wire_type}")
+        yield field, wire_type, value
+
+
+def crx_id_from_public_key(public_key_der: bytes) -> bytes:
+    """CRX ID：公钥 (SubjectPublicKeyInfo DER) SHA-256 的前 16 字节"""
+    return hashlib.sha256(public_key_der).digest()[:16]
+
+
+def extension_id_from_crx_id(crx_id: bytes) -> str:
+    """将 CRX ID 转换为 Chrome 扩展 ID（十六进制数字 0-f 映射为 a-p）"""
+    return ''.join(chr(ord('a') + int(c, 16)) for c in crx_id.hex())
+
+
+def extension_id_from_public_key(public_key_der: bytes) -> str:
+    """根据公钥计算 Chrome 扩展 ID"""
+    return extension_id_from_crx_id(crx_id_from_public_key(public_key_der))
+
+
+def encode_signed_data(crx_id: bytes) -> bytes:
+    """编码 SignedData 消息"""
+    return _encode_bytes_field(FIELD_CRX_ID, crx_id)
+
+
+def encode_header(
+    proofs: List[Tuple[bytes, bytes]],
+    signed_header_data: bytes,
+    ecdsa_proofs: Optional[List[Tuple[bytes, bytes]]] = None
+) -> bytes:
+    """编码 CrxFileHeader 消息
+
+    Args:
+        proofs: sha256_with_rsa 的 (公钥, 签名) 列表
+        signed_header_data: 已编码的 SignedData
+        ecdsa_proofs: sha256_with_ecdsa 的 (公钥, 签名) 列表
+    """
+    out = bytearray()
+    for field, items in ((FIELD_SHA256_WITH_RSA, proofs), (FIELD_SHA256_WITH_ECDSA, ecdsa_proofs or [])):
+        for public_key, signature in items:
+            proof = _encode_bytes_field(FIELD_PUBLIC_KEY, public_key) + _encode_bytes_field(FIELD_SIGNATURE, signature)
+            out += _encode_bytes_field(field, proof)
+    out += _encode_bytes_field(FIELD_SIGNED_HEADER_DATA, signed_header_data)
+    return bytes(out)
+
+
+def _decode_proof(data: bytes) -> Tuple[bytes, bytes]:
+    public_key = b''
+    signature = b''
+    for field, wire_type, value in _iter_fields(data):
+        if wire_type != WIRE_LENGTH_DELIMITED:
+            continue
+        if field == FIELD_PUBLIC_KEY:
+            public_key = value
+        elif field == FIELD_SIGNATURE:
+            signature = value
+    return public_key, signature
+
+
+def decode_header(header: bytes) -> Dict[str, Any]:
+    """解码 CrxFileHeader 消息
+
+    Returns:
+        dict: 包含 sha256_with_rsa / sha256_with_ecdsa 的 (公钥, 签名) 列表、
+        signed_header_data 原始字节以及其中的 crx_id
+    """
+    result = {
+        'sha256_with_rsa': [],
+        'sha256_with_ecdsa': [],
+        'signed_header_data': b'',
+        'crx_id': None,
+    }
+    for field, wire_type, value in _iter_fields(header):
+        if wire_type != WIRE_LENGTH_DELIMITED:
+            continue
+        if field == FIELD_SHA256_WITH_RSA:
+            result['sha256_with_rsa'].append(_decode_proof(value))
+        elif field == FIELD_SHA256_WITH_ECDSA:
+            result['sha256_with_ecdsa'].append(_decode_proof(value))
+        elif field == FIELD_SIGNED_HEADER_DATA:
+            result['signed_header_data'] = value
+            for sub_field, sub_type, sub_value in _iter_fields(value):
+                if sub_field == FIELD_CRX_ID and sub_type == WIRE_LENGTH_DELIMITED:
+                    result['crx_id'] = sub_value
+    return result
+
+
+def signature_prefix(signed_header_data: bytes) -> bytes:
+    """签名输入中位于 ZIP 数据之前的部分"""
+    return SIGNATURE_CONTEXT + struct.pack('<I', len(signed_header_data)) + signed_header_data
+
+
+class KeySigner:
+    """使用本地 RSA 私钥对 CRX3 签名摘要进行签名
+
+    Args:
+        private_key: RSA 私钥
+    """
+
+    def __init__(self, private_key: rsa.RSAPrivateKey):
+        self.private_key = private_key
+        self.public_key_der = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.DER,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        self.signature_size = private_key.key_size // 8
+
+    def sign_digest(self, digest: bytes) -> bytes:
+        """对 SHA-256 摘要签名 (RSASSA-PKCS1-v1_5)"""
+        return self.private_key.sign(
+            digest,
+            padding.PKCS1v15(),
+            asym_utils.Prehashed(hashes.SHA256())
+        )
+
+
+def write_crx3(
+    fp: BinaryIO,
+    write_archive: Callable[[BinaryIO, Any], int],
+    signer: Optional[KeySigner] = None
+) -> int:
+    """写出 CRX3 文件
+
+    头部长度只取决于公钥和签名长度，因此先预留头部空间，再由 write_archive
+    把 ZIP 数据写到头部之后。write_archive 会收到一个增量 SHA-256 对象，
+    写出的每个字节都同时送入哈希，签名摘要随压缩一起完成计算，最后回写
+    真实头部。
+
+    Args:
+        fp: 可 seek 的输出文件对象，从位置 0 开始写入
+        write_archive: 回调 (fp, hasher) -> 写出的 ZIP 字节数
+        signer: 签名器，为None时生成不含签名证明的头部
+
+    Returns:
+        int: 写出的 ZIP 数据字节数
+    """
+    if signer is not None:
+        signed_header_data = encode_signed_data(crx_id_from_public_key(signer.public_key_der))
+        placeholder = [(signer.public_key_der, b'\0' * signer.signature_size)]
+    else:
+        signed_header_data = b''
+        placeholder = []
+    header = encode_header(placeholder, signed_header_data)
+    start = fp.tell()
+    fp.write(b'\0' * (12 + len(header)))
+
+    digest = hashes.Hash(hashes.SHA256())
+    digest.update(signature_prefix(signed_header_data))
+    zip_size = write_archive(fp, digest)
+
+    proofs = []
+    if signer is not None:
+        signature = signer.sign_digest(digest.finalize())
+        if len(signature) != signer.signature_size:
+            raise ValueError("签名长度与预留的头部空间不一致")
+        proofs.append((signer.public_key_der, signature))
+    final_header = encode_header(proofs, signed_header_data)
+    if len(final_header) != len(header):
+        raise ValueError("CRX 头部长度与预留空间不一致")
+
+    end = fp.tell()
+    fp.seek(start)
+    fp.write(CRX_MAGIC)
+    fp.write(struct.pack('<II', CRX3_VERSION, len(final_header)))
+    fp.write(final_header)
+    fp.seek(end)
+    return zip_size
@@ -0,0 +1,208 @@
+import io
+import os
+import mmap
+import struct
+import zipfile
+from typing import Any, Dict, Optional
+from .crx3 import CRX_MAGIC, decode_header
+
+# 本地文件头和中央目录结束记录的签名
+LOCAL_FILE_HEADER = b'PK\x03\x04'
+END_OF_CENTRAL_DIR = b'PK\x05\x06'
+ZIP64_END_LOCATOR = b'PK\x06\x07'
+ZIP64_END_OF_CENTRAL_DIR = b'PK\x06\x06'
+
+# EOCD 固定部分 22 字节，之后最多 65535 字节的注释
+EOCD_SIZE = 22
+MAX_EOCD_SEARCH = EOCD_SIZE + 0xFFFF
+
+
+class PayloadView(io.RawIOBase):
+    """映射内存上的只读、可 seek 文件对象，read 只复制请求的字节
+
+    Args:
+        buffer: 负载数据的 memoryview
+    """
+
+    def __init__(self, buffer: memoryview):
+        super().__init__()
+        self._buffer = buffer
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._buffer) + offset
+        else:
+            raise ValueError(f"不支持的 whence: {whence}")
+        if pos < 0:
+            raise ValueError("seek 位置不能为负数")
+        self._pos = pos
+        return pos
+
+    def readinto(self, b) -> int:
+        data = self._buffer[self._pos:self._pos + len(b)]
+        n = len(data)
+        b[:n] = data
+        self._pos += n
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._buffer) if size is None or size < 0 else min(len(self._buffer), self._pos + size)
+        data = bytes(self._buffer[self._pos:end])
+        self._pos = max(self._pos, end)
+        return data
+
+    def close(self) -> None:
+        if not self.closed:
+            self._buffer.release()
+        super().close()
+
+
+class CrxReader:
+    """通过 mmap 读取 CRX 文件，按头部字段直接定位 ZIP 负载
+
+    CRX2 的负载偏移为 16 + 公钥长度 + 签名长度，CRX3 为 12 + 头部长度，
+    普通 ZIP 文件为 0。头部字段与负载不符时，根据中央目录结束记录
+    (EOCD) 推算 ZIP 起始位置，不做线性扫描。负载以 memoryview 和
+    PayloadView 的形式提供，不复制数据。
+
+    Args:
+        path: CRX 或 ZIP 文件路径
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.format_version: Optional[int] = None
+        self.header: Dict[str, Any] = {}
+        self._views = []
+        self._file = open(path, 'rb')
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            if self.size == 0:
+                raise ValueError("文件为空")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        try:
+            self.payload_offset = self._locate_payload()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse_header(self) -> Optional[int]:
+        """根据头部字段计算负载偏移，不是 CRX/ZIP 文件时返回None"""
+        mm = self._mm
+        if mm[:4] == LOCAL_FILE_HEADER:
+            return 0
+        if mm[:4] != CRX_MAGIC or self.size < 12:
+            return None
+        version = struct.unpack_from('<I', mm, 4)[0]
+        self.format_version = version
+        if version == 3:
+            return 12 + struct.unpack_from('<I', mm, 8)[0]
+        if version == 2 and self.size >= 16:
+            public_key_size, signature_size = struct.unpack_from('<II', mm, 8)
+            return 16 + public_key_size + signature_size
+        return None
+
+    def _decode_header(self) -> Dict[str, Any]:
+        """解码头部中的公钥和签名，头部损坏时返回空字典"""
+        mm = self._mm
+        try:
+            if self.format_version == 3:
+                header_size = struct.unpack_from('<I', mm, 8)[0]
+                return decode_header(mm[12:12 + header_size])
+            if self.format_version == 2:
+                public_key_size, signature_size = struct.unpack_from('<II', mm, 8)
+                return {
+                    'public_key': mm[16:16 + public_key_size],
+                    'signature': mm[16 + public_key_size:16 + public_key_size + signature_size],
+                }
+        except ValueError:
+            pass
+        return {}
+
+    def _find_zip_start(self) -> int:
+        """根据 EOCD 记录中的中央目录大小和偏移推算 ZIP 起始位置"""
+        mm = self._mm
+        eocd = mm.rfind(END_OF_CENTRAL_DIR, max(0, self.size - MAX_EOCD_SEARCH))
+        if eocd < 0 or eocd + EOCD_SIZE > self.size:
+            raise ValueError("找不到 ZIP 中央目录结束记录")
+        cd_size, cd_offset = struct.unpack_from('<II', mm, eocd + 12)
+        cd_end = eocd
+        if cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+            locator = eocd - 20
+            if locator < 0 or mm[locator:locator + 4] != ZIP64_END_LOCATOR:
+                raise ValueError("ZIP64 定位记录缺失")
+            # ZIP64 EOCD 记录紧挨在定位记录之前（不含扩展数据时为 56 字节）
+            record = locator - 56
+            if record < 0 or mm[record:record + 4] != ZIP64_END_OF_CENTRAL_DIR:
+                raise ValueError("ZIP64 中央目录结束记录缺失")
+            cd_size, cd_offset = struct.unpack_from('<QQ', mm, record + 40)
+            cd_end = record
+        start = cd_end - cd_size - cd_offset
+        if start < 0:
+            raise ValueError("ZIP 中央目录偏移无效")
+        return start
+
+    def _locate_payload(self) -> int:
+        offset = self._parse_header()
+        if offset is not None and offset < self.size:
+            signature = self._mm[offset:offset + 4]
+            if signature in (LOCAL_FILE_HEADER, END_OF_CENTRAL_DIR):
+                self.header = self._decode_header()
+                return offset
+        return self._find_zip_start()
+
+    def payload(self) -> memoryview:
+        """ZIP 负载的 memoryview（不复制），使用完毕后需要 release 或关闭读取器"""
+        view = memoryview(self._mm)[self.payload_offset:]
+        self._views.append(view)
+        return view
+
+    def open(self) -> PayloadView:
+        """以可 seek 的只读文件对象打开 ZIP 负载"""
+        view = PayloadView(memoryview(self._mm)[self.payload_offset:])
+        self._views.append(view)
+        return view
+
+    def open_zip(self) -> zipfile.ZipFile:
+        """以 zipfile.ZipFile 打开 ZIP 负载，只读取中央目录"""
+        return zipfile.ZipFile(self.open(), 'r')
+
+    def close(self) -> None:
+        for view in self._views:
+            if isinstance(view, memoryview):
+                view.release()
+            else:
+                view.close()
+        self._views = []
+        mm = getattr(self, '_mm', None)
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                # 调用方仍持有负载的切片，映射在这些切片被回收后释放
+                pass
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self) -> 'CrxReader':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
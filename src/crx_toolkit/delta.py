@@ -0,0 +1,484 @@
+import os
+import json
+import lzma
+import time
+import zlib
+import struct
+import hashlib
+import logging
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from cryptography.hazmat.primitives.asymmetric import rsa
+from .crx_reader import CrxReader
+from .crx3 import KeySigner
+from .extractor import data_offset
+from .packer import sign_payload
+from .sign_server import RemoteSigner
+
+# 补丁文件的魔数和格式版本
+DELTA_MAGIC = b'CRXDELTA'
+DELTA_VERSION = 1
+
+# 查找重复内容时的块大小
+BLOCK_SIZE = 16
+
+# 复制未变化的数据时每次产出的字节数
+CHUNK_SIZE = 1024 * 1024
+
+# 尝试复现原 DEFLATE 数据时使用的 (压缩级别, memLevel) 组合，常见的放在前面
+DEFLATE_PARAMS = [(level, mem_level) for mem_level in (8, 9) for level in (6, 9, 1, 2, 3, 4, 5, 7, 8)]
+
+# 差异指令
+OP_COPY = 0
+OP_INSERT = 1
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("差异数据不完整")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _match_length(a: bytes, ai: int, b: bytes, bi: int) -> int:
+    """a[ai:] 与 b[bi:] 公共前缀的长度，按倍增步长比较切片，最后二分定位"""
+    limit = min(len(a) - ai, len(b) - bi)
+    matched = 0
+    step = 64
+    while matched < limit:
+        size = min(step, limit - matched)
+        if a[ai + matched:ai + matched + size] == b[bi + matched:bi + matched + size]:
+            matched += size
+            step *= 2
+            continue
+        lo, hi = 0, size
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if a[ai + matched:ai + matched + mid] == b[bi + matched:bi + matched + mid]:
+                lo = mid
+            else:
+                hi = mid
+        return matched + lo
+    return matched
+
+
+def encode_delta(source: bytes, target: bytes) -> bytes:
+    """生成把 source 变为 target 的差异（复制 / 插入指令序列）
+
+    source 按 BLOCK_SIZE 对齐分块建立索引，逐字节扫描 target 查找相同的块，
+    命中后向前、向后扩展匹配区域，未匹配的字节作为插入数据。
+    """
+    out = bytearray()
+
+    def insert(start: int, end: int) -> None:
+        if end > start:
+            out.append(OP_INSERT)
+            _write_varint(out, end - start)
+            out.extend(target[start:end])
+
+    index: Dict[bytes, int] = {}
+    for i in range(0, len(source) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        index.setdefault(source[i:i + BLOCK_SIZE], i)
+    if not index:
+        insert(0, len(target))
+        return bytes(out)
+
+    pending = 0
+    j = 0
+    n = len(target)
+    while j + BLOCK_SIZE <= n:
+        i = index.get(target[j:j + BLOCK_SIZE])
+        if i is None:
+            j += 1
+            continue
+        s, t = i, j
+        while s > 0 and t > pending and source[s - 1] == target[t - 1]:
+            s -= 1
+            t -= 1
+        length = (j - t) + BLOCK_SIZE + _match_length(source, i + BLOCK_SIZE, target, j + BLOCK_SIZE)
+        insert(pending, t)
+        out.append(OP_COPY)
+        _write_varint(out, s)
+        _write_varint(out, length)
+        pending = j = t + length
+    insert(pending, n)
+    return bytes(out)
+
+
+def decode_delta(source: bytes, delta: bytes) -> bytes:
+    """将 encode_delta 生成的差异应用到 source"""
+    out = bytearray()
+    pos = 0
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op == OP_COPY:
+            offset, pos = _read_varint(delta, pos)
+            length, pos = _read_varint(delta, pos)
+            if offset + length > len(source):
+                raise ValueError("差异中的复制范围超出源数据")
+            out += source[offset:offset + length]
+        elif op == OP_INSERT:
+            length, pos = _read_varint(delta, pos)
+            if pos + length > len(delta):
+                raise ValueError("差异数据不完整")
+            out += delta[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError(f"未知的差异指令: {op}")
+    return bytes(out)
+
+
+def _layout(payload: memoryview, zf: zipfile.ZipFile) -> Tuple[List[Tuple[int, int, zipfile.ZipInfo]], bytes]:
+    """拆分 ZIP 负载
+
+    Returns:
+        tuple: 按位置排序的成员数据区 [(起始位置, 长度, ZipInfo)]，以及其余字节
+        （本地文件头、数据描述符、中央目录等）按顺序拼接的结果。数据区重叠
+        或越界时不拆分，整个负载都作为其余字节。
+    """
+    regions = []
+    try:
+        for info in zf.infolist():
+            if info.compress_size:
+                regions.append((data_offset(payload, info), info.compress_size, info))
+    except zipfile.BadZipFile:
+        regions = []
+    regions.sort(key=lambda region: region[0])
+    end = 0
+    for start, length, _ in regions:
+        if start < end or start + length > len(payload):
+            regions = []
+            break
+        end = start + length
+
+    other = bytearray()
+    pos = 0
+    for start, length, _ in regions:
+        other += payload[pos:start]
+        pos = start + length
+    other += payload[pos:]
+    return regions, bytes(other)
+
+
+def _member_content(raw: bytes, info: zipfile.ZipInfo) -> bytes:
+    """成员解压后的内容，作为差异的基准；无法解压时返回空字节"""
+    if info.flag_bits & 0x1:
+        return b''
+    if info.compress_type == zipfile.ZIP_STORED:
+        return raw
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        try:
+            return zlib.decompress(raw, -zlib.MAX_WBITS)
+        except zlib.error:
+            return b''
+    return b''
+
+
+def _deflate(content: bytes, level: int, mem_level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, mem_level)
+    return compressor.compress(content) + compressor.flush()
+
+
+def _encode_member(
+    raw: bytes,
+    info: zipfile.ZipInfo,
+    base: Optional[int],
+    base_raw: bytes,
+    base_info: Optional[zipfile.ZipInfo],
+    blobs: List[bytes],
+    recompress: bool = True
+) -> Dict[str, Any]:
+    """为变化的成员生成补丁区域
+
+    存储的成员直接对内容做差异；recompress 为 True 且 DEFLATE 成员能以某个
+    zlib 参数复现原压缩数据时对解压后的内容做差异，应用时重新压缩；否则
+    对压缩数据本身做差异。
+    """
+    region: Dict[str, Any] = {'base': base, 'length': len(raw)}
+    base_content = _member_content(base_raw, base_info) if base_info is not None else b''
+    if not info.flag_bits & 0x1:
+        if info.compress_type == zipfile.ZIP_STORED:
+            region['type'] = 'stored'
+            blobs.append(encode_delta(base_content, raw))
+            region['delta'] = len(blobs) - 1
+            return region
+        if info.compress_type == zipfile.ZIP_DEFLATED and recompress:
+            content = _member_content(raw, info)
+            for level, mem_level in DEFLATE_PARAMS:
+                if _deflate(content, level, mem_level) == raw:
+                    region.update(type='deflate', level=level, mem_level=mem_level)
+                    blobs.append(encode_delta(base_content, content))
+                    region['delta'] = len(blobs) - 1
+                    return region
+            logging.debug(f"无法复现 DEFLATE 数据，改为对压缩数据做差异: {info.filename}")
+    region['type'] = 'raw'
+    blobs.append(encode_delta(base_raw, raw))
+    region['delta'] = len(blobs) - 1
+    return region
+
+
+def make_delta(old_path: str, new_path: str, patch_path: str, recompress: bool = True) -> Dict[str, Any]:
+    """生成从旧版本到新版本的差异补丁
+
+    新版本中与旧版本压缩数据完全相同的成员记录为对旧文件的引用；变化的
+    成员对解压后的内容生成二进制差异；文件头和中央目录等其余字节整体对
+    旧版本做差异。补丁记录两侧 ZIP 负载的 SHA-256，应用时据此校验。
+
+    对解压内容做差异的 DEFLATE 成员在应用时需要重新压缩，只有相同版本的
+    zlib 才能保证得到完全相同的字节（zlib-ng、Chromium 的 zlib 等输出不同）。
+    此时补丁记录生成时的 zlib 版本，apply_delta 在版本不一致时拒绝应用；
+    recompress 为 False 时只对压缩数据做差异，补丁更大但不依赖 zlib 版本。
+
+    Args:
+        old_path: 旧版本 CRX/ZIP 文件
+        new_path: 新版本 CRX/ZIP 文件
+        patch_path: 输出的补丁文件
+        recompress: 是否允许应用时重新压缩 DEFLATE 成员
+
+    Returns:
+        dict: source_size、target_size、patch_size、copied、changed、added、seconds
+    """
+    start_time = time.perf_counter()
+    with CrxReader(old_path) as old_reader, old_reader.open_zip() as old_zf, \
+            CrxReader(new_path) as new_reader, new_reader.open_zip() as new_zf:
+        old_payload = old_reader.payload()
+        new_payload = new_reader.payload()
+        old_regions, old_other = _layout(old_payload, old_zf)
+        new_regions, new_other = _layout(new_payload, new_zf)
+
+        by_raw: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        by_name: Dict[str, int] = {}
+        for index, (start, length, info) in enumerate(old_regions):
+            by_raw.setdefault((info.CRC, length), []).append((start, length))
+            by_name.setdefault(info.filename, index)
+
+        blobs: List[bytes] = []
+        regions: List[Dict[str, Any]] = []
+        copied = changed = added = 0
+        pos = 0
+        for start, length, info in new_regions:
+            if start > pos:
+                regions.append({'type': 'other', 'length': start - pos})
+            raw = new_payload[start:start + length]
+            source = next((s for s, l in by_raw.get((info.CRC, length), []) if old_payload[s:s + l] == raw), None)
+            if source is not None:
+                if regions and regions[-1]['type'] == 'copy' and \
+                        regions[-1]['offset'] + regions[-1]['length'] == source:
+                    regions[-1]['length'] += length
+                else:
+                    regions.append({'type': 'copy', 'offset': source, 'length': length})
+                copied += 1
+            else:
+                base = by_name.get(info.filename)
+                if base is None:
+                    base_raw, base_info = b'', None
+                    added += 1
+                else:
+                    base_start, base_length, base_info = old_regions[base]
+                    base_raw = bytes(old_payload[base_start:base_start + base_length])
+                    changed += 1
+                regions.append(_encode_member(bytes(raw), info, base, base_raw, base_info, blobs, recompress))
+            raw.release()
+            pos = start + length
+        if pos < len(new_payload):
+            regions.append({'type': 'other', 'length': len(new_payload) - pos})
+        blobs.append(encode_delta(old_other, new_other))
+
+        header = {
+            'version': DELTA_VERSION,
+            'source': {'size': len(old_payload), 'sha256': hashlib.sha256(old_payload).hexdigest()},
+            'target': {'size': len(new_payload), 'sha256': hashlib.sha256(new_payload).hexdigest()},
+            'regions': regions,
+            'other': len(blobs) - 1,
+            'blobs': [len(blob) for blob in blobs],
+        }
+        if any(region['type'] == 'deflate' for region in regions):
+            header['zlib'] = zlib.ZLIB_RUNTIME_VERSION
+        source_size = len(old_payload)
+        target_size = len(new_payload)
+        old_payload.release()
+        new_payload.release()
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    body = struct.pack('<I', len(header_bytes)) + header_bytes + b''.join(blobs)
+    directory = os.path.dirname(os.path.abspath(patch_path))
+    os.makedirs(directory, exist_ok=True)
+    with open(patch_path, 'wb') as f:
+        f.write(DELTA_MAGIC)
+        f.write(lzma.compress(body))
+    patch_size = os.path.getsize(patch_path)
+    logging.info(f"补丁已生成: {patch_path} ({patch_size} 字节，目标 {target_size} 字节)")
+    return {
+        'source_size': source_size,
+        'target_size': target_size,
+        'patch_size': patch_size,
+        'copied': copied,
+        'changed': changed,
+        'added': added,
+        'seconds': time.perf_counter() - start_time,
+    }
+
+
+def read_delta(patch_path: str) -> Tuple[Dict[str, Any], List[bytes]]:
+    """读取补丁文件，返回 (头部, 差异数据列表)"""
+    with open(patch_path, 'rb') as f:
+        if f.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+            raise ValueError("不是有效的补丁文件（魔数不匹配）")
+        body = lzma.decompress(f.read())
+    header_size = struct.unpack_from('<I', body, 0)[0]
+    header = json.loads(body[4:4 + header_size].decode('utf-8'))
+    if header.get('version') != DELTA_VERSION:
+        raise ValueError(f"不支持的补丁版本: {header.get('version')}")
+    blobs = []
+    pos = 4 + header_size
+    for size in header['blobs']:
+        blobs.append(body[pos:pos + size])
+        pos += size
+    if pos != len(body):
+        raise ValueError("补丁数据长度不一致")
+    return header, blobs
+
+
+def _rebuild(
+    header: Dict[str, Any],
+    blobs: List[bytes],
+    payload: memoryview,
+    old_regions: List[Tuple[int, int, zipfile.ZipInfo]],
+    other: bytes
+) -> Iterator[bytes]:
+    """按补丁区域顺序产出目标 ZIP 负载"""
+    other_pos = 0
+    for region in header['regions']:
+        kind = region['type']
+        if kind == 'other':
+            yield other[other_pos:other_pos + region['length']]
+            other_pos += region['length']
+        elif kind == 'copy':
+            end = region['offset'] + region['length']
+            if end > len(payload):
+                raise ValueError("补丁中的复制范围超出源文件")
+            for pos in range(region['offset'], end, CHUNK_SIZE):
+                yield bytes(payload[pos:min(pos + CHUNK_SIZE, end)])
+        else:
+            base_raw, base_info = b'', None
+            if region['base'] is not None:
+                base_start, base_length, base_info = old_regions[region['base']]
+                base_raw = bytes(payload[base_start:base_start + base_length])
+            delta = blobs[region['delta']]
+            if kind == 'raw':
+                data = decode_delta(base_raw, delta)
+            else:
+                base_content = _member_content(base_raw, base_info) if base_info is not None else b''
+                data = decode_delta(base_content, delta)
+                if kind == 'deflate':
+                    data = _deflate(data, region['level'], region['mem_level'])
+                elif kind != 'stored':
+                    raise ValueError(f"未知的补丁区域类型: {kind}")
+            if len(data) != region['length']:
+                raise ValueError("重建的成员数据长度与补丁记录不一致")
+            yield data
+    if other_pos != len(other):
+        raise ValueError("补丁中的其余数据长度不一致")
+
+
+def apply_delta(
+    old_path: str,
+    patch_path: str,
+    output_path: str,
+    private_key: Optional[rsa.RSAPrivateKey] = None,
+    signer: Optional[Union[KeySigner, RemoteSigner]] = None
+) -> Dict[str, Any]:
+    """将补丁应用到旧版本，重建与新版本完全相同的 ZIP 负载
+
+    提供私钥或签名器时通过 packer.sign_payload 重新签名并写出 CRX3 文件，
+    否则写出 ZIP 文件。数据先写到 <output_path>.tmp，SHA-256 与补丁记录一致后
+    才替换 output_path，因此校验失败时不会破坏已有文件，output_path 也可以是
+    旧版本文件本身。
+
+    Args:
+        old_path: 旧版本 CRX/ZIP 文件
+        patch_path: 补丁文件
+        output_path: 输出文件路径
+        private_key: 签名私钥
+        signer: 签名器（例如连接签名服务的 RemoteSigner），优先于 private_key
+
+    Returns:
+        dict: output、size、sha256、signed、seconds
+
+    Raises:
+        ValueError: 补丁记录的 zlib 版本与当前不一致、旧版本文件不匹配或重建结果不一致
+    """
+    start_time = time.perf_counter()
+    header, blobs = read_delta(patch_path)
+    if header.get('zlib') and header['zlib'] != zlib.ZLIB_RUNTIME_VERSION:
+        raise ValueError(
+            f"补丁需要用 zlib {header['zlib']} 重新压缩成员，当前为 {zlib.ZLIB_RUNTIME_VERSION}，"
+            f"无法保证重建结果一致；请用 make-delta --no-recompress 重新生成补丁"
+        )
+    with CrxReader(old_path) as reader, reader.open_zip() as zf:
+        payload = reader.payload()
+        try:
+            if len(payload) != header['source']['size'] or \
+                    hashlib.sha256(payload).hexdigest() != header['source']['sha256']:
+                raise ValueError("旧版本文件与补丁的源文件不一致")
+            old_regions, old_other = _layout(payload, zf)
+            other = decode_delta(old_other, blobs[header['other']])
+
+            digest = hashlib.sha256()
+            size = 0
+
+            def chunks() -> Iterator[bytes]:
+                nonlocal size
+                for chunk in _rebuild(header, blobs, payload, old_regions, other):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    yield chunk
+
+            directory = os.path.dirname(os.path.abspath(output_path))
+            os.makedirs(directory, exist_ok=True)
+            signed = private_key is not None or signer is not None
+            temp_output = output_path + '.tmp'
+            try:
+                if signed:
+                    sign_payload(temp_output, chunks(), private_key=private_key, signer=signer)
+                else:
+                    with open(temp_output, 'wb') as f:
+                        for chunk in chunks():
+                            f.write(chunk)
+                if size != header['target']['size'] or digest.hexdigest() != header['target']['sha256']:
+                    raise ValueError("重建的文件与补丁记录的目标不一致")
+            except Exception:
+                if os.path.exists(temp_output):
+                    os.remove(temp_output)
+                raise
+        finally:
+            payload.release()
+    # 旧版本文件关闭后再替换，output_path 与旧版本相同时也能覆盖
+    os.replace(temp_output, output_path)
+    logging.info(f"补丁已应用: {output_path}")
+    return {
+        'output': output_path,
+        'size': size,
+        'sha256': digest.hexdigest(),
+        'signed': signed,
+        'seconds': time.perf_counter() - start_time,
+    }
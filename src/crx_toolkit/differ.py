@@ -0,0 +1,224 @@
+import os
+import json
+import difflib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from .crx_reader import CrxReader
+from .metadata import manifest_permissions
+
+# 内容差异只对不超过该大小的文本成员生成
+MAX_TEXT_DIFF_SIZE = 4 * 1024 * 1024
+
+# 摘要中单独列出的 manifest 字段，其余字段只报告名称
+MANIFEST_SUMMARY_KEYS = ('version', 'manifest_version', 'minimum_chrome_version', 'content_security_policy')
+
+
+def _members(zf: zipfile.ZipFile) -> Dict[str, zipfile.ZipInfo]:
+    return {info.filename: info for info in zf.infolist() if not info.is_dir()}
+
+
+def _load_manifest(zf: zipfile.ZipFile) -> Dict[str, Any]:
+    try:
+        manifest = json.loads(zf.read('manifest.json').decode('utf-8-sig'))
+    except (KeyError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _manifest_changes(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """比较两个 manifest：版本等关键字段、新增/移除的权限和主机权限、其他变化的字段"""
+    old_permissions = set(manifest_permissions(old))
+    new_permissions = set(manifest_permissions(new))
+    added = new_permissions - old_permissions
+    removed = old_permissions - new_permissions
+    fields = {}
+    for key in MANIFEST_SUMMARY_KEYS:
+        if old.get(key) != new.get(key):
+            fields[key] = {'old': old.get(key), 'new': new.get(key)}
+    skipped = set(MANIFEST_SUMMARY_KEYS) | {
+        'permissions', 'optional_permissions', 'host_permissions', 'optional_host_permissions'
+    }
+    other = sorted(key for key in set(old) | set(new) if key not in skipped and old.get(key) != new.get(key))
+    return {
+        'fields': fields,
+        'permissions_added': sorted(p for p, kind in added if 'host' not in kind),
+        'permissions_removed': sorted(p for p, kind in removed if 'host' not in kind),
+        'hosts_added': sorted(p for p, kind in added if 'host' in kind),
+        'hosts_removed': sorted(p for p, kind in removed if 'host' in kind),
+        'other_keys': other,
+    }
+
+
+def _content_diff(
+    old_zf: zipfile.ZipFile,
+    new_zf: zipfile.ZipFile,
+    name: str,
+    old_info: zipfile.ZipInfo,
+    new_info: zipfile.ZipInfo,
+    context: int
+) -> Optional[str]:
+    """生成单个成员的统一格式差异，二进制或过大的成员返回None"""
+    if max(old_info.file_size, new_info.file_size) > MAX_TEXT_DIFF_SIZE:
+        return None
+    try:
+        old_text = old_zf.read(old_info).decode('utf-8')
+        new_text = new_zf.read(new_info).decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    if '\0' in old_text or '\0' in new_text:
+        return None
+    lines = []
+    for line in difflib.unified_diff(
+        old_text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+        fromfile=f'a/{name}', tofile=f'b/{name}', n=context
+    ):
+        if not line.endswith('\n'):
+            line += '\n\\ No newline at end of file\n'
+        lines.append(line)
+    return ''.join(lines)
+
+
+def diff_archives(
+    old_path: str,
+    new_path: str,
+    content: bool = False,
+    context: int = 3
+) -> Dict[str, Any]:
+    """比较两个 CRX/ZIP 文件
+
+    只根据中央目录中的名称、CRC-32 和大小判断成员是否变化，不解压内容；
+    只有 manifest.json 的 CRC 不同时才读取两侧的 manifest 生成摘要，
+    content 为 True 时才解压 CRC 不同的文本成员生成差异。
+
+    Args:
+        old_path: 旧版本文件路径
+        new_path: 新版本文件路径
+        content: 是否为变化的文本成员生成统一格式差异
+        context: 差异的上下文行数
+
+    Returns:
+        dict: old、new、added、removed、changed（name、old_crc、new_crc、old_size、new_size，
+        content 时另含 diff）、unchanged（数量）、manifest（manifest 未变化时为None）、error
+    """
+    result = {
+        'old': old_path,
+        'new': new_path,
+        'added': [],
+        'removed': [],
+        'changed': [],
+        'unchanged': 0,
+        'manifest': None,
+        'error': None,
+    }
+    try:
+        with CrxReader(old_path) as old_reader, old_reader.open_zip() as old_zf, \
+                CrxReader(new_path) as new_reader, new_reader.open_zip() as new_zf:
+            old_members = _members(old_zf)
+            new_members = _members(new_zf)
+            result['added'] = sorted(name for name in new_members if name not in old_members)
+            result['removed'] = sorted(name for name in old_members if name not in new_members)
+            for name in sorted(set(old_members) & set(new_members)):
+                old_info = old_members[name]
+                new_info = new_members[name]
+                if old_info.CRC == new_info.CRC and old_info.file_size == new_info.file_size:
+                    result['unchanged'] += 1
+                    continue
+                change = {
+                    'name': name,
+                    'old_crc': old_info.CRC,
+                    'new_crc': new_info.CRC,
+                    'old_size': old_info.file_size,
+                    'new_size': new_info.file_size,
+                }
+                if content:
+                    change['diff'] = _content_diff(old_zf, new_zf, name, old_info, new_info, context)
+                result['changed'].append(change)
+            if any(c['name'] == 'manifest.json' for c in result['changed']) or \
+                    'manifest.json' in result['added'] or 'manifest.json' in result['removed']:
+                result['manifest'] = _manifest_changes(_load_manifest(old_zf), _load_manifest(new_zf))
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def _diff_pair(args: Tuple[str, str, bool, int]) -> Dict[str, Any]:
+    return diff_archives(*args)
+
+
+def read_pairs(path: str) -> List[Tuple[str, str]]:
+    """读取比较列表，每行两个路径（旧 新），以制表符或空白分隔，忽略空行和 # 注释"""
+    pairs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split('\t') if '\t' in line else line.split()
+            if len(parts) != 2:
+                raise ValueError(f"无效的比较行: {line}")
+            pairs.append((parts[0].strip(), parts[1].strip()))
+    return pairs
+
+
+def diff_many(
+    pairs: Iterable[Tuple[str, str]],
+    jobs: Optional[int] = None,
+    content: bool = False,
+    context: int = 3
+) -> Iterator[Dict[str, Any]]:
+    """在进程池中并行比较多对文件，按输入顺序产出结果
+
+    Args:
+        pairs: (旧文件, 新文件) 列表
+        jobs: 工作进程数，默认等于 CPU 核心数
+        content: 是否生成内容差异
+        context: 差异的上下文行数
+
+    Yields:
+        dict: 每对文件的 diff_archives 结果
+    """
+    tasks = [(old, new, content, context) for old, new in pairs]
+    if not tasks:
+        return
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+    if jobs == 1:
+        for task in tasks:
+            yield _diff_pair(task)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, min(64, len(tasks) // (jobs * 4)))
+        yield from executor.map(_diff_pair, tasks, chunksize=chunksize)
+
+
+def format_diff_report(result: Dict[str, Any]) -> str:
+    """生成单对文件的差异报告"""
+    lines = [f"--- {result['old']}", f"+++ {result['new']}"]
+    if result['error']:
+        lines.append(f"FAILED: {result['error']}")
+        return '\n'.join(lines)
+    manifest = result['manifest']
+    if manifest:
+        for key, change in manifest['fields'].items():
+            lines.append(f"  {key}: {change['old']} -> {change['new']}")
+        for label, key in (('权限 +', 'permissions_added'), ('权限 -', 'permissions_removed'),
+                           ('主机 +', 'hosts_added'), ('主机 -', 'hosts_removed')):
+            if manifest[key]:
+                lines.append(f"  {label} {', '.join(manifest[key])}")
+        if manifest['other_keys']:
+            lines.append(f"  manifest 其他变化: {', '.join(manifest['other_keys'])}")
+    for name in result['added']:
+        lines.append(f"A {name}")
+    for name in result['removed']:
+        lines.append(f"D {name}")
+    for change in result['changed']:
+        lines.append(f"M {change['name']} ({change['old_size']} -> {change['new_size']} bytes)")
+        if change.get('diff'):
+            lines.append(change['diff'].rstrip('\n'))
+        elif 'diff' in change:
+            lines.append('  (二进制或过大，未生成内容差异)')
+    lines.append(
+        f"新增 {len(result['added'])}，删除 {len(result['removed'])}，"
+        f"修改 {len(result['changed'])}，未变化 {result['unchanged']}"
+    )
+    return '\n'.join(lines)
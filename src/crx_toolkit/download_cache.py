@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+# 默认缓存目录，可通过环境变量 CRX_TOOLKIT_DOWNLOAD_CACHE 覆盖
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'crx-toolkit', 'crx')
+
+# 默认缓存上限: 2 GB
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def default_cache_dir() -> str:
+    """获取默认的下载缓存目录"""
+    return os.environ.get('CRX_TOOLKIT_DOWNLOAD_CACHE') or DEFAULT_CACHE_DIR
+
+
+class DownloadCache:
+    """按扩展ID保存已下载的 CRX 文件及其 HTTP 校验信息
+
+    条目以 ``<目录>/<ID前两位>/<ID>.crx`` 保存，同名 .json 文件记录下载链接、
+    ETag、Last-Modified 以及扩展名称和版本号。download_crx 据此发送
+    If-None-Match / If-Modified-Since 条件请求，收到 304 时直接复用缓存文件。
+    写入先落到临时文件再原子替换，多个进程可以共享同一个缓存目录。
+    命中时刷新 mtime，evict() 按 mtime 从旧到新淘汰（LRU）。
+
+    Args:
+        cache_dir: 缓存目录，默认使用 default_cache_dir()
+        max_bytes: 缓存总大小上限（字节）
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, extension_id: str) -> str:
+        return os.path.join(self.cache_dir, extension_id[:2], f"{extension_id}.crx")
+
+    def lookup(self, extension_id: str) -> Optional[Dict[str, Any]]:
+        """返回缓存条目的元数据，不存在或无法重新验证时返回None"""
+        entry = self._entry_path(extension_id)
+        try:
+            with open(entry + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if os.path.getsize(entry) != meta.get('size'):
+                return None
+        except (OSError, ValueError):
+            return None
+        if not (meta.get('etag') or meta.get('last_modified')):
+            return None
+        return meta
+
+    @staticmethod
+    def conditional_headers(meta: Dict[str, Any]) -> Dict[str, str]:
+        """根据缓存条目生成条件请求头"""
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def get(self, extension_id: str, output_path: str) -> bool:
+        """将缓存的 CRX 文件复制到 output_path，成功时返回 True
+
+        不使用硬链接：输出文件与缓存条目共用 inode 时，修改输出文件会破坏缓存，
+        刷新条目 mtime 也会改变输出文件的 mtime。
+        """
+        entry = self._entry_path(extension_id)
+        try:
+            shutil.copyfile(entry, output_path)
+            os.utime(entry, None)
+        except OSError as e:
+            logging.warning(f"读取下载缓存失败: {str(e)}")
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def put(self, extension_id: str, crx_path: str, meta: Dict[str, Any]) -> None:
+        """将下载完成的 CRX 文件和校验信息存入缓存"""
+        if not (meta.get('etag') or meta.get('last_modified')):
+            # 没有校验信息的响应无法重新验证，不缓存
+            return
+        entry = self._entry_path(extension_id)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f, open(crx_path, 'rb') as src:
+                    shutil.copyfileobj(src, f, 1024 * 1024)
+                meta = dict(meta, size=os.path.getsize(tmp_path), fetched=time.time())
+                os.replace(tmp_path, entry)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp_path, entry + '.json')
+        except OSError as e:
+            logging.warning(f"写入下载缓存失败: {str(e)}")
+
+    def evict(self) -> int:
+        """按最近使用时间淘汰条目，返回删除的条目数"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.crx'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                # 其他进程已删除
+                pass
+            except OSError as e:
+                logging.debug(f"淘汰缓存条目失败 {path}: {str(e)}")
+                continue
+            try:
+                os.remove(path + '.json')
+            except OSError:
+                pass
+            total -= size
+        if removed:
+            logging.info(f"下载缓存淘汰 {removed} 个条目")
+        return removed
@@ -1,14 +1,21 @@
 import os
 import re
 import json
+import time
+import hashlib
 import logging
-import shutil
-from typing import Optional, Dict, Any, Tuple
+import queue
+import threading
+from typing import Optional, Dict, Any, Tuple, List, Callable
 from urllib.parse import urlparse, parse_qs
 import requests
 import zipfile
 from .utils.file_utils import ensure_dir
-import tempfile
+from .verifier import verify_crx
+from .download_cache import DownloadCache
+from .metadata import read_metadata
+from .crx_reader import CrxReader
+from .extractor import extract_archive
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 
@@ -33,6 +40,16 @@ DOWNLOAD_URLS = [
     "https://dl.google.com/chrome/extensions/{ID}/extension_{ID}.crx",
 ]
 
+# 对冲下载时启动下一个备用链接前的默认等待秒数
+DEFAULT_HEDGE_DELAY = 2.0
+
+# 连接中断时的默认重试次数和首次退避秒数（之后每次翻倍）
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF = 1.0
+
+# 未完成下载文件的后缀，校验信息保存在同名的 .json 文件中
+PARTIAL_SUFFIX = '.crx.part'
+
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -160,180 +177,65 @@ def get_localized_name(manifest: dict, messages_dir: str) -> str:
 def parse_crx_header(crx_path: str) -> Tuple[bytes, bytes, bytes]:
     """解析 CRX 文件头
     
+    负载位置由 CrxReader 按 CRX2/CRX3 头部字段或中央目录结束记录确定，
+    只复制一次 ZIP 数据。需要避免复制时请直接使用 CrxReader。
+    
     Args:
         crx_path: CRX 文件路径
         
     Returns:
         Tuple[bytes, bytes, bytes]: (签名, 公钥, ZIP数据)
     """
-    with open(crx_path, 'rb') as f:
-        data = f.read()
-        
-        # 策略1: 直接查找 ZIP 文件头
-        zip_start = data.find(b'PK\x03\x04')
-        if zip_start != -1:
-            logging.info(f"找到 ZIP 文件头（偏移量: {zip_start}）")
-            return b'', b'', data[zip_start:]
-        
-        # 策略2: 尝试解析 CRX 头部
-        try:
-            f.seek(0)
-            magic = f.read(4)
-            
-            # 如果不是标准的 CRX 头部，尝试其他偏移量
-            if magic != b'Cr24':
-                # 尝试不同的偏移量
-                for offset in [0, 4, 8, 12, 16]:
-                    f.seek(offset)
-                    data_slice = f.read()
-                    zip_start = data_slice.find(b'PK\x03\x04')
-                    if zip_start != -1:
-                        logging.info(f"在偏移量 {offset + zip_start} 处找到 ZIP 文件头")
-                        return b'', b'', data_slice[zip_start:]
-                
-                # 如果所有尝试都失败，返回原始数据
-                logging.warning("未找到标准的 CRX 头部或 ZIP 文件头，尝试直接使用文件内容")
-                return b'', b'', data
-            
-            # 标准 CRX 格式处理
-            version = int.from_bytes(f.read(4), byteorder='little')
-            logging.info(f"检测到 CRX 版本: {version}")
-            
-            if version == 2:
-                header_length = int.from_bytes(f.read(4), byteorder='little')
-                signature_length = int.from_bytes(f.read(4), byteorder='little')
-                
-                # 合理性检查
-                if 0 < header_length < 10000 and 0 < signature_length < 10000:
-                    f.seek(16)  # 重置到数据开始位置
-                    remaining_data = f.read()
-                    zip_start = remaining_data.find(b'PK\x03\x04')
-                    if zip_start != -1:
-                        return b'', b'', remaining_data[zip_start:]
-            
-            elif version == 3:
-                header_length = int.from_bytes(f.read(4), byteorder='little')
-                if 0 < header_length < 10000:
-                    f.seek(12)  # 重置到数据开始位置
-                    remaining_data = f.read()
-                    zip_start = remaining_data.find(b'PK\x03\x04')
-                    if zip_start != -1:
-                        return b'', b'', remaining_data[zip_start:]
-            
-            # 如果标准解析失败，尝试查找 ZIP 文件头
-            f.seek(0)
-            data = f.read()
-            zip_start = data.find(b'PK\x03\x04')
-            if zip_start != -1:
-                logging.info(f"通过备用方法在偏移量 {zip_start} 处找到 ZIP 文件头")
-                return b'', b'', data[zip_start:]
-            
-            # 如果还是找不到，返回原始数据
-            logging.warning("无法找到有效的 ZIP 数据，尝试直接使用文件内容")
-            return b'', b'', data
-            
-        except Exception as e:
-            logging.warning(f"解析 CRX 头部时出错: {str(e)}")
-            # 发生错误时，尝试直接返回数据
-            return b'', b'', data
+    try:
+        with CrxReader(crx_path) as reader:
+            logging.info(f"找到 ZIP 数据（偏移量: {reader.payload_offset}）")
+            header = reader.header
+            if reader.format_version == 2:
+                signature, public_key = header.get('signature', b''), header.get('public_key', b'')
+            elif header.get('sha256_with_rsa'):
+                public_key, signature = header['sha256_with_rsa'][0]
+            else:
+                signature, public_key = b'', b''
+            payload = reader.payload()
+            try:
+                return signature, public_key, bytes(payload)
+            finally:
+                payload.release()
+    except Exception as e:
+        logging.warning(f"解析 CRX 头部时出错: {str(e)}，尝试直接使用文件内容")
+        with open(crx_path, 'rb') as f:
+            return b'', b'', f.read()
 
 def get_crx_info(crx_path: str) -> Tuple[str, str]:
     """从 CRX 文件中获取扩展信息
     
+    直接通过 ZIP 中央目录读取 manifest.json 和所需的本地化文件，不解压整个扩展。
+    
     Args:
         crx_path: CRX 文件路径
         
     Returns:
         Tuple[str, str]: (扩展名称, 版本号)
     """
-    temp_dir = os.path.join(os.path.dirname(crx_path), '_temp_extract')
     try:
-        logging.info(f"创建临时目录: {temp_dir}")
-        os.makedirs(temp_dir, exist_ok=True)
+        metadata = read_metadata(crx_path)
+        logging.info("成功读取manifest.json")
         
-        # 解析 CRX 文件
-        try:
-            _, _, zip_data = parse_crx_header(crx_path)
-            
-            # 保存 ZIP 数据到临时文件
-            temp_zip = os.path.join(temp_dir, 'temp.zip')
-            with open(temp_zip, 'wb') as f:
-                f.write(zip_data)
-                
-            # 解压 ZIP 文件
-            with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-                
-        except Exception as e:
-            logging.warning(f"直接解压失败: {str(e)}")
-            # 如果解析失败，尝试跳过文件头直接解压
-            try:
-                with open(crx_path, 'rb') as f:
-                    # 跳过 CRX 头部
-                    f.seek(16)  # 跳过魔数(4) + 版本(4) + 两个长度字段(4+4)
-                    data = f.read()
-                    
-                # 尝试在数据中查找 ZIP 文件头
-                zip_start = data.find(b'PK\x03\x04')
-                if zip_start == -1:
-                    raise ValueError("找不到 ZIP 文件头")
-                    
-                # 保存 ZIP 数据到临时文件
-                temp_zip = os.path.join(temp_dir, 'temp.zip')
-                with open(temp_zip, 'wb') as f:
-                    f.write(data[zip_start:])
-                    
-                # 解压 ZIP 文件
-                with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
-                    zip_ref.extractall(temp_dir)
-                    
-            except Exception as e:
-                logging.error(f"备用解压方法也失败: {str(e)}")
-                return None, None
+        # 清理名称
+        name = str(metadata['name']).strip()
+        name = re.sub(r'[<>:"/\\|?*]', '-', name)
+        name = name.strip('-.')
+        
+        if not name:
+            raise ValueError("未找到有效的扩展名称")
+        
+        version = metadata['version']
+        logging.info(f"从manifest获取信息 - 名称: {name}, 版本: {version}")
+        return name, version
         
-        # 读取 manifest.json
-        manifest_path = os.path.join(temp_dir, 'manifest.json')
-        if not os.path.exists(manifest_path):
-            raise ValueError("manifest.json 不存在")
-            
-        with open(manifest_path, 'r', encoding='utf-8') as f:
-            manifest = json.load(f)
-            logging.info("成功读取manifest.json")
-            
-            # 获取扩展名称
-            name = manifest.get('name', '')
-            
-            # 处理本地化消息
-            if isinstance(name, str) and name.startswith('__MSG_'):
-                locales_dir = os.path.join(temp_dir, '_locales')
-                name = get_localized_name(manifest, locales_dir)
-            elif isinstance(name, dict):  # 处理多语言名称
-                name = name.get('default') or name.get('en') or name.get('zh_CN') or next(iter(name.values()))
-            
-            # 获取版本号
-            version = manifest.get('version', 'unknown')
-            
-            # 清理名称
-            name = str(name).strip()
-            name = re.sub(r'[<>:"/\\|?*]', '-', name)
-            name = name.strip('-.')
-            
-            if not name:
-                raise ValueError("未找到有效的扩展名称")
-                
-            logging.info(f"从manifest获取信息 - 名称: {name}, 版本: {version}")
-            return name, version
-            
     except Exception as e:
         logging.error(f"解析CRX文件失败: {str(e)}", exc_info=True)
         return None, None
-    finally:
-        # 清理临时目录
-        try:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            logging.debug("清理临时目录")
-        except Exception as e:
-            logging.warning(f"清理临时目录失败: {e}")
 
 def sanitize_filename(filename: str) -> str:
     """清理文件名，移除或替换非法字符
@@ -358,12 +260,424 @@ def sanitize_filename(filename: str) -> str:
     
     return filename
 
+class NotModified(Exception):
+    """条件请求返回 304，缓存中的文件仍然有效"""
+
+def partial_path(output_dir: str, extension_id: str, download_url: str) -> str:
+    """下载链接对应的未完成文件路径，位于输出目录中，每个链接一个"""
+    url_hash = hashlib.sha1(download_url.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(output_dir, f"{extension_id}.{url_hash}{PARTIAL_SUFFIX}")
+
+def _load_partial(part_file: str, download_url: str) -> Optional[Dict[str, Any]]:
+    """读取未完成文件的校验信息，无法续传时返回None"""
+    try:
+        with open(part_file + '.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        size = os.path.getsize(part_file)
+    except (OSError, ValueError):
+        return None
+    if meta.get('url') != download_url or not (meta.get('etag') or meta.get('last_modified')):
+        return None
+    if size <= 0 or (meta.get('length') and size >= meta['length']):
+        return None
+    meta['size'] = size
+    return meta
+
+def _save_partial(part_file: str, meta: Dict[str, Any]) -> None:
+    with open(part_file + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+def remove_partial(part_file: str) -> None:
+    """删除未完成文件及其校验信息"""
+    for path in (part_file, part_file + '.json'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _is_retryable(error: Exception) -> bool:
+    """连接中断、超时和服务端错误可以重试，4xx 错误不重试"""
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        return status >= 500 or status == 429
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+def _fetch_once(
+    http,
+    download_url: str,
+    part_file: str,
+    no_verify: bool = False,
+    cancel: Optional[threading.Event] = None,
+    on_response: Optional[Callable[[requests.Response], None]] = None,
+    extra_headers: Optional[Dict[str, str]] = None,
+    expected_sha256: Optional[str] = None,
+    extension_id: Optional[str] = None
+) -> Optional[str]:
+    """发送一次 GET 请求，存在未完成文件时用 Range 续传，返回文件的 SHA-256"""
+    headers = dict(HEADERS, **(extra_headers or {}))
+    partial = _load_partial(part_file, download_url)
+    if partial:
+        # If-Range：文件在服务端已变化时服务器返回完整的 200 响应
+        etag = partial.get('etag')
+        headers['Range'] = f"bytes={partial['size']}-"
+        headers['If-Range'] = etag if etag and not etag.startswith('W/') else partial.get('last_modified') or etag
+        headers['Accept-Encoding'] = 'identity'
+        logging.info(f"从 {partial['size']} 字节处续传: {download_url}")
+    else:
+        logging.info(f"开始从 {download_url} 下载扩展...")
+    
+    response = http.get(download_url, headers=headers, stream=True, timeout=30)
+    if on_response is not None:
+        on_response(response)
+    with response:
+        if response.status_code == 416 and partial:
+            # 未完成文件已失效，重新完整下载
+            logging.warning(f"服务器拒绝续传范围，重新下载: {download_url}")
+            response.close()
+            remove_partial(part_file)
+            return _fetch_once(
+                http, download_url, part_file, no_verify, cancel, on_response, extra_headers, expected_sha256,
+                extension_id
+            )
+        if response.status_code == 304:
+            raise NotModified(download_url)
+        response.raise_for_status()
+        
+        # 检查是否是有效的响应
+        content_type = response.headers.get('content-type', '')
+        if 'html' in content_type.lower():
+            logging.warning(f"跳过HTML响应: {download_url}")
+            remove_partial(part_file)
+            return None
+        
+        offset = 0
+        length = response.headers.get('content-length')
+        length = int(length) if length and length.isdigit() else None
+        if partial and response.status_code == 206:
+            match = re.match(r'bytes (\d+)-\d+/(\d+|\*)', response.headers.get('content-range', ''))
+            if match and int(match.group(1)) == partial['size']:
+                offset = partial['size']
+                length = int(match.group(2)) if match.group(2) != '*' else None
+            else:
+                # 返回的范围与本地文件不衔接，重新完整下载
+                logging.warning(f"续传范围不匹配，重新下载: {download_url}")
+                response.close()
+                remove_partial(part_file)
+                return _fetch_once(
+                    http, download_url, part_file, no_verify, cancel, on_response, extra_headers, expected_sha256,
+                    extension_id
+                )
+        elif partial:
+            logging.info(f"服务器不支持续传或文件已变化，重新下载: {download_url}")
+        
+        # 只有未经内容编码的响应才能按字节偏移续传
+        if response.headers.get('content-encoding', 'identity').lower() not in ('', 'identity'):
+            remove_partial(part_file)
+        elif response.headers.get('etag') or response.headers.get('last-modified'):
+            _save_partial(part_file, {
+                'url': download_url,
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified'),
+                'length': length,
+            })
+        
+        # 边接收边计算 SHA-256，续传时先补算已下载部分
+        digest = hashlib.sha256()
+        magic = None
+        size = 0
+        if offset:
+            with open(part_file, 'rb') as f:
+                magic = f.read(4)
+                digest.update(magic)
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            size = offset
+        with open(part_file, 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if cancel is not None and cancel.is_set():
+                    return None
+                if magic is None:
+                    magic = chunk[:4]
+                    if magic != b'Cr24' and magic != b'PK\x03\x04':
+                        logging.warning(f"文件不是有效的CRX格式: {download_url}")
+                        f.close()
+                        remove_partial(part_file)
+                        return None
+                    logging.info("验证成功：文件包含有效的CRX或ZIP头")
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+    
+    if length is not None and size < length:
+        raise requests.ConnectionError(f"下载不完整: {size}/{length} bytes")
+    
+    # 验证下载的文件
+    if size < 100:  # 文件太小，可能不是有效的CRX
+        logging.warning(f"下载的文件太小，可能不是有效的CRX: {size} bytes")
+        remove_partial(part_file)
+        return None
+    
+    sha256 = digest.hexdigest()
+    if expected_sha256 and sha256 != expected_sha256.lower():
+        logging.warning(f"SHA-256 不匹配: {sha256}，期望 {expected_sha256}")
+        remove_partial(part_file)
+        return None
+    
+    # 校验签名、扩展ID和ZIP成员完整性；未签名的 ZIP 无法校验，只在 no_verify 时接受
+    if not no_verify:
+        if magic != b'Cr24':
+            logging.warning(f"响应是未签名的ZIP文件，无法校验签名: {download_url}")
+            remove_partial(part_file)
+            return None
+        result = verify_crx(part_file)
+        if not result['valid']:
+            logging.warning(f"CRX校验失败: {'; '.join(result['errors'])}")
+            remove_partial(part_file)
+            return None
+        if extension_id and (result['extension_id'] or '').lower() != extension_id.lower():
+            logging.warning(f"CRX的扩展ID {result['extension_id']} 与请求的 {extension_id} 不一致: {download_url}")
+            remove_partial(part_file)
+            return None
+        logging.info(f"CRX签名校验通过，扩展ID: {result['extension_id']}")
+    return sha256
+
+def _fetch_candidate(
+    http,
+    download_url: str,
+    part_file: str,
+    no_verify: bool = False,
+    cancel: Optional[threading.Event] = None,
+    on_response: Optional[Callable[[requests.Response], None]] = None,
+    retries: int = DEFAULT_RETRIES,
+    extra_headers: Optional[Dict[str, str]] = None,
+    expected_sha256: Optional[str] = None,
+    extension_id: Optional[str] = None
+) -> Optional[str]:
+    """下载单个候选链接到 part_file，得到有效的 CRX 文件时返回其 SHA-256，否则返回None
+
+    数据只写入一次：第一个数据块不是 CRX/ZIP 魔数时立即放弃，SHA-256 在
+    接收的同时计算。连接中断时
+    保留已下载的部分和 ETag/Last-Modified/长度，按指数退避重试并用 Range
+    续传；服务器忽略 Range 时自动改为完整下载。重试耗尽后网络错误以
+    requests.RequestException 抛出，未完成文件保留给下一次调用续传。
+    条件请求返回 304 时抛出 NotModified。
+
+    Args:
+        http: requests 模块或 requests.Session
+        download_url: 下载链接
+        part_file: 未完成文件路径，见 partial_path
+        no_verify: 是否跳过签名验证
+        cancel: 被设置时中止下载
+        on_response: 收到响应后的回调，用于在其他线程中关闭连接
+        retries: 连接中断或服务端错误时的最大重试次数
+        extra_headers: 附加的请求头，例如缓存的条件请求头
+        expected_sha256: 期望的 SHA-256（十六进制），不匹配时视为无效
+        extension_id: 请求的扩展ID，校验签名时要求 CRX 的扩展ID与之一致
+    """
+    attempt = 0
+    while True:
+        try:
+            return _fetch_once(
+                http, download_url, part_file, no_verify, cancel, on_response, extra_headers, expected_sha256,
+                extension_id
+            )
+        except requests.RequestException as e:
+            if attempt >= retries or not _is_retryable(e) or (cancel is not None and cancel.is_set()):
+                raise
+            delay = RETRY_BACKOFF * (2 ** attempt)
+            attempt += 1
+            logging.warning(f"下载中断 {download_url}: {str(e)}，{delay:.1f}s 后第 {attempt} 次重试")
+            if cancel is not None:
+                if cancel.wait(delay):
+                    return None
+            else:
+                time.sleep(delay)
+
+def _fetch_sequential(
+    http,
+    download_urls: List[str],
+    output_dir: str,
+    extension_id: str,
+    no_verify: bool,
+    retries: int,
+    conditional: Optional[Dict[str, Dict[str, str]]] = None,
+    expected_sha256: Optional[str] = None
+) -> Tuple[str, str]:
+    """按顺序逐个尝试下载链接，每个链接先发送 HEAD 请求确认可用，返回 (文件路径, SHA-256)
+
+    conditional 按链接给出条件请求头，只有缓存条目的来源链接才会带上。
+    """
+    last_error = None
+    for download_url in download_urls:
+        try:
+            logging.info(f"尝试下载链接: {download_url}")
+            extra_headers = (conditional or {}).get(download_url)
+            # 先用HEAD请求检查URL是否可用
+            headers = dict(HEADERS, **(extra_headers or {}))
+            response = http.head(download_url, headers=headers, timeout=10, allow_redirects=True)
+            response.close()
+            if response.status_code == 304:
+                raise NotModified(download_url)
+            
+            part_file = partial_path(output_dir, extension_id, download_url)
+            sha256 = None
+            if response.status_code == 200:
+                sha256 = _fetch_candidate(
+                    http, download_url, part_file, no_verify, retries=retries,
+                    extra_headers=extra_headers, expected_sha256=expected_sha256, extension_id=extension_id
+                )
+            if sha256:
+                return part_file, sha256
+            logging.warning(f"下载链接无效，尝试下一个链接: {download_url}")
+        except requests.RequestException as e:
+            last_error = e
+            logging.warning(f"下载失败 {download_url}: {str(e)}")
+    raise RuntimeError(f"所有下载链接均失败，最后的错误: {str(last_error)}")
+
+def _fetch_hedged(
+    http,
+    download_urls: List[str],
+    output_dir: str,
+    extension_id: str,
+    no_verify: bool,
+    retries: int,
+    hedge_delay: float,
+    conditional: Optional[Dict[str, Dict[str, str]]] = None,
+    expected_sha256: Optional[str] = None
+) -> Tuple[str, str]:
+    """对冲下载：先请求第一个链接，每隔 hedge_delay 秒启动下一个备用链接
+
+    不发送 HEAD 请求。任一候选失败时立即启动下一个链接；第一个通过
+    校验的响应或第一个 304 响应胜出，其余仍在进行的请求会被取消并关闭连接。
+    conditional 按链接给出条件请求头，只有缓存条目的来源链接才会带上。
+    返回 (文件路径, SHA-256)。
+    """
+    results = queue.Queue()
+    cancel = threading.Event()
+    responses = []
+    lock = threading.Lock()
+    
+    def on_response(response: requests.Response) -> None:
+        with lock:
+            responses.append(response)
+            cancelled = cancel.is_set()
+        if cancelled:
+            response.close()
+    
+    def run(download_url: str) -> None:
+        part_file = partial_path(output_dir, extension_id, download_url)
+        try:
+            sha256 = _fetch_candidate(
+                http, download_url, part_file, no_verify, cancel, on_response, retries,
+                (conditional or {}).get(download_url), expected_sha256, extension_id
+            )
+            error = None
+        except Exception as e:
+            sha256, error = None, e
+        if cancel.is_set():
+            # 其他链接已经胜出，由本线程清理自己写入的未完成文件
+            remove_partial(part_file)
+            return
+        results.put((download_url, (part_file, sha256) if sha256 else None, error))
+    
+    launched = 0
+    
+    def launch() -> None:
+        nonlocal launched
+        download_url = download_urls[launched]
+        logging.info(f"尝试下载链接: {download_url}")
+        threading.Thread(target=run, args=(download_url,), daemon=True).start()
+        launched += 1
+    
+    last_error = None
+    finished = 0
+    launch()
+    while finished < launched:
+        timeout = hedge_delay if launched < len(download_urls) else None
+        try:
+            download_url, fetched, error = results.get(timeout=timeout)
+        except queue.Empty:
+            logging.info(f"{hedge_delay}s 内未完成下载，启动备用链接")
+            launch()
+            continue
+        finished += 1
+        if fetched or isinstance(error, NotModified):
+            logging.info(f"对冲下载胜出: {download_url}")
+            cancel.set()
+            with lock:
+                pending = list(responses)
+            for response in pending:
+                try:
+                    response.close()
+                except Exception:
+                    pass
+            if error is not None:
+                raise error
+            return fetched
+        if error is not None:
+            last_error = error
+            logging.warning(f"下载失败 {download_url}: {str(error)}")
+        else:
+            logging.warning(f"下载链接无效: {download_url}")
+        if finished == launched and launched < len(download_urls):
+            launch()
+    raise RuntimeError(f"所有下载链接均失败，最后的错误: {str(last_error)}")
+
+def _save_download(
+    temp_file: str,
+    output_dir: str,
+    extension_id: str,
+    force: bool,
+    name: Optional[str],
+    version: Optional[str]
+) -> str:
+    """将输出目录中下载完成的临时文件按扩展名称和版本号原子重命名"""
+    # 构建最终文件名
+    if name and version:
+        # 使用扩展名和版本号
+        filename = f"{name}-{version}"
+    else:
+        filename = extension_id
+    
+    # 清理并规范化文件名
+    filename = sanitize_filename(filename)
+    if len(filename) > 200:  # 预留.crx扩展名和一些余量
+        filename = filename[:197] + "..."
+    
+    # 添加.crx扩展名
+    final_output = os.path.join(output_dir, f"{filename}.crx")
+    
+    # 处理文件已存在的情况
+    if os.path.exists(final_output):
+        if force:
+            # os.replace 原子地覆盖已存在的文件
+            logging.warning(f"文件已存在，将被覆盖: {final_output}")
+        else:
+            # 如果不允许覆盖，添加数字后缀
+            counter = 1
+            while os.path.exists(final_output):
+                new_filename = f"{filename}_{counter}.crx"
+                final_output = os.path.join(output_dir, new_filename)
+                counter += 1
+            logging.info(f"文件已存在，使用新文件名: {os.path.basename(final_output)}")
+    
+    # 重命名临时文件为最终文件名（临时文件与最终文件位于同一目录，重命名是原子的）
+    os.replace(temp_file, final_output)
+    logging.info(f"扩展下载成功: {final_output}")
+    return final_output
+
 def download_crx(
     url: str,
     output_dir: str,
     force: bool = True,
     verbose: bool = False,
-    no_verify: bool = False
+    no_verify: bool = False,
+    session: Optional[requests.Session] = None,
+    hedge_delay: Optional[float] = None,
+    retries: int = DEFAULT_RETRIES,
+    cache: Optional[DownloadCache] = None,
+    expected_sha256: Optional[str] = None,
+    download_urls: Optional[List[str]] = None
 ) -> str:
     """下载 Chrome 扩展 CRX 文件
     
@@ -373,6 +687,13 @@ def download_crx(
         force: 是否强制覆盖已存在的文件
         verbose: 是否启用详细日志
         no_verify: 是否跳过签名验证
+        session: 复用连接的 requests.Session，为None时每个请求单独建立连接
+        hedge_delay: 对冲下载时启动下一个备用链接前的等待秒数，为None时按顺序逐个尝试
+        retries: 每个链接在连接中断时的最大重试次数，未完成的部分保存在输出目录中用于续传
+        cache: 下载缓存，存在缓存条目时发送条件请求，304 时直接复用缓存文件
+        expected_sha256: 期望的 CRX 文件 SHA-256（十六进制），不匹配的响应视为无效
+        download_urls: 指定的下载链接（例如更新检查返回的 codebase），为None时按
+            DOWNLOAD_URLS 构建；指定时只尝试这些链接，url 仅用于确定扩展ID
     
     Returns:
         str: 下载的CRX文件路径
@@ -391,125 +712,88 @@ def download_crx(
         
         logging.info(f"检测到扩展ID: {extension_id}")
         
-        # 构建并尝试所有可能的下载URL
-        download_urls = [template.format(ID=extension_id) for template in DOWNLOAD_URLS]
-        # 添加原始URL作为最后的备选
-        if url not in download_urls:
-            download_urls.append(url)
+        http = session if session is not None else requests
         
-        last_error = None
-        for download_url in download_urls:
-            try:
-                logging.info(f"尝试下载链接: {download_url}")
-                # 先用HEAD请求检查URL是否可用
-                response = requests.head(download_url, headers=HEADERS, timeout=10, allow_redirects=True)
-                
-                if response.status_code == 200:
-                    # 创建临时目录用于下载文件
-                    with tempfile.TemporaryDirectory() as temp_dir:
-                        temp_file = os.path.join(temp_dir, 'temp.crx')
-                        
-                        # 下载文件
-                        logging.info(f"开始从 {download_url} 下载扩展...")
-                        response = requests.get(download_url, headers=HEADERS, stream=True, timeout=30)
-                        response.raise_for_status()
-                        
-                        # 检查是否是有效的响应
-                        content_type = response.headers.get('content-type', '')
-                        if 'html' in content_type.lower():
-                            logging.warning(f"跳过HTML响应: {download_url}")
-                            continue
-                        
-                        # 保存文件
-                        with open(temp_file, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=8192):
-                                f.write(chunk)
-                        
-                        # 验证下载的文件
-                        if os.path.getsize(temp_file) < 100:  # 文件太小，可能不是有效的CRX
-                            logging.warning(f"下载的文件太小，可能不是有效的CRX: {os.path.getsize(temp_file)} bytes")
-                            continue
-                        
-                        # 尝试解析CRX头部，验证文件有效性
-                        try:
-                            with open(temp_file, 'rb') as f:
-                                magic = f.read(4)
-                                if magic == b'Cr24' or b'PK\x03\x04' in magic:
-                                    logging.info("验证成功：文件包含有效的CRX或ZIP头")
-                                else:
-                                    logging.warning("文件不是有效的CRX格式，尝试下一个链接")
-                                    continue
-                        except Exception as e:
-                            logging.warning(f"文件格式验证失败: {e}")
-                            continue
-                        
-                        # 先使用临时文件名保存
-                        temp_output = os.path.join(output_dir, f"{extension_id}_temp.crx")
-                        os.makedirs(os.path.dirname(temp_output), exist_ok=True)
-                        shutil.copy2(temp_file, temp_output)
-                        
-                        # 尝试从CRX文件获取信息
-                        name, version = get_crx_info(temp_output)
-                        
-                        # 构建最终文件名
-                        if name and version:
-                            # 使用扩展名和版本号
-                            filename = f"{name}-{version}"
-                        else:
-                            filename = extension_id
-                        
-                        # 清理并规范化文件名
-                        filename = sanitize_filename(filename)
-                        if len(filename) > 200:  # 预留.crx扩展名和一些余量
-                            filename = filename[:197] + "..."
-                        
-                        # 添加.crx扩展名
-                        final_output = os.path.join(output_dir, f"{filename}.crx")
-                        
-                        # 处理文件已存在的情况
-                        if os.path.exists(final_output) and final_output != temp_output:
-                            if force:
-                                logging.warning(f"文件已存在，将被覆盖: {final_output}")
-                                try:
-                                    os.remove(final_output)
-                                except Exception as e:
-                                    logging.warning(f"删除已存在的文件失败: {str(e)}")
-                            else:
-                                # 如果不允许覆盖，添加数字后缀
-                                counter = 1
-                                while os.path.exists(final_output):
-                                    new_filename = f"{filename}_{counter}.crx"
-                                    final_output = os.path.join(output_dir, new_filename)
-                                    counter += 1
-                                logging.info(f"文件已存在，使用新文件名: {os.path.basename(final_output)}")
-                        
-                        # 重命名临时文件为最终文件名
-                        try:
-                            shutil.move(temp_output, final_output)
-                            logging.info(f"扩展下载成功: {final_output}")
-                            return final_output
-                        except Exception as e:
-                            logging.error(f"重命名文件失败: {str(e)}")
-                            return temp_output
-                            
-            except requests.RequestException as e:
-                last_error = e
-                logging.warning(f"下载失败 {download_url}: {str(e)}")
-                continue
+        pinned = download_urls is not None
+        if pinned:
+            download_urls = list(download_urls)
+            if not download_urls:
+                raise ValueError("下载链接列表不能为空")
+        else:
+            # 构建并尝试所有可能的下载URL
+            download_urls = [template.format(ID=extension_id) for template in DOWNLOAD_URLS]
+            # 添加原始URL作为最后的备选（纯扩展ID不是可请求的链接）
+            if url not in download_urls and re.match(r'^https?://', url, re.IGNORECASE):
+                download_urls.append(url)
+        
+        cached = cache.lookup(extension_id) if cache is not None else None
+        if cached and expected_sha256 and cached.get('sha256', '').lower() != expected_sha256.lower():
+            # 缓存的文件与期望的哈希不符，不发送条件请求
+            cached = None
+        if cached and pinned and cached.get('url') not in download_urls:
+            # 缓存来自其他链接，不能代表指定链接的内容
+            cached = None
+        conditional = None
+        if cached:
+            # 优先向上次成功的链接重新验证；校验信息只对该链接有效，其他链接不带条件请求头
+            conditional = {cached['url']: DownloadCache.conditional_headers(cached)}
+            download_urls = [cached['url']] + [u for u in download_urls if u != cached['url']]
         
-        # 如果所有URL都尝试失败
-        raise RuntimeError(f"所有下载链接均失败，最后的错误: {str(last_error)}")
+        try:
+            if hedge_delay is not None:
+                part_file, sha256 = _fetch_hedged(
+                    http, download_urls, output_dir, extension_id, no_verify, retries, hedge_delay,
+                    conditional, expected_sha256
+                )
+            else:
+                part_file, sha256 = _fetch_sequential(
+                    http, download_urls, output_dir, extension_id, no_verify, retries,
+                    conditional, expected_sha256
+                )
+        except NotModified as e:
+            logging.info(f"扩展未更新，使用缓存文件: {e}")
+            part_file = partial_path(output_dir, extension_id, 'cache')
+            remove_partial(part_file)
+            if cache.get(extension_id, part_file):
+                return _save_download(part_file, output_dir, extension_id, force, cached.get('name'), cached.get('version'))
+            # 缓存文件读取失败，不带条件请求头重新下载
+            return download_crx(url, output_dir, force, verbose, no_verify, session, hedge_delay, retries,
+                                expected_sha256=expected_sha256, download_urls=download_urls if pinned else None)
+        
+        logging.info(f"SHA-256: {sha256}")
+        name, version = get_crx_info(part_file)
+        if cache is not None:
+            cache.record_miss()
+            meta = {}
+            try:
+                with open(part_file + '.json', 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                pass
+            cache.put(extension_id, part_file, {
+                'url': meta.get('url'),
+                'etag': meta.get('etag'),
+                'last_modified': meta.get('last_modified'),
+                'name': name,
+                'version': version,
+                'sha256': sha256,
+            })
+        output = _save_download(part_file, output_dir, extension_id, force, name, version)
+        # 只清理本次下载胜出链接的校验信息，同一扩展的其他下载可能仍在使用其他未完成文件
+        remove_partial(part_file)
+        return output
         
     except Exception as e:
         logging.error(f"下载失败: {str(e)}", exc_info=True)
         raise
 
-def extract_crx(crx_path: str, extract_dir: Optional[str] = None) -> str:
+def extract_crx(crx_path: str, extract_dir: Optional[str] = None, jobs: Optional[int] = None) -> str:
     """解压 CRX 文件
     
     Args:
         crx_path: CRX 文件路径
         extract_dir: 解压目录路径，如果不指定则使用扩展名作为目录名
+        jobs: 并行解压的线程数，默认等于 CPU 核心数
         
     Returns:
         str: 解压后的目录路径
@@ -529,50 +813,8 @@ def extract_crx(crx_path: str, extract_dir: Optional[str] = None) -> str:
         
         ensure_dir(extract_dir)
         
-        # 解析 CRX 文件
-        try:
-            _, _, zip_data = parse_crx_header(crx_path)
-            
-            # 保存 ZIP 数据到临时文件
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_file.write(zip_data)
-                temp_zip = temp_file.name
-                
-            # 解压 ZIP 文件
-            with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-                
-            # 删除临时文件
-            os.unlink(temp_zip)
-            
-        except Exception as e:
-            logging.warning(f"直接解压失败，尝试备用方法: {str(e)}")
-            # 如果解析失败，尝试跳过文件头直接解压
-            try:
-                with open(crx_path, 'rb') as f:
-                    # 跳过 CRX 头部
-                    f.seek(16)  # 跳过魔数(4) + 版本(4) + 两个长度字段(4+4)
-                    data = f.read()
-                    
-                # 尝试在数据中查找 ZIP 文件头
-                zip_start = data.find(b'PK\x03\x04')
-                if zip_start == -1:
-                    raise ValueError("找不到 ZIP 文件头")
-                    
-                # 保存 ZIP 数据到临时文件
-                with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                    temp_file.write(data[zip_start:])
-                    temp_zip = temp_file.name
-                    
-                # 解压 ZIP 文件
-                with zipfile.ZipFile(temp_zip, 'r') as zip_ref:
-                    zip_ref.extractall(extract_dir)
-                    
-                # 删除临时文件
-                os.unlink(temp_zip)
-                
-            except Exception as e:
-                raise RuntimeError(f"解压失败: {str(e)}")
+        # 直接从映射的文件中并行解压，不复制 ZIP 数据
+        extract_archive(crx_path, extract_dir, jobs=jobs)
         
         # 读取manifest.json获取更多信息
         manifest_path = os.path.join(extract_dir, 'manifest.json')
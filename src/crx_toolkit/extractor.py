@@ -0,0 +1,248 @@
+import os
+import time
+import zlib
+import struct
+import logging
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Dict, Iterable, List, Optional
+from .crx_reader import CrxReader, LOCAL_FILE_HEADER
+
+# 每次送入解压器的压缩数据量，同时也是单次输出的上限
+CHUNK_SIZE = 1024 * 1024
+
+# 本地文件头固定部分的长度
+LOCAL_HEADER_SIZE = 30
+
+
+def member_path(extract_dir: str, filename: str) -> Optional[str]:
+    """计算成员的解压路径，与 zipfile.extract 一样去掉绝对路径和 .. 等部分
+
+    Returns:
+        Optional[str]: 目标路径，成员名为空时返回None
+    """
+    arcname = filename.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid = ('', os.path.curdir, os.path.pardir)
+    parts = [x for x in arcname.split(os.path.sep) if x not in invalid]
+    if os.path.sep == '\\':
+        parts = [zipfile.ZipFile._sanitize_windows_name(x, os.path.sep) for x in parts]
+        parts = [x for x in parts if x]
+    if not parts:
+        return None
+    return os.path.join(extract_dir, *parts)
+
+
+def data_offset(payload: memoryview, info: zipfile.ZipInfo) -> int:
+    """根据本地文件头计算成员数据的起始位置（本地头的扩展字段长度可能与中央目录不同）"""
+    start = info.header_offset
+    header = payload[start:start + LOCAL_HEADER_SIZE]
+    if len(header) < LOCAL_HEADER_SIZE or header[:4] != LOCAL_FILE_HEADER:
+        raise zipfile.BadZipFile(f"本地文件头无效: {info.filename}")
+    name_len, extra_len = struct.unpack_from('<HH', header, 26)
+    return start + LOCAL_HEADER_SIZE + name_len + extra_len
+
+
+def _extract_member(payload: memoryview, zf: zipfile.ZipFile, info: zipfile.ZipInfo, target: str) -> int:
+    """解压单个成员，返回写出的字节数
+
+    存储和 DEFLATE 成员直接从映射内存中读取压缩数据并解压（zlib 在解压时
+    释放 GIL，因此可以多线程并行）；加密或其他压缩方式交给 zipfile。
+    """
+    if info.flag_bits & 0x1 or info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        with zf.open(info) as src, open(target, 'wb') as dst:
+            written = 0
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                dst.write(chunk)
+                written += len(chunk)
+        return written
+
+    start = data_offset(payload, info)
+    crc = 0
+    written = 0
+    with payload[start:start + info.compress_size] as data, open(target, 'wb') as dst:
+        if len(data) != info.compress_size:
+            raise zipfile.BadZipFile(f"成员数据不完整: {info.filename}")
+        if info.compress_type == zipfile.ZIP_STORED:
+            for pos in range(0, len(data), CHUNK_SIZE):
+                with data[pos:pos + CHUNK_SIZE] as chunk:
+                    crc = zlib.crc32(chunk, crc)
+                    dst.write(chunk)
+                    written += len(chunk)
+        else:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            for pos in range(0, len(data), CHUNK_SIZE):
+                with data[pos:pos + CHUNK_SIZE] as chunk:
+                    output = decompressor.decompress(chunk, CHUNK_SIZE)
+                while True:
+                    crc = zlib.crc32(output, crc)
+                    dst.write(output)
+                    written += len(output)
+                    if not decompressor.unconsumed_tail:
+                        break
+                    output = decompressor.decompress(decompressor.unconsumed_tail, CHUNK_SIZE)
+            tail = decompressor.flush()
+            crc = zlib.crc32(tail, crc)
+            dst.write(tail)
+            written += len(tail)
+    if crc != info.CRC or written != info.file_size:
+        raise zipfile.BadZipFile(f"CRC 校验失败: {info.filename}")
+    return written
+
+
+class _ArchiveExtraction:
+    """一个归档的解压任务：映射文件、预先创建目录树并把成员提交到线程池"""
+
+    def __init__(self, crx_path: str, extract_dir: str, executor: ThreadPoolExecutor):
+        self.crx_path = crx_path
+        self.extract_dir = extract_dir
+        self.start = time.perf_counter()
+        self.futures: List[Future] = []
+        self.reader = CrxReader(crx_path)
+        try:
+            self.zf = self.reader.open_zip()
+            self.payload = self.reader.payload()
+            members = []
+            directories = {extract_dir}
+            for info in self.zf.infolist():
+                target = member_path(extract_dir, info.filename)
+                if target is None:
+                    continue
+                if info.is_dir():
+                    directories.add(target)
+                else:
+                    directories.add(os.path.dirname(target))
+                    members.append((info, target))
+            for directory in sorted(directories):
+                os.makedirs(directory, exist_ok=True)
+            # 大文件先提交，缩短最后一个线程的尾部耗时
+            members.sort(key=lambda m: m[0].file_size, reverse=True)
+            for info, target in members:
+                self.futures.append(executor.submit(_extract_member, self.payload, self.zf, info, target))
+        except Exception:
+            self.close()
+            raise
+
+    def finish(self) -> Dict[str, Any]:
+        result = {'path': self.crx_path, 'output': self.extract_dir, 'files': 0, 'bytes': 0,
+                  'seconds': 0.0, 'error': None}
+        try:
+            for future in self.futures:
+                result['bytes'] += future.result()
+                result['files'] += 1
+        except Exception as e:
+            for future in self.futures:
+                future.cancel()
+            # 等待已经开始的任务结束后再释放映射
+            for future in self.futures:
+                if not future.cancelled():
+                    try:
+                        future.result()
+                    except Exception:
+                        pass
+            result['error'] = str(e)
+        finally:
+            self.close()
+        result['seconds'] = time.perf_counter() - self.start
+        return result
+
+    def close(self) -> None:
+        payload = getattr(self, 'payload', None)
+        if payload is not None:
+            payload.release()
+            self.payload = None
+        zf = getattr(self, 'zf', None)
+        if zf is not None:
+            zf.close()
+            self.zf = None
+        self.reader.close()
+
+
+def extract_archive(crx_path: str, extract_dir: str, jobs: Optional[int] = None) -> Dict[str, Any]:
+    """在线程池中并行解压单个 CRX/ZIP 文件
+
+    从 CRX 的负载偏移处直接读取成员，不生成临时 ZIP 文件。
+
+    Args:
+        crx_path: CRX 或 ZIP 文件路径
+        extract_dir: 解压目录
+        jobs: 工作线程数，默认等于 CPU 核心数
+
+    Returns:
+        dict: path、output、files、bytes、seconds、error
+    """
+    with ThreadPoolExecutor(max_workers=max(1, jobs or os.cpu_count() or 1)) as executor:
+        result = _ArchiveExtraction(crx_path, extract_dir, executor).finish()
+    if result['error']:
+        raise RuntimeError(result['error'])
+    return result
+
+
+def extract_many(
+    crx_paths: Iterable[str],
+    output_dir: Optional[str] = None,
+    jobs: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """批量解压多个 CRX/ZIP 文件，所有归档的成员共享同一个线程池
+
+    每个文件解压到 <output_dir>/<文件名（不含扩展名）>，output_dir 为None时
+    解压到文件所在目录。不同目录下的同名文件会得到相同的解压目录，此时按输入
+    顺序为后出现的文件加上 -2、-3 等后缀。同时打开的归档数量有上限，避免占用
+    过多文件描述符。
+
+    Args:
+        crx_paths: 文件列表
+        output_dir: 输出目录
+        jobs: 工作线程数，默认等于 CPU 核心数
+
+    Returns:
+        List[Dict[str, Any]]: 按输入顺序排列的每个文件的结果
+    """
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    max_open = jobs * 2
+    results: List[Optional[Dict[str, Any]]] = []
+    pending = deque()
+    used_dirs = set()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for crx_path in crx_paths:
+            base_name = os.path.splitext(os.path.basename(crx_path))[0]
+            base_dir = os.path.join(output_dir or os.path.dirname(crx_path), base_name)
+            extract_dir = base_dir
+            counter = 1
+            while os.path.normcase(os.path.abspath(extract_dir)) in used_dirs:
+                counter += 1
+                extract_dir = f"{base_dir}-{counter}"
+            used_dirs.add(os.path.normcase(os.path.abspath(extract_dir)))
+            results.append(None)
+            try:
+                pending.append((len(results) - 1, _ArchiveExtraction(crx_path, extract_dir, executor)))
+            except Exception as e:
+                results[-1] = {'path': crx_path, 'output': extract_dir, 'files': 0, 'bytes': 0,
+                               'seconds': 0.0, 'error': str(e)}
+            while len(pending) > max_open:
+                index, job = pending.popleft()
+                results[index] = job.finish()
+        while pending:
+            index, job = pending.popleft()
+            results[index] = job.finish()
+    for result in results:
+        if result['error']:
+            logging.error(f"解压失败 {result['path']}: {result['error']}")
+        else:
+            logging.info(f"已解压 {result['path']} -> {result['output']} ({result['files']} 个文件)")
+    return results
+
+
+def format_extract_report(results: List[Dict[str, Any]], elapsed: float) -> str:
+    """生成批量解压报告"""
+    lines = []
+    for r in results:
+        status = r['output'] if not r['error'] else f"FAILED: {r['error']}"
+        lines.append(f"{r['path']}  {r['files']:>6} 个文件  {r['seconds']:7.2f}s  {status}")
+    ok = sum(1 for r in results if not r['error'])
+    total = sum(r['bytes'] for r in results)
+    lines.append(f"成功 {ok}/{len(results)}，共 {total / 1024 / 1024:.2f} MB，耗时 {elapsed:.2f}s")
+    return '\n'.join(lines)
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .crx_reader import CrxReader
+from .metadata import read_manifest, localize, archive_extension_id, manifest_permissions
+from .verifier import find_crx_files
+
+# 默认索引数据库文件
+DEFAULT_INDEX_PATH = 'crx-index.sqlite'
+
+# 计算文件哈希时的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 每处理多少个文件提交一次事务
+COMMIT_INTERVAL = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    extension_id TEXT,
+    format_version INTEGER,
+    name TEXT,
+    version TEXT,
+    manifest_version INTEGER,
+    description TEXT,
+    manifest TEXT,
+    file_count INTEGER,
+    unpacked_size INTEGER,
+    indexed_at REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS permissions (
+    path TEXT NOT NULL REFERENCES archives(path) ON DELETE CASCADE,
+    permission TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT NOT NULL REFERENCES archives(path) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    compress_size INTEGER NOT NULL,
+    crc INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archives_extension_id ON archives(extension_id);
+CREATE INDEX IF NOT EXISTS idx_archives_name ON archives(name);
+CREATE INDEX IF NOT EXISTS idx_permissions_permission ON permissions(permission);
+CREATE INDEX IF NOT EXISTS idx_permissions_path ON permissions(path);
+CREATE INDEX IF NOT EXISTS idx_files_path ON files(path);
+CREATE INDEX IF NOT EXISTS idx_files_name ON files(name);
+"""
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """打开索引数据库，不存在时创建表结构"""
+    directory = os.path.dirname(os.path.abspath(db_path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def index_archive(path: str) -> Dict[str, Any]:
+    """解析单个 CRX/ZIP 文件，返回写入索引的记录
+
+    只读取中央目录、manifest.json 和所需的本地化文件，不解压其他成员。
+    解析失败时记录 error，文件的大小和 mtime 仍会写入，未变化时不再重试。
+    """
+    st = os.stat(path)
+    record = {
+        'path': path,
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': None,
+        'extension_id': None,
+        'format_version': None,
+        'name': None,
+        'version': None,
+        'manifest_version': None,
+        'description': None,
+        'manifest': None,
+        'file_count': None,
+        'unpacked_size': None,
+        'error': None,
+        'permissions': [],
+        'files': [],
+    }
+    try:
+        record['sha256'] = _file_sha256(path)
+        with CrxReader(path) as reader, reader.open_zip() as zf:
+            record['format_version'] = reader.format_version
+            infos = [info for info in zf.infolist() if not info.is_dir()]
+            record['files'] = [(info.filename, info.file_size, info.compress_size, info.CRC) for info in infos]
+            record['file_count'] = len(infos)
+            record['unpacked_size'] = sum(info.file_size for info in infos)
+            manifest = read_manifest(zf)
+            name = manifest.get('name', '')
+            if isinstance(name, dict):
+                name = name.get('default') or name.get('en') or next(iter(name.values()), '')
+            record['name'] = localize(zf, manifest, name)
+            record['description'] = localize(zf, manifest, manifest.get('description', ''))
+            record['version'] = manifest.get('version')
+            record['manifest_version'] = manifest.get('manifest_version')
+            record['manifest'] = json.dumps(manifest, ensure_ascii=False)
+            record['permissions'] = manifest_permissions(manifest)
+            record['extension_id'] = archive_extension_id(reader, manifest)
+    except Exception as e:
+        record['error'] = str(e)
+    return record
+
+
+def _write_record(conn: sqlite3.Connection, record: Dict[str, Any]) -> None:
+    path = record['path']
+    conn.execute('DELETE FROM archives WHERE path = ?', (path,))
+    conn.execute(
+        'INSERT INTO archives (path, size, mtime_ns, sha256, extension_id, format_version, name, version, '
+        'manifest_version, description, manifest, file_count, unpacked_size, indexed_at, error) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (path, record['size'], record['mtime_ns'], record['sha256'], record['extension_id'],
+         record['format_version'], record['name'], record['version'], record['manifest_version'],
+         record['description'], record['manifest'], record['file_count'], record['unpacked_size'],
+         time.time(), record['error'])
+    )
+    conn.executemany('INSERT INTO permissions (path, permission, kind) VALUES (?, ?, ?)',
+                     [(path, permission, kind) for permission, kind in record['permissions']])
+    conn.executemany('INSERT INTO files (path, name, size, compress_size, crc) VALUES (?, ?, ?, ?, ?)',
+                     [(path,) + member for member in record['files']])
+
+
+def build_index(
+    paths: Iterable[str],
+    db_path: str = DEFAULT_INDEX_PATH,
+    jobs: Optional[int] = None,
+    prune: bool = True
+) -> Dict[str, Any]:
+    """扫描 CRX 文件并更新 SQLite 索引
+
+    只有大小或 mtime 与索引记录不同的文件才会重新解析，解析在进程池中
+    并行进行，结果由主进程写入数据库。
+
+    Args:
+        paths: CRX 文件或目录列表
+        db_path: 索引数据库路径
+        jobs: 工作进程数，默认等于 CPU 核心数
+        prune: 是否删除已不存在的文件的记录
+
+    Returns:
+        dict: scanned、indexed、unchanged、removed、failed、seconds
+    """
+    start = time.perf_counter()
+    files = [os.path.abspath(path) for path in find_crx_files(paths)]
+    conn = connect(db_path)
+    try:
+        known = {row['path']: (row['size'], row['mtime_ns'])
+                 for row in conn.execute('SELECT path, size, mtime_ns FROM archives')}
+        changed = []
+        for path in files:
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                logging.warning(f"无法读取文件 {path}: {str(e)}")
+                continue
+            if known.get(path) != (st.st_size, st.st_mtime_ns):
+                changed.append(path)
+
+        removed = 0
+        if prune:
+            stale = [(path,) for path in known if not os.path.exists(path)]
+            if stale:
+                with conn:
+                    conn.executemany('DELETE FROM archives WHERE path = ?', stale)
+                removed = len(stale)
+
+        logging.info(f"扫描到 {len(files)} 个文件，{len(changed)} 个需要重新索引")
+        failed = 0
+        jobs = max(1, min(jobs or os.cpu_count() or 1, len(changed) or 1))
+        if jobs == 1:
+            records = map(index_archive, changed)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            chunksize = max(1, min(64, len(changed) // (jobs * 4)))
+            records = executor.map(index_archive, changed, chunksize=chunksize)
+        try:
+            pending = 0
+            for record in records:
+                if record['error']:
+                    failed += 1
+                    logging.warning(f"解析失败 {record['path']}: {record['error']}")
+                _write_record(conn, record)
+                pending += 1
+                if pending >= COMMIT_INTERVAL:
+                    conn.commit()
+                    pending = 0
+            conn.commit()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    finally:
+        conn.close()
+    return {
+        'scanned': len(files),
+        'indexed': len(changed),
+        'unchanged': len(files) - len(changed),
+        'removed': removed,
+        'failed': failed,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _version_key(version: Optional[str]) -> Tuple[int, ...]:
+    """Chrome 扩展版本号由最多四段整数组成"""
+    parts = []
+    for part in (version or '').split('.'):
+        parts.append(int(part) if part.isdigit() else -1)
+    return tuple(parts)
+
+
+def query_index(
+    db_path: str = DEFAULT_INDEX_PATH,
+    extension_id: Optional[str] = None,
+    permission: Optional[str] = None,
+    name: Optional[str] = None,
+    file_name: Optional[str] = None,
+    latest: bool = False
+) -> List[Dict[str, Any]]:
+    """按条件查询索引，条件之间为 AND 关系
+
+    Args:
+        db_path: 索引数据库路径
+        extension_id: 扩展ID
+        permission: 声明的权限（含可选权限和主机权限）
+        name: 扩展名称，支持 SQL LIKE 通配符 % 和 _
+        file_name: 包含的成员路径，支持 SQL LIKE 通配符
+        latest: 先为每个扩展ID选出版本号最高的一条，再对其应用其他条件
+
+    Returns:
+        List[Dict[str, Any]]: 匹配的归档记录（不含 manifest 原文）
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"索引不存在: {db_path}")
+    where = ['error IS NULL']
+    params = []
+    if extension_id:
+        where.append('extension_id = ?')
+        params.append(extension_id)
+    # 版本选择只看扩展本身，其余条件在选出最新版本后再过滤
+    base_where, base_params = list(where), list(params)
+    if permission:
+        where.append('path IN (SELECT path FROM permissions WHERE permission = ?)')
+        params.append(permission)
+    if name:
+        where.append('name LIKE ?')
+        params.append(name)
+    if file_name:
+        where.append('path IN (SELECT path FROM files WHERE name LIKE ?)')
+        params.append(file_name)
+    sql = ('SELECT path, extension_id, name, version, manifest_version, format_version, size, sha256, '
+           'file_count, unpacked_size FROM archives WHERE {} ORDER BY extension_id, path')
+    conn = connect(db_path)
+    try:
+        if not latest:
+            return [dict(row) for row in conn.execute(sql.format(' AND '.join(where)), params)]
+        best = {}
+        for row in conn.execute(sql.format(' AND '.join(base_where)), base_params):
+            row = dict(row)
+            key = row['extension_id'] or row['path']
+            if key not in best or _version_key(row['version']) > _version_key(best[key]['version']):
+                best[key] = row
+        rows = list(best.values())
+        if len(where) > len(base_where):
+            matched = {row['path'] for row in conn.execute(sql.format(' AND '.join(where)), params)}
+            rows = [row for row in rows if row['path'] in matched]
+        return rows
+    finally:
+        conn.close()
+
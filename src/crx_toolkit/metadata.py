@@ -0,0 +1,120 @@
+import json
+import base64
+import logging
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple
+from .crx_reader import CrxReader
+from .crx3 import extension_id_from_crx_id, extension_id_from_public_key
+
+# 查找本地化名称时的语言优先级，最后再尝试 manifest 的 default_locale
+LOCALE_PRIORITY = ['zh_CN', 'en', 'en_US', 'default']
+
+
+def _read_json(zf: zipfile.ZipFile, name: str) -> Optional[Any]:
+    try:
+        data = zf.read(name)
+    except KeyError:
+        return None
+    return json.loads(data.decode('utf-8-sig'))
+
+
+def read_manifest(zf: zipfile.ZipFile) -> Dict[str, Any]:
+    """读取 manifest.json"""
+    manifest = _read_json(zf, 'manifest.json')
+    if not isinstance(manifest, dict):
+        raise ValueError("manifest.json 不存在")
+    return manifest
+
+
+def localize(zf: zipfile.ZipFile, manifest: Dict[str, Any], value: Any, locales: Optional[List[str]] = None) -> Any:
+    """将 __MSG_key__ 形式的值替换为 _locales/<语言>/messages.json 中的消息
+
+    只读取需要的 messages.json 成员，找不到时原样返回。
+    """
+    if not isinstance(value, str) or not value.startswith('__MSG_') or not value.endswith('__'):
+        return value
+    msg_key = value[6:-2]
+    candidates = list(locales or LOCALE_PRIORITY)
+    default_locale = manifest.get('default_locale')
+    if default_locale and default_locale not in candidates:
+        candidates.append(default_locale)
+    for locale in candidates:
+        try:
+            messages = _read_json(zf, f'_locales/{locale}/messages.json')
+        except ValueError as e:
+            logging.warning(f"读取本地化文件失败[{locale}]: {e}")
+            continue
+        if not isinstance(messages, dict):
+            continue
+        message = messages.get(msg_key)
+        if message is None:
+            # 消息名称不区分大小写
+            lowered = msg_key.lower()
+            message = next((v for k, v in messages.items() if k.lower() == lowered), None)
+        if isinstance(message, dict) and message.get('message'):
+            logging.info(f"找到本地化名称[{locale}]: {message['message']}")
+            return message['message']
+    logging.warning(f"未找到本地化消息: {msg_key}")
+    return value
+
+
+def archive_extension_id(reader: CrxReader, manifest: Dict[str, Any]) -> Optional[str]:
+    """CRX3 取头部的 crx_id，CRX2 由公钥计算，ZIP 由 manifest 的 key 字段计算"""
+    header = reader.header
+    if header.get('crx_id'):
+        return extension_id_from_crx_id(bytes(header['crx_id']))
+    if header.get('public_key'):
+        return extension_id_from_public_key(bytes(header['public_key']))
+    key = manifest.get('key')
+    if isinstance(key, str):
+        try:
+            return extension_id_from_public_key(base64.b64decode(key))
+        except ValueError:
+            pass
+    return None
+
+
+def manifest_permissions(manifest: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """展开 manifest 中的权限，返回 (权限, 类别) 列表
+
+    MV2 的 permissions 中混有主机匹配模式，按是否包含 :// 或为 <all_urls> 归为 host。
+    """
+    result = []
+    for field, kind in (('permissions', 'permission'), ('optional_permissions', 'optional'),
+                        ('host_permissions', 'host'), ('optional_host_permissions', 'optional_host')):
+        values = manifest.get(field)
+        if not isinstance(values, list):
+            continue
+        for value in values:
+            if not isinstance(value, str):
+                continue
+            if kind in ('permission', 'optional') and ('://' in value or value == '<all_urls>'):
+                kind_for_value = 'host' if kind == 'permission' else 'optional_host'
+            else:
+                kind_for_value = kind
+            result.append((value, kind_for_value))
+    return result
+
+
+def read_metadata(crx_path: str) -> Dict[str, Any]:
+    """只读取 manifest.json 和所需的本地化文件，获取扩展元数据
+
+    通过 CrxReader 映射文件并从中央目录定位成员，不解压整个扩展。
+
+    Args:
+        crx_path: CRX 或 ZIP 文件路径
+
+    Returns:
+        dict: name（已本地化）、version、description（已本地化）、manifest
+    """
+    with CrxReader(crx_path) as reader, reader.open_zip() as zf:
+        manifest = read_manifest(zf)
+        name = manifest.get('name', '')
+        if isinstance(name, dict):  # 处理多语言名称
+            name = name.get('default') or name.get('en') or name.get('zh_CN') or next(iter(name.values()), '')
+        return {
+            'name': localize(zf, manifest, name),
+            'version': manifest.get('version', 'unknown'),
+            'description': localize(zf, manifest, manifest.get('description', '')),
+            'manifest': manifest,
+        }
@@ -0,0 +1,131 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Optional
+
+# 默认缓存目录，可通过环境变量 CRX_TOOLKIT_MINIFY_CACHE 覆盖
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'crx-toolkit', 'minify')
+
+# 默认缓存上限: 512 MB
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_cache_dir() -> str:
+    """获取默认的混淆缓存目录"""
+    return os.environ.get('CRX_TOOLKIT_MINIFY_CACHE') or DEFAULT_CACHE_DIR
+
+
+class MinifyCache:
+    """按内容寻址的 JS 混淆结果缓存
+
+    缓存键为源文件字节与 terser 选项指纹（TerserPool.cache_options()）的 SHA-256，条目以
+    ``<目录>/<键前两位>/<键>.js`` 形式保存。写入先落到临时文件再原子替换，
+    因此多个 CI 进程可以共享同一个缓存目录。命中时刷新文件 mtime，
+    evict() 按 mtime 从旧到新淘汰，使缓存总大小不超过上限（LRU）。
+
+    Args:
+        cache_dir: 缓存目录，默认使用 default_cache_dir()
+        options: terser 选项与版本的指纹，作为缓存键的一部分
+        max_bytes: 缓存总大小上限（字节）
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        options: str = '',
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.options = options
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, source_path: str) -> str:
+        """计算源文件的缓存键"""
+        digest = hashlib.sha256()
+        with open(source_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+        digest.update(b'\0')
+        digest.update(self.options.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.js")
+
+    def get(self, key: str, output_path: str) -> bool:
+        """命中时将缓存内容写入 output_path 并返回 True"""
+        entry = self._entry_path(key)
+        try:
+            with open(entry, 'rb') as f:
+                data = f.read()
+            os.utime(entry, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(self, key: str, minified_path: str) -> None:
+        """将混淆结果存入缓存"""
+        entry = self._entry_path(key)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            with open(minified_path, 'rb') as f:
+                data = f.read()
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, entry)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logging.warning(f"写入混淆缓存失败: {str(e)}")
+
+    def evict(self) -> int:
+        """按最近使用时间淘汰条目，返回删除的条目数"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.js'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                # 其他进程已删除
+                pass
+            except OSError as e:
+                logging.debug(f"淘汰缓存条目失败 {path}: {str(e)}")
+                continue
+            total -= size
+        if removed:
+            logging.info(f"混淆缓存淘汰 {removed} 个条目")
+        return removed
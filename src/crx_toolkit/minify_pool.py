@@ -0,0 +1,292 @@
+import os
+import json
+import queue
+import logging
+import threading
+import subprocess
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple, Dict, Any
+
+# 与 packer.TERSER_CLI_OPTIONS 等价的 terser minify() 选项
+TERSER_MINIFY_OPTIONS: Dict[str, Any] = {
+    'compress': {
+        'passes': 3,
+        'pure_funcs': ['console.log'],
+        'drop_console': True,
+        'unsafe': True,
+        'dead_code': True,
+        'toplevel': True,
+        'evaluate': True,
+    },
+    'mangle': {
+        'toplevel': True,
+        'eval': True,
+        'reserved': ['chrome', 'browser'],
+    },
+    'format': {
+        'comments': False,
+        'beautify': False,
+    },
+}
+
+# 按与工作进程相同的方式解析 terser：优先工作目录中的本地安装，其次全局安装
+REQUIRE_SCRIPT = r"""
+function requireLocal(name) {
+  try {
+    return require(require.resolve(name, {paths: [process.cwd()]}));
+  } catch (e) {
+    return require(name);
+  }
+}
+"""
+
+# Node 工作进程脚本：每行一个 JSON 请求，每行一个 JSON 响应
+WORKER_SCRIPT = REQUIRE_SCRIPT + r"""
+const readline = require('readline');
+let terser;
+try {
+  terser = requireLocal('terser');
+} catch (e) {
+  process.stdout.write(JSON.stringify({ready: false, error: String(e.message || e)}) + '\n');
+  process.exit(1);
+}
+const rl = readline.createInterface({input: process.stdin, crlfDelay: Infinity});
+rl.on('line', async (line) => {
+  let req;
+  try {
+    req = JSON.parse(line);
+    const result = await terser.minify(req.code, req.options);
+    process.stdout.write(JSON.stringify({id: req.id, code: result.code}) + '\n');
+  } catch (e) {
+    process.stdout.write(JSON.stringify({id: req && req.id, error: String(e && e.message || e)}) + '\n');
+  }
+});
+process.stdout.write(JSON.stringify({ready: true}) + '\n');
+"""
+
+# 输出工作进程将加载的 terser 的版本号
+VERSION_SCRIPT = REQUIRE_SCRIPT + r"""
+process.stdout.write(requireLocal('terser/package.json').version);
+"""
+
+
+@lru_cache(maxsize=None)
+def terser_version(node_path: str = 'node', cwd: Optional[str] = None) -> Optional[str]:
+    """获取工作进程将加载的 terser 的版本号，无法确定时返回None"""
+    try:
+        result = subprocess.run(
+            [node_path, '-e', VERSION_SCRIPT],
+            capture_output=True,
+            text=True,
+            cwd=cwd or os.getcwd(),
+            env=os.environ.copy(),
+            check=False
+        )
+    except OSError as e:
+        logging.debug(f"获取 terser 版本失败: {str(e)}")
+        return None
+    version = result.stdout.strip()
+    return version if result.returncode == 0 and version else None
+
+
+class _Worker:
+    """单个常驻 Node 工作进程"""
+
+    def __init__(self, node_path: str, cwd: str):
+        self.process = subprocess.Popen(
+            [node_path, '-e', WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=cwd,
+            env=os.environ.copy(),
+            text=True,
+            encoding='utf-8',
+            bufsize=1
+        )
+        self._next_id = 0
+
+    def handshake(self) -> Dict[str, Any]:
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError("Node 工作进程启动失败")
+        return json.loads(line)
+
+    def request(self, code: str, options: Dict[str, Any]) -> str:
+        self._next_id += 1
+        payload = json.dumps({'id': self._next_id, 'code': code, 'options': options})
+        self.process.stdin.write(payload + '\n')
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError("Node 工作进程意外退出")
+        response = json.loads(line)
+        if response.get('error') or response.get('code') is None:
+            raise RuntimeError(response.get('error') or "terser 未返回结果")
+        return response['code']
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self) -> None:
+        try:
+            if self.process.stdin:
+                self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.process.kill()
+        finally:
+            if self.process.stdout:
+                self.process.stdout.close()
+
+
+class TerserPool:
+    """常驻 Node.js terser 工作进程池
+
+    每个工作进程只启动一次，通过 stdin/stdout 逐行交换 JSON 请求，
+    避免为每个 JS 文件重复支付 npx/node 的启动开销。
+
+    Args:
+        size: 工作进程数量，默认等于 CPU 核心数
+        node_path: Node.js 可执行文件路径
+        options: 传给 terser.minify() 的选项
+        cwd: 工作进程的工作目录，用于解析本地安装的 terser
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        node_path: str = 'node',
+        options: Optional[Dict[str, Any]] = None,
+        cwd: Optional[str] = None
+    ):
+        self.size = max(1, size or os.cpu_count() or 1)
+        self.node_path = node_path
+        self.options = options if options is not None else TERSER_MINIFY_OPTIONS
+        self.cwd = cwd or os.getcwd()
+        self._workers: List[_Worker] = []
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    def start(self) -> bool:
+        """启动全部工作进程，返回是否可用"""
+        with self._lock:
+            if self._started:
+                return True
+            try:
+                for _ in range(self.size):
+                    worker = _Worker(self.node_path, self.cwd)
+                    self._workers.append(worker)
+                    status = worker.handshake()
+                    if not status.get('ready'):
+                        raise RuntimeError(status.get('error') or "无法加载 terser")
+                    self._idle.put(worker)
+            except Exception as e:
+                logging.warning(f"启动 terser 工作进程池失败: {str(e)}")
+                self._shutdown_workers()
+                return False
+            self._started = True
+            logging.info(f"terser 工作进程池已启动: {self.size} 个进程")
+            return True
+
+    def cache_options(self) -> Optional[str]:
+        """混淆缓存键使用的指纹：实际发送给工作进程的选项加 terser 版本号
+
+        选项或 terser 版本变化后旧的缓存条目不再命中。无法确定 terser 版本时
+        返回None，调用方应不使用缓存。
+        """
+        version = terser_version(self.node_path, self.cwd)
+        if version is None:
+            return None
+        options = json.dumps(self.options, sort_keys=True, separators=(',', ':'))
+        return f"terser {version}\0{options}"
+
+    def minify(self, code: str) -> str:
+        """混淆一段 JavaScript 代码，失败时抛出 RuntimeError"""
+        if not self._started and not self.start():
+            raise RuntimeError("terser 工作进程池不可用")
+        worker = self._idle.get()
+        try:
+            return worker.request(code, self.options)
+        finally:
+            if worker.alive():
+                self._idle.put(worker)
+            else:
+                # 替换已退出的工作进程，保证池大小不变
+                worker.close()
+                try:
+                    worker = self._respawn(worker)
+                except Exception as e:
+                    # 重启失败时放回原进程，后续请求会快速失败并回退到 npx
+                    logging.warning(f"重启 terser 工作进程失败: {str(e)}")
+                self._idle.put(worker)
+
+    def minify_file(self, input_path: str, output_path: str) -> bool:
+        """混淆单个文件，语义与 packer.minify_js_file 一致"""
+        try:
+            with open(input_path, 'r', encoding='utf-8') as f:
+                code = f.read()
+            minified = self.minify(code)
+            if not minified:
+                return False
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(minified)
+            orig_size = os.path.getsize(input_path)
+            new_size = os.path.getsize(output_path)
+            saved = ((orig_size - new_size) / orig_size) * 100 if orig_size else 0.0
+            logging.info(f"混淆 {os.path.basename(input_path)}: {orig_size} -> {new_size} 字节 (减少 {saved:.1f}%)")
+            return True
+        except Exception as e:
+            logging.warning(f"混淆 {input_path} 时发生错误: {str(e)}")
+            return False
+
+    def minify_files(self, jobs: List[Tuple[str, str]]) -> Dict[str, bool]:
+        """并行混淆多个文件
+
+        Args:
+            jobs: (输入路径, 输出路径) 列表
+
+        Returns:
+            Dict[str, bool]: 输入路径 -> 是否混淆成功
+        """
+        if not jobs:
+            return {}
+        if not self._started and not self.start():
+            return {input_path: False for input_path, _ in jobs}
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            results = executor.map(lambda job: self.minify_file(*job), jobs)
+            return {input_path: ok for (input_path, _), ok in zip(jobs, results)}
+
+    def _respawn(self, old: _Worker) -> _Worker:
+        with self._lock:
+            worker = _Worker(self.node_path, self.cwd)
+            if not worker.handshake().get('ready'):
+                worker.close()
+                raise RuntimeError("无法加载 terser")
+            self._workers[self._workers.index(old)] = worker
+            return worker
+
+    def _shutdown_workers(self) -> None:
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+        self._idle = queue.Queue()
+
+    def close(self) -> None:
+        """关闭全部工作进程"""
+        with self._lock:
+            self._shutdown_workers()
+            self._started = False
+
+    def __enter__(self) -> 'TerserPool':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -2,13 +2,30 @@ import os
 import json
 import logging
 import subprocess
+import atexit
 import tempfile
-import zipfile
-from typing import Optional, List, Tuple
+from functools import lru_cache
+from typing import Optional, List, Tuple, Dict, Union, Iterable
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import rsa
 from .utils.file_utils import ensure_dir
+from .minify_pool import TerserPool
+from .minify_cache import MinifyCache, DEFAULT_MAX_BYTES
+from .archive import write_zip
+from .compression import CompressionPolicy, CompressionReport
+from .crx3 import KeySigner, write_crx3, extension_id_from_public_key
+from .sign_server import RemoteSigner
+
+# minify_js_file 传给 terser 命令行的选项
+TERSER_CLI_OPTIONS = [
+    '--compress', 'passes=3,pure_funcs=[console.log],drop_console=true,'
+                  'unsafe=true,dead_code=true,toplevel=true,evaluate=true',
+    '--mangle', 'toplevel=true,eval=true,reserved=[chrome,browser]',
+    '--format', 'comments=false,beautify=false',
+]
+
+# 长驻进程中跨多次打包复用的 terser 工作进程池
+_shared_terser_pool: Optional[TerserPool] = None
 
 def setup_logging(verbose: bool = False, log_file: str = 'crx_pack.log'):
     """配置日志
@@ -27,8 +44,9 @@ def setup_logging(verbose: bool = False, log_file: str = 'crx_pack.log'):
         ]
     )
 
+@lru_cache(maxsize=None)
 def get_node_path() -> str:
-    """获取 Node.js 可执行文件路径"""
+    """获取 Node.js 可执行文件路径（每个进程只探测一次）"""
     try:
         # Windows 系统
         if os.name == 'nt':
@@ -77,8 +95,9 @@ def get_node_path() -> str:
         logging.debug(f"查找 Node.js 路径时发生错误: {str(e)}")
         return 'node'
 
+@lru_cache(maxsize=None)
 def check_nodejs_installed() -> bool:
-    """检查 Node.js 和 npm 是否已安装"""
+    """检查 Node.js 和 npm 是否已安装（每个进程只探测一次）"""
     try:
         node_path = get_node_path()
         npm_cmd = 'npm.cmd' if os.name == 'nt' else 'npm'
@@ -149,6 +168,8 @@ def install_terser() -> bool:
         
         if result.returncode == 0:
             logging.info("terser 安装成功")
+            # 安装后需要重新探测
+            check_terser_installed.cache_clear()
             return True
         else:
             logging.error(f"terser 安装失败: {result.stderr}")
@@ -157,8 +178,9 @@ def install_terser() -> bool:
         logging.error(f"安装 terser 时发生错误: {str(e)}")
         return False
 
+@lru_cache(maxsize=None)
 def check_terser_installed() -> bool:
-    """检查 terser 是否已安装"""
+    """检查 terser 是否已安装（每个进程只探测一次）"""
     try:
         # 首先检查 Node.js 环境
         if not check_nodejs_installed():
@@ -212,14 +234,7 @@ def minify_js_file(input_path: str, output_path: str) -> bool:
     try:
         # 构建 terser 命令
         npx_cmd = 'npx.cmd' if os.name == 'nt' else 'npx'
-        cmd = [
-            npx_cmd, 'terser', input_path,
-            '--compress', 'passes=3,pure_funcs=[console.log],drop_console=true,'
-                        'unsafe=true,dead_code=true,toplevel=true,evaluate=true',
-            '--mangle', 'toplevel=true,eval=true,reserved=[chrome,browser]',
-            '--format', 'comments=false,beautify=false',
-            '--output', output_path
-        ]
+        cmd = [npx_cmd, 'terser', input_path] + TERSER_CLI_OPTIONS + ['--output', output_path]
         
         # 运行 terser
         result = subprocess.run(cmd, capture_output=True, text=True, env=os.environ.copy())
@@ -242,6 +257,181 @@ def minify_js_file(input_path: str, output_path: str) -> bool:
         logging.warning(f"混淆 {input_path} 时发生错误: {str(e)}")
         return False
 
+def minify_js_files(
+    js_jobs: List[Tuple[str, str]],
+    terser_pool: Optional[TerserPool] = None,
+    cache: Optional[MinifyCache] = None
+) -> Dict[str, bool]:
+    """批量混淆 JavaScript 文件，优先使用缓存和工作进程池
+    
+    Args:
+        js_jobs: (输入路径, 输出路径) 列表
+        terser_pool: terser 工作进程池，不可用时回退为逐个调用 npx terser
+        cache: 混淆结果缓存，命中的文件不再调用 terser
+    
+    Returns:
+        Dict[str, bool]: 输入路径 -> 是否混淆成功
+    """
+    results = {}
+    pending = []
+    keys = {}
+    for src, dst in js_jobs:
+        if cache is not None:
+            keys[src] = cache.key_for(src)
+            if cache.get(keys[src], dst):
+                results[src] = True
+                continue
+        pending.append((src, dst))
+    
+    pooled = False
+    if pending:
+        if terser_pool is not None and terser_pool.start():
+            results.update(terser_pool.minify_files(pending))
+            pooled = True
+        else:
+            # 进程池不可用时回退为逐个调用 npx terser
+            results.update({src: minify_js_file(src, dst) for src, dst in pending})
+    
+    if cache is not None:
+        # 缓存键对应工作进程池的选项，npx terser 的输出不写入缓存
+        if pooled:
+            for src, dst in pending:
+                if results.get(src):
+                    cache.put(keys[src], dst)
+        logging.info(f"混淆缓存: 命中 {cache.hits} 个，未命中 {cache.misses} 个")
+        cache.evict()
+    return results
+
+def write_crx(
+    output_file: str,
+    entries: List[Tuple[str, str]],
+    private_key: Optional[rsa.RSAPrivateKey] = None,
+    previous: Optional[str] = None,
+    jobs: Optional[int] = None,
+    policy: Optional[CompressionPolicy] = None,
+    report: Optional[CompressionReport] = None,
+    signer: Optional[Union[KeySigner, RemoteSigner]] = None
+) -> None:
+    """流式写出 CRX3 文件
+    
+    按 CRX3 规范写出 CrxFileHeader/SignedData 头部。ZIP 数据直接压缩到
+    预留的头部之后，签名摘要在压缩过程中用增量 SHA-256 计算，最后通过
+    Prehashed 签名并回写头部。整个过程不产生临时ZIP文件，也不会把归档
+    读入内存。
+    
+    Args:
+        output_file: 输出的CRX文件路径
+        entries: (归档内路径, 源文件路径) 列表
+        private_key: 签名私钥，为None时不签名
+        previous: 上一次生成的 CRX 或 ZIP 文件，用于增量打包
+        jobs: 并行压缩的线程数，默认等于 CPU 核心数
+        policy: 按文件决定压缩方式和级别的策略
+        report: 可选的压缩统计
+        signer: 签名器（例如连接签名服务的 RemoteSigner），优先于 private_key
+    """
+    if signer is None and private_key is not None:
+        signer = KeySigner(private_key)
+    
+    def write_archive(f, digest) -> int:
+        return write_zip(
+            f,
+            entries,
+            hasher=digest,
+            previous=previous,
+            jobs=jobs,
+            policy=policy,
+            report=report
+        )
+    
+    with open(output_file, 'wb') as f:
+        zip_size = write_crx3(f, write_archive, signer)
+    logging.info(f"ZIP数据写入完成: {zip_size} 字节")
+    if signer is not None:
+        logging.info(f"签名计算完成，扩展ID: {extension_id_from_public_key(signer.public_key_der)}")
+
+def sign_payload(
+    output_file: str,
+    chunks: Iterable[bytes],
+    private_key: Optional[rsa.RSAPrivateKey] = None,
+    signer: Optional[Union[KeySigner, RemoteSigner]] = None
+) -> int:
+    """将已经生成的 ZIP 数据签名并写出为 CRX3 文件
+    
+    与 write_crx 使用同一个签名流程：数据按块写到预留的头部之后，同时
+    送入增量 SHA-256，最后签名并回写头部。
+    
+    Args:
+        output_file: 输出的CRX文件路径
+        chunks: 按顺序产出 ZIP 数据的迭代器
+        private_key: 签名私钥，为None时不签名
+        signer: 签名器（例如连接签名服务的 RemoteSigner），优先于 private_key
+    
+    Returns:
+        int: 写出的 ZIP 数据字节数
+    """
+    if signer is None and private_key is not None:
+        signer = KeySigner(private_key)
+    
+    def write_archive(f, digest) -> int:
+        size = 0
+        for chunk in chunks:
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+        return size
+    
+    with open(output_file, 'wb') as f:
+        zip_size = write_crx3(f, write_archive, signer)
+    if signer is not None:
+        logging.info(f"签名计算完成，扩展ID: {extension_id_from_public_key(signer.public_key_der)}")
+    return zip_size
+
+def find_previous_artifact(output_dir: str, extension_name: str, extension: str) -> Optional[str]:
+    """查找输出目录中同一扩展最近一次生成的 CRX 或 ZIP 文件
+    
+    Args:
+        output_dir: 输出目录路径
+        extension_name: 输出文件名中的扩展名称部分
+        extension: 期望的文件后缀（crx 或 zip）
+    
+    Returns:
+        Optional[str]: 最近一次的产物路径，不存在时返回None
+    """
+    if not os.path.isdir(output_dir):
+        return None
+    prefix = f"{extension_name}-"
+    candidates = []
+    for name in os.listdir(output_dir):
+        if not name.startswith(prefix):
+            continue
+        if not (name.endswith('.crx') or name.endswith('.zip')):
+            continue
+        path = os.path.join(output_dir, name)
+        if os.path.isfile(path):
+            # 同格式的产物优先
+            candidates.append((name.endswith(f".{extension}"), os.path.getmtime(path), path))
+    if not candidates:
+        return None
+    return max(candidates)[2]
+
+def get_terser_pool(size: Optional[int] = None) -> TerserPool:
+    """获取进程内共享的 terser 工作进程池
+
+    适用于长驻进程中多次调用 pack_extension 的场景，进程池会保持预热，
+    并在解释器退出时自动关闭。
+
+    Args:
+        size: 工作进程数量，默认等于 CPU 核心数
+
+    Returns:
+        TerserPool: 共享的工作进程池
+    """
+    global _shared_terser_pool
+    if _shared_terser_pool is None:
+        _shared_terser_pool = TerserPool(size=size, node_path=get_node_path())
+        atexit.register(_shared_terser_pool.close)
+    return _shared_terser_pool
+
 def pack_extension(
     source_dir: str, 
     private_key_path: Optional[str], 
@@ -250,7 +440,18 @@ def pack_extension(
     verbose: bool = False,
     no_verify: bool = False,
     use_terser: bool = False,
-    use_zip: bool = False
+    use_zip: bool = False,
+    terser_pool: Optional[TerserPool] = None,
+    use_minify_cache: bool = True,
+    minify_cache_dir: Optional[str] = None,
+    minify_cache_size: int = DEFAULT_MAX_BYTES,
+    incremental: bool = False,
+    jobs: Optional[int] = None,
+    compression_policy: Optional[CompressionPolicy] = None,
+    report: bool = False,
+    private_key: Optional[rsa.RSAPrivateKey] = None,
+    signer: Optional[str] = None,
+    signer_key: Optional[str] = None
 ) -> str:
     """打包 Chrome 扩展
     
@@ -263,6 +464,17 @@ def pack_extension(
         no_verify: 是否跳过签名验证
         use_terser: 是否使用 terser 混淆 JavaScript 代码
         use_zip: 是否使用zip格式打包
+        terser_pool: 复用的 terser 工作进程池，为None时在本次打包内临时创建
+        use_minify_cache: 是否使用混淆结果缓存
+        minify_cache_dir: 混淆缓存目录，为None时使用默认目录
+        minify_cache_size: 混淆缓存大小上限（字节）
+        incremental: 是否增量打包，复用输出目录中上一次产物里未变化的压缩条目
+        jobs: 并行压缩和混淆的工作线程数，默认等于 CPU 核心数
+        compression_policy: 按文件决定压缩方式和级别的策略，为None时使用默认策略
+        report: 是否在日志中输出按文件类型统计的压缩报告
+        private_key: 已加载的私钥，提供时不再读取 private_key_path
+        signer: 签名服务地址（如 unix:///run/crx-sign.sock），提供时由签名服务签名
+        signer_key: 签名服务中使用的私钥（扩展ID），默认使用服务端的默认私钥
     
     Returns:
         str: 生成的文件路径
@@ -273,10 +485,14 @@ def pack_extension(
     try:
         # 如果启用了terser，确保其可用
         terser_available = False
+        owns_pool = False
         if use_terser:
             terser_available = ensure_terser_available()
             if not terser_available:
                 logging.warning("无法安装或使用 terser，将跳过所有JS代码混淆")
+            elif terser_pool is None:
+                terser_pool = TerserPool(size=jobs, node_path=get_node_path())
+                owns_pool = True
         
         # 验证源目录
         if not os.path.isdir(source_dir):
@@ -296,8 +512,14 @@ def pack_extension(
             logging.info(f"  版本: {manifest.get('version', 'Unknown')}")
             logging.info(f"  描述: {manifest.get('description', 'No description')}")
             
+        # 连接签名服务，私钥由服务进程持有
+        remote_signer = None
+        if not use_zip and not no_verify and signer:
+            remote_signer = RemoteSigner(signer, key_id=signer_key)
+            logging.info(f"使用签名服务: {signer}，扩展ID: {remote_signer.key_id}")
+        
         # 验证私钥文件（仅在crx格式时需要）
-        if not use_zip:
+        if not use_zip and private_key is None and remote_signer is None:
             if not private_key_path or not os.path.exists(private_key_path):
                 raise ValueError(f"私钥文件不存在: {private_key_path}")
             logging.info(f"私钥文件验证通过: {private_key_path}")
@@ -353,79 +575,79 @@ def pack_extension(
                     
         logging.info(f"找到 {len(files_to_pack)} 个文件需要打包")
         
-        # 创建临时目录用于处理文件
+        # 临时目录仅用于存放混淆后的JS文件，其余文件直接从源目录流式写入归档
         with tempfile.TemporaryDirectory() as temp_dir:
-            processed_files = []
+            # 如果启用了terser，先通过缓存和工作进程池并行混淆全部JS文件
+            minified = {}
+            if use_terser and terser_available:
+                js_jobs = []
+                for rel_path, abs_path in files_to_pack:
+                    if rel_path.endswith('.js'):
+                        target_path = os.path.join(temp_dir, rel_path)
+                        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                        js_jobs.append((abs_path, target_path))
+                if js_jobs:
+                    cache = None
+                    if use_minify_cache:
+                        cache_options = terser_pool.cache_options()
+                        if cache_options is None:
+                            logging.warning("无法确定 terser 版本，本次不使用混淆缓存")
+                        else:
+                            cache = MinifyCache(
+                                cache_dir=minify_cache_dir,
+                                options=cache_options,
+                                max_bytes=minify_cache_size
+                            )
+                    minified = minify_js_files(js_jobs, terser_pool, cache)
             
-            # 处理所有文件
+            # 已成功混淆的JS文件使用混淆结果，其余文件使用源文件
+            entries = []
             for rel_path, abs_path in files_to_pack:
-                target_path = os.path.join(temp_dir, rel_path)
-                os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                
-                # 如果启用了terser且是JS文件，尝试混淆
-                if use_terser and terser_available and rel_path.endswith('.js'):
-                    if minify_js_file(abs_path, target_path):
-                        processed_files.append((rel_path, target_path))
-                        continue
-                
-                # 如果不需要混淆或混淆失败，直接复制
-                import shutil
-                shutil.copy2(abs_path, target_path)
-                processed_files.append((rel_path, target_path))
+                if minified.get(abs_path):
+                    entries.append((rel_path, os.path.join(temp_dir, rel_path)))
+                else:
+                    entries.append((rel_path, abs_path))
+            
+            previous = None
+            if incremental:
+                previous = find_previous_artifact(output_dir, extension_name, extension)
+                if not previous:
+                    logging.info("未找到上一次的打包产物，将完整打包")
             
+            policy = compression_policy or CompressionPolicy()
+            compression_report = CompressionReport() if report else None
+            
+            # 先写入临时文件再替换，上一次产物在写入过程中保持可读
+            temp_output = output_file + '.tmp'
             if use_zip:
-                # 直接创建ZIP文件
-                with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-                    for rel_path, abs_path in processed_files:
-                        zf.write(abs_path, rel_path)
+                # 直接流式写入ZIP文件
+                with open(temp_output, 'wb') as f:
+                    write_zip(
+                        f,
+                        entries,
+                        previous=previous,
+                        jobs=jobs,
+                        policy=policy,
+                        report=compression_report
+                    )
                 logging.info(f"ZIP文件创建完成: {output_file}")
             else:
-                # 创建临时ZIP文件
-                zip_path = output_file + '.zip'
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                    for rel_path, abs_path in processed_files:
-                        zf.write(abs_path, rel_path)
-                logging.info("ZIP文件创建完成")
-                
-                # 读取ZIP内容
-                with open(zip_path, 'rb') as f:
-                    zip_data = f.read()
-                
-                # 计算签名
-                if not no_verify:
-                    signature = private_key.sign(
-                        zip_data,
-                        padding.PKCS1v15(),
-                        hashes.SHA256()
-                    )
-                    logging.info("签名计算完成")
-                    
-                    # 获取公钥
-                    public_key = private_key.public_key()
-                    public_key_bytes = public_key.public_bytes(
-                        encoding=serialization.Encoding.DER,
-                        format=serialization.PublicFormat.PKCS1
-                    )
-                    logging.info("公钥提取完成")
-                else:
+                if no_verify:
                     logging.warning("跳过签名验证")
-                    signature = b''
-                    public_key_bytes = b''
-                
-                # 写入CRX文件
-                with open(output_file, 'wb') as f:
-                    # CRX3格式头部
-                    f.write(b'Cr24')  # Magic number
-                    f.write((3).to_bytes(4, byteorder='little'))  # Version
-                    f.write(len(public_key_bytes).to_bytes(4, byteorder='little'))
-                    f.write(len(signature).to_bytes(4, byteorder='little'))
-                    f.write(public_key_bytes)
-                    f.write(signature)
-                    f.write(zip_data)
-                
-                # 清理临时文件
-                os.remove(zip_path)
-                logging.info("临时文件清理完成")
+                write_crx(
+                    temp_output,
+                    entries,
+                    None if no_verify else private_key,
+                    previous=previous,
+                    jobs=jobs,
+                    policy=policy,
+                    report=compression_report,
+                    signer=remote_signer
+                )
+            os.replace(temp_output, output_file)
+            
+            if compression_report is not None:
+                compression_report.log()
             
             logging.info(f"扩展打包成功: {output_file}")
             return output_file
@@ -434,10 +656,14 @@ def pack_extension(
         logging.error(f"打包失败: {str(e)}", exc_info=True)
         raise
     finally:
-        # 清理可能存在的临时文件
-        if not use_zip and 'zip_path' in locals() and os.path.exists(zip_path):
+        # 关闭本次打包临时创建的 terser 工作进程池
+        if use_terser and 'owns_pool' in locals() and owns_pool:
+            terser_pool.close()
+        if 'remote_signer' in locals() and remote_signer is not None:
+            remote_signer.close()
+        # 清理未完成的临时输出文件
+        if 'temp_output' in locals() and os.path.exists(temp_output):
             try:
-                os.remove(zip_path)
-                logging.debug("清理临时ZIP文件")
-            except:
-                pass 
\ No newline at end of file
+                os.remove(temp_output)
+            except OSError:
+                pass
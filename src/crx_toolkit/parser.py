@@ -1,6 +1,6 @@
 from typing import Dict, Any
 import json
-import zipfile
+from .crx_reader import CrxReader
 
 def parse_crx(crx_path: str) -> Dict[str, Any]:
     """
@@ -20,7 +20,10 @@ def parse_crx(crx_path: str) -> Dict[str, Any]:
     }
     
     try:
-        with zipfile.ZipFile(crx_path, 'r') as crx:
+        # Map the file and open the payload in place, locating it from the CRX header
+        with CrxReader(crx_path) as reader, reader.open_zip() as crx:
+            result['format_version'] = reader.format_version
+            
             # Read manifest.json
             try:
                 manifest = json.loads(crx.read('manifest.json'))
@@ -0,0 +1,239 @@
+import os
+import json
+import stat
+import errno
+import base64
+import socket
+import logging
+import threading
+import socketserver
+from typing import Any, Dict, List, Optional
+from .crx3 import KeySigner, extension_id_from_public_key
+from .signer import load_private_key
+
+# SHA-256 摘要长度
+DIGEST_SIZE = 32
+
+# 单次请求允许签名的摘要数量上限
+MAX_BATCH_SIZE = 1024
+
+
+def parse_signer_address(address: str) -> str:
+    """解析签名服务地址，目前只支持 unix:///path/to/socket"""
+    prefix = 'unix://'
+    if not address.startswith(prefix):
+        raise ValueError(f"不支持的签名服务地址: {address}")
+    path = address[len(prefix):]
+    if not path:
+        raise ValueError(f"签名服务地址缺少套接字路径: {address}")
+    return path
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """清理上次异常退出遗留的套接字文件
+
+    只有路径是套接字且无人监听（连接被拒绝）时才删除；路径是普通文件或
+    仍有签名服务在监听时抛出 RuntimeError，避免误删文件或抢走正在运行的服务。
+    """
+    try:
+        st = os.lstat(socket_path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise RuntimeError(f"路径已存在且不是套接字: {socket_path}")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        os.remove(socket_path)
+        return
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return
+        raise RuntimeError(f"无法确认套接字是否仍在使用 {socket_path}: {str(e)}")
+    finally:
+        probe.close()
+    raise RuntimeError(f"签名服务已在运行: {socket_path}")
+
+
+class _SignRequestHandler(socketserver.StreamRequestHandler):
+    """每个连接可以连续发送多个请求，每行一个 JSON 请求和一个 JSON 响应"""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            request = {}
+            try:
+                request = json.loads(line)
+                response = self.server.dispatch(request)
+            except Exception as e:
+                response = {'error': str(e)}
+            response['id'] = request.get('id') if isinstance(request, dict) else None
+            self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    _ServerBase = socketserver.UnixStreamServer
+else:  # pragma: no cover - Windows 旧版本不支持 AF_UNIX
+    _ServerBase = socketserver.TCPServer
+
+
+class SignServer(socketserver.ThreadingMixIn, _ServerBase):
+    """常驻内存的签名服务
+
+    启动时一次性加载全部私钥，通过 Unix 域套接字接收 SHA-256 摘要并返回
+    签名。每个连接由独立线程处理，一次请求可以携带多个摘要批量签名。
+    私钥永远不会离开服务进程，套接字文件权限设置为仅当前用户可访问。
+
+    请求格式::
+
+        {"op": "keys"}
+        {"op": "public_key", "key": "<扩展ID>"}
+        {"op": "sign", "key": "<扩展ID>", "digests": ["<base64>", ...]}
+
+    Args:
+        socket_path: Unix 域套接字路径
+        key_paths: 私钥文件路径列表，第一个为默认私钥
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, socket_path: str, key_paths: List[str]):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise RuntimeError("当前平台不支持 Unix 域套接字")
+        if not key_paths:
+            raise ValueError("至少需要一个私钥文件")
+        self.signers: Dict[str, KeySigner] = {}
+        self.default_key: Optional[str] = None
+        for key_path in key_paths:
+            signer = KeySigner(load_private_key(key_path))
+            key_id = extension_id_from_public_key(signer.public_key_der)
+            self.signers[key_id] = signer
+            if self.default_key is None:
+                self.default_key = key_id
+            logging.info(f"已加载私钥 {key_path}，扩展ID: {key_id}")
+
+        self.socket_path = socket_path
+        _remove_stale_socket(socket_path)
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _SignRequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def _signer(self, key_id: Optional[str]) -> KeySigner:
+        key_id = key_id or self.default_key
+        if key_id not in self.signers:
+            raise KeyError(f"未知的私钥: {key_id}")
+        return self.signers[key_id]
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get('op')
+        if op == 'keys':
+            return {'keys': list(self.signers), 'default': self.default_key}
+        signer = self._signer(request.get('key'))
+        if op == 'public_key':
+            return {
+                'key': extension_id_from_public_key(signer.public_key_der),
+                'public_key': base64.b64encode(signer.public_key_der).decode('ascii'),
+                'signature_size': signer.signature_size,
+            }
+        if op == 'sign':
+            digests = request.get('digests') or []
+            if len(digests) > MAX_BATCH_SIZE:
+                raise ValueError(f"单次最多签名 {MAX_BATCH_SIZE} 个摘要")
+            signatures = []
+            for item in digests:
+                digest = base64.b64decode(item)
+                if len(digest) != DIGEST_SIZE:
+                    raise ValueError("摘要必须是 32 字节的 SHA-256")
+                signatures.append(base64.b64encode(signer.sign_digest(digest)).decode('ascii'))
+            return {'signatures': signatures}
+        raise ValueError(f"未知的操作: {op}")
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+
+def serve(socket_path: str, key_paths: List[str]) -> None:
+    """启动签名服务并阻塞运行，直到收到中断信号"""
+    server = SignServer(socket_path, key_paths)
+    logging.info(f"签名服务已启动: unix://{socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("签名服务正在退出")
+    finally:
+        server.server_close()
+
+
+class RemoteSigner:
+    """签名服务的客户端，接口与 crx3.KeySigner 相同
+
+    Args:
+        address: 签名服务地址，例如 unix:///run/crx-sign.sock
+        key_id: 使用的私钥（扩展ID），为None时使用服务端的默认私钥
+        timeout: 套接字超时时间（秒）
+    """
+
+    def __init__(self, address: str, key_id: Optional[str] = None, timeout: float = 30):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise RuntimeError("当前平台不支持 Unix 域套接字")
+        self.address = address
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(parse_signer_address(address))
+        self._file = self._sock.makefile('rwb')
+
+        info = self._call({'op': 'public_key', 'key': key_id})
+        self.key_id = info['key']
+        self.public_key_der = base64.b64decode(info['public_key'])
+        self.signature_size = info['signature_size']
+
+    def _call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._next_id += 1
+            request = dict(request, id=self._next_id)
+            self._file.write((json.dumps(request) + '\n').encode('utf-8'))
+            self._file.flush()
+            line = self._file.readline()
+        if not line:
+            raise RuntimeError("签名服务连接已断开")
+        response = json.loads(line)
+        if response.get('error'):
+            raise RuntimeError(f"签名服务返回错误: {response['error']}")
+        return response
+
+    def sign_digests(self, digests: List[bytes]) -> List[bytes]:
+        """批量签名多个 SHA-256 摘要"""
+        response = self._call({
+            'op': 'sign',
+            'key': self.key_id,
+            'digests': [base64.b64encode(d).decode('ascii') for d in digests],
+        })
+        return [base64.b64decode(s) for s in response['signatures']]
+
+    def sign_digest(self, digest: bytes) -> bytes:
+        """对单个 SHA-256 摘要签名"""
+        return self.sign_digests([digest])[0]
+
+    def close(self) -> None:
+        try:
+            self._file.close()
+        finally:
+            self._sock.close()
+
+    def __enter__(self) -> 'RemoteSigner':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
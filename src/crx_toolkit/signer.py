@@ -1,11 +1,12 @@
 import os
 from typing import Union, Optional
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.backends import default_backend
-import zipfile
 import tempfile
-import struct
+from .archive import write_zip
+from .compression import CompressionPolicy
+from .crx3 import KeySigner, write_crx3
 
 def generate_private_key(output_path: str) -> None:
     """
@@ -45,29 +46,33 @@ def load_private_key(key_path: str) -> rsa.RSAPrivateKey:
         )
     return private_key
 
-def create_zip_file(source_dir: str) -> bytes:
+def create_zip_file(
+    source_dir: str,
+    jobs: Optional[int] = None,
+    policy: Optional[CompressionPolicy] = None
+) -> bytes:
     """
     将源目录打包为 ZIP 文件
     
     Args:
         source_dir: 源目录路径
+        jobs: 并行压缩的线程数，默认等于 CPU 核心数
+        policy: 按文件决定压缩方式和级别的策略，为None时使用默认策略
         
     Returns:
         bytes: ZIP 文件的二进制内容
     """
-    temp_zip = tempfile.NamedTemporaryFile(delete=False)
-    try:
-        with zipfile.ZipFile(temp_zip, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for root, _, files in os.walk(source_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arc_name = os.path.relpath(file_path, source_dir)
-                    zf.write(file_path, arc_name)
-        
-        with open(temp_zip.name, 'rb') as f:
-            return f.read()
-    finally:
-        os.unlink(temp_zip.name)
+    entries = []
+    for root, _, files in os.walk(source_dir):
+        for file in files:
+            file_path = os.path.join(root, file)
+            arc_name = os.path.relpath(file_path, source_dir)
+            entries.append((arc_name, file_path))
+    
+    with tempfile.TemporaryFile() as temp_zip:
+        write_zip(temp_zip, entries, jobs=jobs, policy=policy or CompressionPolicy())
+        temp_zip.seek(0)
+        return temp_zip.read()
 
 def sign_extension(source_dir: str, private_key_path: str) -> bytes:
     """
@@ -82,41 +87,19 @@ def sign_extension(source_dir: str, private_key_path: str) -> bytes:
     """
     # 加载私钥
     private_key = load_private_key(private_key_path)
-    public_key = private_key.public_key()
-    
-    # 获取公钥的 DER 编码
-    public_key_der = public_key.public_bytes(
-        encoding=serialization.Encoding.DER,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo
-    )
-    
-    # 创建 ZIP 文件
-    zip_data = create_zip_file(source_dir)
     
-    # 签名 ZIP 数据
-    signature = private_key.sign(
-        zip_data,
-        padding.PKCS1v15(),
-        hashes.SHA1()
-    )
-    
-    # CRX3 格式头部
-    magic = b'Cr24'  # Chrome 扩展文件魔数
-    version = struct.pack('<I', 3)  # CRX3 版本号
-    header_size = struct.pack('<I', 4 + 4 + 4 + len(public_key_der) + len(signature))
-    public_key_size = struct.pack('<I', len(public_key_der))
-    signature_size = struct.pack('<I', len(signature))
+    entries = []
+    for root, _, files in os.walk(source_dir):
+        for file in files:
+            file_path = os.path.join(root, file)
+            entries.append((os.path.relpath(file_path, source_dir), file_path))
     
-    # 组装 CRX 文件
-    crx_data = (
-        magic +
-        version +
-        header_size +
-        public_key_size +
-        signature_size +
-        public_key_der +
-        signature +
-        zip_data
-    )
-    
-    return crx_data 
\ No newline at end of file
+    # 压缩与 SHA-256 签名摘要的计算同时进行，头部在最后回写
+    with tempfile.TemporaryFile() as temp_crx:
+        write_crx3(
+            temp_crx,
+            lambda f, digest: write_zip(f, entries, hasher=digest, policy=CompressionPolicy()),
+            KeySigner(private_key)
+        )
+        temp_crx.seek(0)
+        return temp_crx.read()
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+from .crx_reader import CrxReader
+from .extractor import member_path, CHUNK_SIZE
+from .metadata import read_manifest, archive_extension_id
+from .downloader import sanitize_filename
+
+# 小于该大小的成员在内存中计算哈希，已存在的内容不写磁盘
+MEMORY_LIMIT = 8 * 1024 * 1024
+
+# 版本清单文件的后缀，与版本目录同级
+MANIFEST_SUFFIX = '.files.json'
+
+# gc() 只清理修改时间早于该时间（秒）的未引用 blob 和临时文件。正在进行的 add()
+# 写入或复用的 blob 在版本清单提交前没有被引用，不能被回收
+GC_GRACE_SECONDS = 3600
+
+
+class ContentStore:
+    """按内容寻址的解压存储，相同内容的文件在所有版本之间只保存一份
+
+    目录结构::
+
+        <store>/blobs/<哈希前两位>/<SHA-256>      只读的文件内容
+        <store>/trees/<扩展ID>/<版本>/            由硬链接组成的解压目录
+        <store>/trees/<扩展ID>/<版本>.files.json  路径 -> SHA-256 的版本清单
+
+    文件系统不支持硬链接时（例如跨设备）退回到复制。blob 设为只读，
+    防止修改某个版本目录中的文件时影响其他版本。gc() 删除没有任何版本
+    清单引用的 blob。
+
+    Args:
+        store_dir: 存储根目录
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.blob_dir = os.path.join(store_dir, 'blobs')
+        self.tree_dir = os.path.join(store_dir, 'trees')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tree_dir, exist_ok=True)
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], sha256)
+
+    def tree_path(self, extension_id: str, version: str) -> str:
+        return os.path.join(self.tree_dir, sanitize_filename(extension_id), sanitize_filename(version))
+
+    def _reuse_blob(self, blob: str) -> bool:
+        """内容已存在时刷新 blob 的修改时间并返回 True，使 gc() 在宽限期内不回收它"""
+        try:
+            os.utime(blob, None)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # 只读 blob 的属主不同等原因无法刷新时，仍可复用
+            return os.path.exists(blob)
+        return True
+
+    def _commit_blob(self, tmp_path: str, sha256: str) -> bool:
+        """将临时文件作为 blob 存入，内容已存在时丢弃临时文件，返回是否新写入"""
+        blob = self.blob_path(sha256)
+        if self._reuse_blob(blob):
+            os.unlink(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, blob)
+        return True
+
+    def _store_member(self, zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> Dict[str, Any]:
+        """计算成员内容的 SHA-256 并存入 blob，返回 {sha256, size, new}"""
+        if info.file_size <= MEMORY_LIMIT:
+            data = zf.read(info)
+            sha256 = hashlib.sha256(data).hexdigest()
+            blob = self.blob_path(sha256)
+            if self._reuse_blob(blob):
+                return {'sha256': sha256, 'size': len(data), 'new': False}
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                new = self._commit_blob(tmp_path, sha256)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            return {'sha256': sha256, 'size': len(data), 'new': new}
+
+        # 大文件边解压边计算哈希，写入临时文件后按哈希重命名
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f, zf.open(info) as src:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+            new = self._commit_blob(tmp_path, sha256)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return {'sha256': sha256, 'size': size, 'new': new}
+
+    def _link(self, sha256: str, target: str) -> None:
+        blob = self.blob_path(sha256)
+        try:
+            os.link(blob, target)
+        except OSError:
+            shutil.copyfile(blob, target)
+
+    def add(
+        self,
+        crx_path: str,
+        extension_id: Optional[str] = None,
+        version: Optional[str] = None,
+        jobs: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """将 CRX/ZIP 文件的内容存入存储，并生成该版本的硬链接目录和清单
+
+        Args:
+            crx_path: CRX 或 ZIP 文件路径
+            extension_id: 版本目录的上级名称，默认使用扩展ID（无法计算时使用文件名）
+            version: 版本目录名称，默认使用 manifest 中的版本号
+            jobs: 并行处理成员的线程数，默认等于 CPU 核心数
+
+        Returns:
+            dict: path、output、extension_id、version、files、bytes、new_blobs、new_bytes、seconds
+        """
+        start = time.perf_counter()
+        with CrxReader(crx_path) as reader, reader.open_zip() as zf:
+            manifest = read_manifest(zf)
+            extension_id = extension_id or archive_extension_id(reader, manifest) \
+                or os.path.splitext(os.path.basename(crx_path))[0]
+            version = version or str(manifest.get('version') or 'unknown')
+
+            members = []
+            for info in zf.infolist():
+                if info.is_dir() or member_path('', info.filename) is None:
+                    continue
+                members.append(info)
+            # 大文件先提交，缩短最后一个线程的尾部耗时
+            members.sort(key=lambda info: info.file_size, reverse=True)
+            with ThreadPoolExecutor(max_workers=max(1, jobs or os.cpu_count() or 1)) as executor:
+                stored = list(executor.map(lambda info: self._store_member(zf, info), members))
+
+        files = {}
+        for info, entry in zip(members, stored):
+            files[info.filename] = {'sha256': entry['sha256'], 'size': entry['size']}
+
+        # 先在临时目录中建立链接树，完成后替换旧的同版本目录
+        output = self.tree_path(extension_id, version)
+        parent = os.path.dirname(output)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+        try:
+            for name, entry in files.items():
+                target = member_path(staging, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if os.path.exists(target):
+                    # 重复的成员名，与 zipfile 一样以后出现的为准
+                    os.unlink(target)
+                self._link(entry['sha256'], target)
+            old = None
+            if os.path.exists(output):
+                old = tempfile.mkdtemp(dir=parent, prefix='.old-')
+                os.rmdir(old)
+                os.rename(output, old)
+            os.rename(staging, output)
+            if old is not None:
+                shutil.rmtree(old, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        record = {
+            'extension_id': extension_id,
+            'version': version,
+            'source': os.path.abspath(crx_path),
+            'created': time.time(),
+            'files': files,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, output + MANIFEST_SUFFIX)
+
+        new_blobs = sum(1 for entry in stored if entry['new'])
+        new_bytes = sum(entry['size'] for entry in stored if entry['new'])
+        total = sum(entry['size'] for entry in files.values())
+        logging.info(f"已存入 {crx_path} -> {output} ({len(files)} 个文件，新内容 {new_blobs} 个)")
+        return {
+            'path': crx_path,
+            'output': output,
+            'extension_id': extension_id,
+            'version': version,
+            'files': len(files),
+            'bytes': total,
+            'new_blobs': new_blobs,
+            'new_bytes': new_bytes,
+            'seconds': time.perf_counter() - start,
+        }
+
+    def manifests(self) -> List[str]:
+        """所有版本清单文件的路径"""
+        paths = []
+        for root, _, names in os.walk(self.tree_dir):
+            for name in names:
+                if name.endswith(MANIFEST_SUFFIX):
+                    paths.append(os.path.join(root, name))
+        return paths
+
+    def remove(self, extension_id: str, version: str) -> bool:
+        """删除一个版本的目录和清单（blob 由 gc() 回收），版本不存在时返回 False"""
+        output = self.tree_path(extension_id, version)
+        manifest = output + MANIFEST_SUFFIX
+        if not os.path.exists(manifest):
+            return False
+        os.unlink(manifest)
+        shutil.rmtree(output, ignore_errors=True)
+        return True
+
+    def gc(self) -> Dict[str, int]:
+        """删除没有被任何版本清单引用的 blob 和残留的临时文件
+
+        修改时间在 GC_GRACE_SECONDS 以内的文件不删除，它们可能属于尚未提交
+        版本清单的 add()。
+
+        Returns:
+            dict: removed（删除的 blob 数）、freed（释放的字节数）、kept（保留的 blob 数）
+        """
+        referenced: Set[str] = set()
+        for path in self.manifests():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+            except (OSError, ValueError) as e:
+                # 无法确认引用关系时不回收任何内容
+                raise RuntimeError(f"读取版本清单失败 {path}: {str(e)}")
+            referenced.update(entry['sha256'] for entry in record['files'].values())
+
+        removed = freed = kept = 0
+        now = time.time()
+        for root, _, names in os.walk(self.blob_dir):
+            for name in names:
+                if name in referenced:
+                    kept += 1
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    if now - st.st_mtime < GC_GRACE_SECONDS:
+                        continue
+                    size = st.st_size
+                    os.unlink(path)
+                except OSError as e:
+                    logging.debug(f"删除 blob 失败 {path}: {str(e)}")
+                    continue
+                removed += 1
+                freed += size
+        if removed:
+            logging.info(f"回收 {removed} 个未引用的 blob，释放 {freed / 1024 / 1024:.2f} MB")
+        return {'removed': removed, 'freed': freed, 'kept': kept}
+
+
+def store_many(
+    store: ContentStore,
+    crx_paths: List[str],
+    jobs: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """依次将多个 CRX/ZIP 文件存入存储，每个文件的成员并行处理
+
+    Returns:
+        List[Dict[str, Any]]: 每个文件的结果，字段与 extract_many 相同，另含 new_blobs、new_bytes
+    """
+    results = []
+    for crx_path in crx_paths:
+        try:
+            result = store.add(crx_path, jobs=jobs)
+            result['error'] = None
+        except Exception as e:
+            logging.error(f"存入失败 {crx_path}: {str(e)}")
+            result = {'path': crx_path, 'output': None, 'files': 0, 'bytes': 0, 'new_blobs': 0,
+                      'new_bytes': 0, 'seconds': 0.0, 'error': str(e)}
+        results.append(result)
+    return results
@@ -0,0 +1,271 @@
+import os
+import json
+import logging
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import quote
+import requests
+from .downloader import HEADERS, extract_extension_id
+from .bulk_downloader import download_many
+from .download_cache import DownloadCache
+from .metadata import read_metadata
+from .utils.network_utils import create_session
+
+# Omaha (gupdate) 更新检查接口，与 DOWNLOAD_URLS 使用同一个服务
+UPDATE_CHECK_URL = "https://clients2.google.com/service/update2/crx"
+
+# 与 DOWNLOAD_URLS 保持一致的浏览器版本
+PRODUCT_VERSION = "102.0.5005.61"
+
+# 每个请求最多携带的扩展数量和 URL 长度
+DEFAULT_BATCH_SIZE = 100
+MAX_URL_LENGTH = 8000
+
+
+def build_update_urls(
+    extension_ids: Iterable[str],
+    endpoint: str = UPDATE_CHECK_URL,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> List[str]:
+    """将扩展ID分批拼接为更新检查请求，每个扩展一个 x= 参数
+
+    版本号固定发送 0.0.0.0，使服务器总是返回最新版本号，再由调用方与本地
+    清单比较。单个 URL 超过 MAX_URL_LENGTH 时提前分批。
+    """
+    base = f"{endpoint}?acceptformat=crx2,crx3&prodversion={PRODUCT_VERSION}"
+    urls = []
+    current = base
+    count = 0
+    for extension_id in extension_ids:
+        param = '&x=' + quote(f"id={extension_id}&v=0.0.0.0&installsource=ondemand&uc", safe='')
+        if count and (count >= batch_size or len(current) + len(param) > MAX_URL_LENGTH):
+            urls.append(current)
+            current = base
+            count = 0
+        current += param
+        count += 1
+    if count:
+        urls.append(current)
+    return urls
+
+
+def parse_gupdate(xml_text: str) -> Dict[str, Dict[str, Any]]:
+    """解析 gupdate XML 响应
+
+    Returns:
+        dict: 扩展ID -> {status, version, codebase, size, hash_sha256}
+    """
+    root = ET.fromstring(xml_text)
+    results = {}
+    for app in root.iter():
+        if not app.tag.endswith('app'):
+            continue
+        extension_id = (app.get('appid') or '').lower()
+        if not extension_id:
+            continue
+        entry = {'status': app.get('status', 'ok'), 'version': None, 'codebase': None, 'size': None, 'hash_sha256': None}
+        for check in app:
+            if not check.tag.endswith('updatecheck'):
+                continue
+            status = check.get('status')
+            if entry['status'] == 'ok' and status:
+                entry['status'] = status
+            entry['version'] = check.get('version')
+            entry['codebase'] = check.get('codebase')
+            size = check.get('size')
+            entry['size'] = int(size) if size and size.isdigit() else None
+            entry['hash_sha256'] = check.get('hash_sha256')
+        results[extension_id] = entry
+    return results
+
+
+def check_updates(
+    extension_ids: Iterable[str],
+    session: Optional[requests.Session] = None,
+    endpoint: str = UPDATE_CHECK_URL,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, Dict[str, Any]]:
+    """批量查询扩展的最新版本
+
+    Args:
+        extension_ids: 扩展ID列表
+        session: 复用连接的 requests.Session
+        endpoint: 更新检查接口地址
+        batch_size: 每个请求最多携带的扩展数量
+
+    Returns:
+        dict: 扩展ID -> 查询结果，请求失败的批次中的扩展 status 为 error
+    """
+    extension_ids = list(dict.fromkeys(extension_ids))
+    http = session if session is not None else requests
+    results = {}
+    urls = build_update_urls(extension_ids, endpoint, batch_size)
+    logging.info(f"检查 {len(extension_ids)} 个扩展的更新，共 {len(urls)} 个请求")
+    start = 0
+    for url in urls:
+        batch = extension_ids[start:start + url.count('&x=')]
+        start += len(batch)
+        try:
+            response = http.get(url, headers=HEADERS, timeout=30)
+            with response:
+                response.raise_for_status()
+                parsed = parse_gupdate(response.text)
+        except (requests.RequestException, ET.ParseError) as e:
+            logging.error(f"更新检查请求失败: {str(e)}")
+            parsed = {}
+            for extension_id in batch:
+                results[extension_id] = {'status': 'error', 'version': None, 'codebase': None,
+                                         'size': None, 'hash_sha256': None, 'error': str(e)}
+        results.update(parsed)
+        for extension_id in batch:
+            if extension_id not in results:
+                results[extension_id] = {'status': 'missing', 'version': None, 'codebase': None,
+                                         'size': None, 'hash_sha256': None}
+    return results
+
+
+def load_inventory(path: str) -> Dict[str, Dict[str, Any]]:
+    """读取本地清单（扩展ID -> {version, path}），文件不存在时返回空清单"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_inventory(path: str, inventory: Dict[str, Dict[str, Any]]) -> None:
+    """原子写入本地清单"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(inventory, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def update_extensions(
+    inventory_path: str,
+    output_dir: str,
+    extension_ids: Optional[Iterable[str]] = None,
+    check_only: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    endpoint: str = UPDATE_CHECK_URL,
+    workers: int = 16,
+    per_host: Optional[int] = 8,
+    no_verify: bool = False,
+    cache: Optional[DownloadCache] = None
+) -> Dict[str, Any]:
+    """检查清单中扩展的最新版本，只下载版本发生变化的扩展并更新清单
+
+    有新版本的扩展直接从更新检查返回的 codebase 下载，并用 hash_sha256 校验；
+    没有 codebase 时回退到 DOWNLOAD_URLS。清单记录的是下载到的 CRX 中
+    manifest 的版本号，而不是更新检查宣称的版本号。
+
+    Args:
+        inventory_path: 本地清单文件路径
+        output_dir: 输出目录路径
+        extension_ids: 额外检查的扩展ID或URL，会加入清单
+        check_only: 只检查不下载
+        batch_size: 每个更新检查请求最多携带的扩展数量
+        endpoint: 更新检查接口地址
+        workers: 并发下载的线程数
+        per_host: 每个主机的最大并发请求数
+        no_verify: 是否跳过签名验证
+        cache: 下载缓存
+
+    Returns:
+        dict: checks 为每个扩展的检查结果，changed 为需要更新的扩展ID，
+        download 为 download_many 的统计（check_only 时为None）
+    """
+    inventory = load_inventory(inventory_path)
+    ids = list(inventory)
+    for target in extension_ids or []:
+        extension_id = extract_extension_id(target)
+        if not extension_id:
+            logging.warning(f"无法识别的扩展ID: {target}")
+        elif extension_id not in inventory:
+            ids.append(extension_id)
+    ids = list(dict.fromkeys(ids))
+
+    session = create_session(pool_size=max(1, workers), per_host=per_host)
+    try:
+        remote = check_updates(ids, session=session, endpoint=endpoint, batch_size=batch_size)
+        checks = []
+        changed = []
+        for extension_id in ids:
+            info = remote.get(extension_id, {})
+            local_version = inventory.get(extension_id, {}).get('version')
+            remote_version = info.get('version')
+            update = bool(remote_version) and remote_version != local_version
+            checks.append({
+                'id': extension_id,
+                'local_version': local_version,
+                'remote_version': remote_version,
+                'status': info.get('status'),
+                'update': update,
+            })
+            if update:
+                changed.append(extension_id)
+        logging.info(f"{len(changed)}/{len(ids)} 个扩展有新版本")
+
+        download = None
+        if changed and not check_only:
+            sources = {}
+            for extension_id in changed:
+                info = remote[extension_id]
+                source = {}
+                if info.get('codebase'):
+                    source['download_urls'] = [info['codebase']]
+                if info.get('hash_sha256'):
+                    source['expected_sha256'] = info['hash_sha256']
+                sources[extension_id] = source
+            download = download_many(
+                changed, output_dir, workers=workers, session=session, no_verify=no_verify, cache=cache,
+                sources=sources
+            )
+            for result in download['results']:
+                if result['error']:
+                    continue
+                extension_id = result['target']
+                try:
+                    version = read_metadata(result['output'])['version']
+                except Exception as e:
+                    logging.warning(f"无法读取下载文件的版本号 {result['output']}: {str(e)}")
+                    result['error'] = f"无法读取版本号: {str(e)}"
+                    download['succeeded'] -= 1
+                    download['failed'] += 1
+                    continue
+                if version != remote[extension_id]['version']:
+                    logging.warning(
+                        f"{extension_id} 下载到的版本 {version} 与更新检查返回的 "
+                        f"{remote[extension_id]['version']} 不一致"
+                    )
+                inventory[extension_id] = {'version': version, 'path': result['output']}
+        for extension_id in ids:
+            inventory.setdefault(extension_id, {'version': None, 'path': None})
+        if not check_only:
+            save_inventory(inventory_path, inventory)
+    finally:
+        session.close()
+    return {'checks': checks, 'changed': changed, 'download': download}
+
+
+def format_update_report(result: Dict[str, Any]) -> str:
+    """生成更新检查报告"""
+    lines = []
+    for check in result['checks']:
+        mark = '*' if check['update'] else ' '
+        lines.append(
+            f"{mark} {check['id']}  {check['local_version'] or '-':>12} -> "
+            f"{check['remote_version'] or '-':<12}  {check['status']}"
+        )
+    download = result['download']
+    summary = f"检查 {len(result['checks'])} 个扩展，{len(result['changed'])} 个有新版本"
+    if download is not None:
+        summary += f"，下载成功 {download['succeeded']}/{download['total']}"
+    lines.append(summary)
+    return '\n'.join(lines)
@@ -1,5 +1,8 @@
+import threading
 import requests
-from typing import Optional
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 
 def download_file(url: str, output_path: str, timeout: Optional[int] = 30) -> None:
     """
@@ -15,4 +18,78 @@ def download_file(url: str, output_path: str, timeout: Optional[int] = 30) -> No
     
     with open(output_path, 'wb') as f:
         for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk) 
\ No newline at end of file
+            f.write(chunk) 
+
+
+class HostLimitedSession(requests.Session):
+    """
+    A requests.Session that caps the number of in-flight requests per host
+    
+    The slot for a streamed response is held until the response is closed,
+    so callers must close streamed responses (e.g. use them as context managers).
+    
+    Args:
+        per_host: Maximum concurrent requests per host, None for no limit
+    """
+    
+    def __init__(self, per_host: Optional[int] = None):
+        super().__init__()
+        self.per_host = per_host
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._semaphores_lock = threading.Lock()
+    
+    def _semaphore(self, url: str) -> Optional[threading.BoundedSemaphore]:
+        if not self.per_host:
+            return None
+        host = urlparse(url).netloc.lower()
+        with self._semaphores_lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+    
+    def request(self, method, url, *args, **kwargs):
+        semaphore = self._semaphore(url)
+        if semaphore is None:
+            return super().request(method, url, *args, **kwargs)
+        semaphore.acquire()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except BaseException:
+            semaphore.release()
+            raise
+        if not kwargs.get('stream'):
+            semaphore.release()
+            return response
+        
+        # Release the slot exactly once, when the streamed body is closed
+        original_close = response.close
+        released = []
+        
+        def close():
+            try:
+                original_close()
+            finally:
+                if not released:
+                    released.append(True)
+                    semaphore.release()
+        
+        response.close = close
+        return response
+
+
+def create_session(pool_size: int = 10, per_host: Optional[int] = None) -> requests.Session:
+    """
+    Create a thread-safe pooled session for concurrent downloads
+    
+    Args:
+        pool_size: Number of keep-alive connections kept per host
+        per_host: Maximum concurrent requests per host, None for no limit
+        
+    Returns:
+        requests.Session: Session sharing TCP/TLS connections across requests
+    """
+    session = HostLimitedSession(per_host=per_host)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
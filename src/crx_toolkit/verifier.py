@@ -0,0 +1,204 @@
+import os
+import struct
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.asymmetric import utils as asym_utils
+from .crx3 import (
+    CRX_MAGIC, decode_header, signature_prefix, crx_id_from_public_key, extension_id_from_crx_id
+)
+
+# 流式读取的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 头部字段的合理上限，防止恶意文件导致大量内存分配
+MAX_HEADER_SIZE = 16 * 1024 * 1024
+
+
+def _hash_stream(f, digest, chunk_size: int = CHUNK_SIZE) -> int:
+    """从当前位置读到文件末尾，送入 digest，返回读取的字节数"""
+    total = 0
+    for chunk in iter(lambda: f.read(chunk_size), b''):
+        digest.update(chunk)
+        total += len(chunk)
+    return total
+
+
+def _verify_proof(public_key_der: bytes, signature: bytes, digest: bytes, algorithm: hashes.HashAlgorithm) -> bool:
+    try:
+        public_key = serialization.load_der_public_key(public_key_der)
+        if isinstance(public_key, rsa.RSAPublicKey):
+            public_key.verify(signature, digest, padding.PKCS1v15(), asym_utils.Prehashed(algorithm))
+        elif isinstance(public_key, ec.EllipticCurvePublicKey):
+            public_key.verify(signature, digest, ec.ECDSA(asym_utils.Prehashed(algorithm)))
+        else:
+            return False
+        return True
+    except (InvalidSignature, ValueError, TypeError):
+        return False
+
+
+def _verify_crx3(f, result: Dict[str, Any]) -> None:
+    header_size = struct.unpack('<I', f.read(4))[0]
+    if header_size > MAX_HEADER_SIZE:
+        raise ValueError(f"CRX3 头部长度异常: {header_size}")
+    header = f.read(header_size)
+    if len(header) != header_size:
+        raise ValueError("CRX3 头部不完整")
+    parsed = decode_header(header)
+    result['archive_offset'] = 12 + header_size
+
+    digest = hashes.Hash(hashes.SHA256())
+    digest.update(signature_prefix(parsed['signed_header_data']))
+    _hash_stream(f, digest)
+    digest_value = digest.finalize()
+
+    crx_id = parsed['crx_id']
+    proofs = [(pk, sig, 'rsa') for pk, sig in parsed['sha256_with_rsa']]
+    proofs += [(pk, sig, 'ecdsa') for pk, sig in parsed['sha256_with_ecdsa']]
+    if not proofs:
+        result['errors'].append("CRX3 头部不包含签名证明")
+    developer_key_ok = False
+    for public_key_der, signature, kind in proofs:
+        ok = _verify_proof(public_key_der, signature, digest_value, hashes.SHA256())
+        result['proofs'].append({'type': kind, 'valid': ok})
+        if not ok:
+            result['errors'].append(f"{kind} 签名校验失败")
+        elif crx_id is not None and crx_id_from_public_key(public_key_der) == crx_id:
+            developer_key_ok = True
+    if crx_id is None:
+        result['errors'].append("CRX3 头部缺少 crx_id")
+    else:
+        result['extension_id'] = extension_id_from_crx_id(crx_id)
+        if proofs and not developer_key_ok:
+            result['errors'].append("没有与 crx_id 对应的有效开发者签名")
+    result['signature_valid'] = bool(proofs) and developer_key_ok and all(p['valid'] for p in result['proofs'])
+
+
+def _verify_crx2(f, result: Dict[str, Any]) -> None:
+    public_key_size, signature_size = struct.unpack('<II', f.read(8))
+    if public_key_size > MAX_HEADER_SIZE or signature_size > MAX_HEADER_SIZE:
+        raise ValueError("CRX2 头部长度异常")
+    public_key_der = f.read(public_key_size)
+    signature = f.read(signature_size)
+    result['archive_offset'] = 16 + public_key_size + signature_size
+
+    digest = hashes.Hash(hashes.SHA1())
+    _hash_stream(f, digest)
+    ok = _verify_proof(public_key_der, signature, digest.finalize(), hashes.SHA1())
+    result['proofs'].append({'type': 'rsa-sha1', 'valid': ok})
+    if not ok:
+        result['errors'].append("CRX2 签名校验失败")
+    result['extension_id'] = extension_id_from_crx_id(crx_id_from_public_key(public_key_der))
+    result['signature_valid'] = ok
+
+
+def _verify_members(path: str, result: Dict[str, Any]) -> None:
+    """逐个解压成员并校验 CRC-32，只占用固定大小的缓冲区"""
+    bad = []
+    with zipfile.ZipFile(path, 'r') as zf:
+        infos = zf.infolist()
+        for info in infos:
+            if info.is_dir():
+                continue
+            try:
+                with zf.open(info) as member:
+                    while member.read(CHUNK_SIZE):
+                        pass
+            except (zipfile.BadZipFile, OSError, EOFError, NotImplementedError) as e:
+                bad.append(info.filename)
+                result['errors'].append(f"成员校验失败 {info.filename}: {str(e)}")
+    result['files'] = len(infos)
+    result['zip_valid'] = not bad
+
+
+def verify_crx(path: str, check_members: bool = True) -> Dict[str, Any]:
+    """校验单个 CRX 文件的签名和 ZIP 完整性
+
+    按 CRX2/CRX3 规范解析头部，用流式哈希校验签名，从公钥推导扩展ID，
+    并检查每个 ZIP 成员的 CRC-32。内存占用与文件大小无关。
+
+    Args:
+        path: CRX 文件路径
+        check_members: 是否校验每个成员的 CRC-32
+
+    Returns:
+        dict: 校验结果，valid 为 True 表示签名和内容均有效
+    """
+    result = {
+        'path': path,
+        'valid': False,
+        'format_version': None,
+        'extension_id': None,
+        'signature_valid': False,
+        'zip_valid': None,
+        'proofs': [],
+        'files': None,
+        'size': None,
+        'errors': [],
+    }
+    try:
+        result['size'] = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            magic = f.read(4)
+            if magic != CRX_MAGIC:
+                raise ValueError("不是有效的 CRX 文件（魔数不匹配）")
+            version = struct.unpack('<I', f.read(4))[0]
+            result['format_version'] = version
+            if version == 3:
+                _verify_crx3(f, result)
+            elif version == 2:
+                _verify_crx2(f, result)
+            else:
+                raise ValueError(f"不支持的 CRX 版本: {version}")
+        if check_members:
+            _verify_members(path, result)
+    except Exception as e:
+        result['errors'].append(str(e))
+    result['valid'] = result['signature_valid'] and result['zip_valid'] is not False and not result['errors']
+    return result
+
+
+def find_crx_files(paths: Iterable[str]) -> List[str]:
+    """将文件和目录展开为 CRX 文件列表，目录会递归查找 *.crx"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith('.crx'):
+                        files.append(os.path.join(root, name))
+        else:
+            files.append(path)
+    return files
+
+
+def verify_many(
+    paths: Iterable[str],
+    jobs: Optional[int] = None,
+    check_members: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """在进程池中并行校验多个 CRX 文件，按输入顺序产出结果
+
+    Args:
+        paths: CRX 文件或目录列表
+        jobs: 工作进程数，默认等于 CPU 核心数
+        check_members: 是否校验每个成员的 CRC-32
+
+    Yields:
+        dict: 每个文件的校验结果
+    """
+    files = find_crx_files(paths)
+    if not files:
+        return
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(files)))
+    if jobs == 1:
+        for path in files:
+            yield verify_crx(path, check_members)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, min(64, len(files) // (jobs * 4)))
+        yield from executor.map(verify_crx, files, [check_members] * len(files), chunksize=chunksize)
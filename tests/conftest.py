@@ -0,0 +1,14 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+# 未安装包时直接从 src 导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# downloader 和 packer 把日志文件写在工作目录中（downloader 在导入时即创建），
+# 测试在临时目录中运行，避免在仓库中留下日志
+_workdir = tempfile.mkdtemp(prefix='crx-toolkit-tests-')
+os.chdir(_workdir)
+atexit.register(shutil.rmtree, _workdir, True)
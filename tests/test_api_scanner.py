@@ -0,0 +1,45 @@
+from collections import Counter
+import pytest
+from crx_toolkit.api_scanner import scan, permission_report
+
+
+def _scan(source: str) -> dict:
+    counts = Counter()
+    scan(source.encode('utf-8'), counts)
+    return dict(counts)
+
+
+@pytest.mark.parametrize('source, expected', [
+    # 模板字符串的 ${} 表达式按代码扫描，文本部分跳过
+    ('x = `${chrome.history.search({})}`', {'chrome.history.search': 1}),
+    ('x = `chrome.tabs.query ${ {a: 1}.a } ${chrome.cookies.get()}` + chrome.alarms.create()',
+     {'chrome.cookies.get': 1, 'chrome.alarms.create': 1}),
+    ('x = `${`${chrome.bookmarks.get()}`}`; chrome.idle.queryState()',
+     {'chrome.bookmarks.get': 1, 'chrome.idle.queryState': 1}),
+    ('x = `\\${chrome.tabs.query()}`', {}),
+    # 关键字之后的 / 开始正则字面量
+    ("return/'/.test(s)&&chrome.history.search({})", {'chrome.history.search': 1}),
+    ('if (x) {}\n/"/.test(s); chrome.tabs.query()', {'chrome.tabs.query': 1}),
+    ("typeof /'/ && chrome.storage.local.get()", {'chrome.storage.local': 1}),
+    # 除号不是正则字面量
+    ('a = b / 2; c = chrome.tabs.query() / 3', {'chrome.tabs.query': 1}),
+    ('index/2/chrome.alarms.get()', {'chrome.alarms.get': 1}),
+    # 注释和字符串中的名称不计入
+    ('// chrome.history.search\n"chrome.tabs.query" /* chrome.cookies.get */', {}),
+    # 只引用命名空间
+    ('const p = chrome.devtools.panels; p.create()', {'chrome.devtools.panels': 1}),
+    ('const t = browser.tabs;', {'chrome.tabs': 1}),
+    ('chrome.devtools.unknown', {}),
+    ('chrome["storage"]?.sync.get()', {'chrome.storage.sync': 1}),
+])
+def test_scan_edge_cases(source, expected):
+    assert _scan(source) == expected
+
+
+def test_web_request_blocking_does_not_satisfy_web_request():
+    """webRequestBlocking 不能替代 webRequest 权限"""
+    apis = {}
+    scan(b'chrome.webRequest.onBeforeRequest.addListener(f)', Counter(), apis)
+    report = permission_report(['webRequestBlocking'], apis)
+    assert report['undeclared'] == {'webRequest': ['chrome.webRequest.onBeforeRequest']}
+    assert permission_report(['webRequest', 'webRequestBlocking'], apis)['undeclared'] == {}
@@ -0,0 +1,48 @@
+import os
+import zipfile
+from crx_toolkit.archive import write_zip, recorded_level
+from crx_toolkit.compression import CompressionPolicy
+
+
+def _build(tmp_path, name, entries, previous=None, level=None, jobs=1):
+    output = str(tmp_path / name)
+    with open(output, 'wb') as f:
+        write_zip(f, entries, previous=previous, jobs=jobs, policy=CompressionPolicy(level=level))
+    return output
+
+
+def _entries(tmp_path):
+    entries = []
+    for name, content in (('a.js', 'AAAA' * 1000), ('b.js', 'BBBB' * 1000)):
+        path = tmp_path / name
+        path.write_text(content)
+        entries.append((name, str(path)))
+    return entries
+
+
+def test_same_size_edit_within_dos_time_resolution_is_not_reused(tmp_path):
+    """大小不变、mtime 只差 1 毫秒的修改不能复用旧的压缩数据"""
+    entries = _entries(tmp_path)
+    first = _build(tmp_path, '1.zip', entries)
+    path = entries[0][1]
+    st = os.stat(path)
+    with open(path, 'w') as f:
+        f.write('CCCC' * 1000)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000))
+    for jobs in (1, 4):
+        second = _build(tmp_path, f'2-{jobs}.zip', entries, previous=first, jobs=jobs)
+        with zipfile.ZipFile(second) as zf:
+            assert zf.read('a.js') == b'CCCC' * 1000
+            assert zf.testzip() is None
+
+
+def test_level_change_recompresses(tmp_path):
+    """级别变化（包括标志位相同的 6 -> 4）时重新压缩，级别不变时复用"""
+    entries = _entries(tmp_path)
+    first = _build(tmp_path, '1.zip', entries, level=6)
+    second = _build(tmp_path, '2.zip', entries, previous=first, level=4)
+    with zipfile.ZipFile(second) as zf:
+        assert [recorded_level(info.extra) for info in zf.infolist()] == [4, 4]
+    third = _build(tmp_path, '3.zip', entries, previous=second, level=4, jobs=4)
+    with open(second, 'rb') as a, open(third, 'rb') as b:
+        assert a.read() == b.read()
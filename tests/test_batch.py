@@ -0,0 +1,27 @@
+import os
+from crx_toolkit.batch import resolve_sources, pack_all
+
+
+def _extension(path):
+    path.mkdir()
+    (path / 'manifest.json').write_text('{"name": "e", "version": "1.0", "manifest_version": 3}')
+    (path / 'bg.js').write_text('console.log(1);\n')
+    return path
+
+
+def test_resolve_sources_dedupes_every_form(tmp_path):
+    """同一目录的不同写法（包括不存在的目录）只保留一次"""
+    ext = _extension(tmp_path / 'ext')
+    missing = tmp_path / 'missing'
+    sources = [str(ext), str(ext) + os.sep, str(ext / 'manifest.json'), str(missing), str(missing) + os.sep]
+    assert resolve_sources(sources) == [str(ext), str(missing)]
+
+
+def test_pack_all_keeps_one_result_per_source(tmp_path):
+    """结果按输入顺序一一对应，失败不会被同名结果覆盖"""
+    ext = _extension(tmp_path / 'ext')
+    missing = tmp_path / 'missing'
+    results = pack_all([str(missing), str(ext), str(missing)], str(tmp_path / 'out'), processes=2, use_zip=True)
+    assert [r['source'] for r in results] == [str(missing), str(ext)]
+    assert results[0]['error']
+    assert results[1]['error'] is None and os.path.isfile(results[1]['output'])
@@ -0,0 +1,33 @@
+import json
+import logging
+import zipfile
+import pytest
+from crx_toolkit.cli import main
+
+
+@pytest.fixture(autouse=True)
+def restore_logging():
+    """main 会替换根日志处理器，测试结束后恢复"""
+    handlers = logging.root.handlers[:]
+    yield
+    for handler in logging.root.handlers[:]:
+        handler.close()
+        logging.root.removeHandler(handler)
+    for handler in handlers:
+        logging.root.addHandler(handler)
+
+
+def test_analyze_stdout_is_pure_jsonl(tmp_path, monkeypatch, capsys):
+    """清理旧日志的提示不能混入写到标准输出的 JSONL"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'crx_download.log').write_text('old')
+    archive = tmp_path / 'ext.zip'
+    with zipfile.ZipFile(str(archive), 'w') as zf:
+        zf.writestr('manifest.json', '{"name": "t", "version": "1.0", "manifest_version": 3}')
+        zf.writestr('bg.js', 'chrome.tabs.query({});')
+    assert main(['analyze', str(archive), '-j', '1']) == 0
+    out, err = capsys.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])['path'].endswith('ext.zip')
+    assert 'crx_download.log' in err
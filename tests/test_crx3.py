@@ -0,0 +1,58 @@
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from crx_toolkit.crx3 import extension_id_from_public_key, KeySigner
+from crx_toolkit.crx_reader import CrxReader
+from crx_toolkit.packer import write_crx
+from crx_toolkit.verifier import verify_crx
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def entries(tmp_path):
+    files = {'manifest.json': '{"name": "t", "version": "1.0", "manifest_version": 3}', 'bg.js': 'chrome.tabs.query({});\n' * 100}
+    result = []
+    for name, content in files.items():
+        path = tmp_path / name
+        path.write_text(content)
+        result.append((name, str(path)))
+    return result
+
+
+def test_pack_then_verify(tmp_path, entries, private_key):
+    """write_crx 生成的 CRX3 能通过签名和成员校验，扩展ID 与私钥一致"""
+    output = str(tmp_path / 'out.crx')
+    write_crx(output, entries, private_key=private_key, jobs=2)
+    result = verify_crx(output)
+    assert result['valid'], result['errors']
+    assert result['format_version'] == 3
+    expected_id = extension_id_from_public_key(KeySigner(private_key).public_key_der)
+    assert result['extension_id'] == expected_id
+    with CrxReader(output) as reader, reader.open_zip() as zf:
+        assert zf.read('bg.js') == (tmp_path / 'bg.js').read_bytes()
+
+
+def test_tampered_payload_fails_verification(tmp_path, entries, private_key):
+    """修改签名后的 ZIP 数据会使签名校验失败"""
+    output = tmp_path / 'out.crx'
+    write_crx(str(output), entries, private_key=private_key)
+    data = bytearray(output.read_bytes())
+    data[-30] ^= 0xff
+    output.write_bytes(bytes(data))
+    result = verify_crx(str(output))
+    assert not result['valid']
+    assert not result['signature_valid']
+
+
+def test_unsigned_crx_has_no_proofs(tmp_path, entries):
+    """不提供私钥时写出不含签名证明的 CRX3，内容可读但校验不通过"""
+    output = str(tmp_path / 'out.crx')
+    write_crx(output, entries)
+    with CrxReader(output) as reader, reader.open_zip() as zf:
+        assert sorted(zf.namelist()) == ['bg.js', 'manifest.json']
+    result = verify_crx(output)
+    assert result['format_version'] == 3
+    assert not result['valid']
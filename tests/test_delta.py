@@ -0,0 +1,82 @@
+import hashlib
+import zipfile
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from crx_toolkit.crx_reader import CrxReader
+from crx_toolkit.delta import make_delta, apply_delta
+from crx_toolkit.verifier import verify_crx
+
+SCRIPT = b''.join(b'function f%d() { return chrome.tabs.query({index: %d}); }\n' % (i, i) for i in range(2000))
+
+
+def _zip(path, files):
+    with zipfile.ZipFile(str(path), 'w') as zf:
+        for name, (content, compress_type) in files.items():
+            zf.writestr(name, content, compress_type=compress_type)
+    return str(path)
+
+
+@pytest.fixture
+def versions(tmp_path):
+    old = _zip(tmp_path / 'old.zip', {
+        'manifest.json': (b'{"name": "t", "version": "1.0"}', zipfile.ZIP_STORED),
+        'bg.js': (SCRIPT, zipfile.ZIP_DEFLATED),
+        'icon.png': (bytes(range(256)) * 64, zipfile.ZIP_DEFLATED),
+    })
+    new = _zip(tmp_path / 'new.zip', {
+        'manifest.json': (b'{"name": "t", "version": "1.1"}', zipfile.ZIP_STORED),
+        'bg.js': (SCRIPT.replace(b'index: 1000', b'index: -1'), zipfile.ZIP_DEFLATED),
+        'icon.png': (bytes(range(256)) * 64, zipfile.ZIP_DEFLATED),
+        'added.js': (b'chrome.storage.local.get();\n' * 50, zipfile.ZIP_DEFLATED),
+    })
+    return old, new
+
+
+@pytest.mark.parametrize('recompress', [True, False])
+def test_apply_delta_rebuilds_identical_bytes(tmp_path, versions, recompress):
+    """make-delta -> apply-delta 重建的 ZIP 与新版本逐字节相同"""
+    old, new = versions
+    patch = str(tmp_path / 'p.crxdelta')
+    make_delta(old, new, patch, recompress=recompress)
+    output = str(tmp_path / 'rebuilt.zip')
+    result = apply_delta(old, patch, output)
+    with open(new, 'rb') as f:
+        expected = f.read()
+    with open(output, 'rb') as f:
+        assert f.read() == expected
+    assert result['sha256'] == hashlib.sha256(expected).hexdigest()
+    assert not (tmp_path / 'rebuilt.zip.tmp').exists()
+
+
+def test_apply_delta_signed_output(tmp_path, versions):
+    """提供私钥时输出有效的 CRX3，负载与新版本相同"""
+    old, new = versions
+    patch = str(tmp_path / 'p.crxdelta')
+    make_delta(old, new, patch)
+    output = str(tmp_path / 'rebuilt.crx')
+    apply_delta(old, patch, output, private_key=rsa.generate_private_key(public_exponent=65537, key_size=2048))
+    assert verify_crx(output)['valid']
+    with CrxReader(output) as reader, open(new, 'rb') as f:
+        assert bytes(reader.payload()) == f.read()
+
+
+def test_apply_delta_in_place(tmp_path, versions):
+    """输出路径就是旧版本文件时，先完整重建再替换"""
+    old, new = versions
+    patch = str(tmp_path / 'p.crxdelta')
+    make_delta(old, new, patch)
+    apply_delta(old, patch, old)
+    with open(old, 'rb') as f, open(new, 'rb') as g:
+        assert f.read() == g.read()
+
+
+def test_apply_delta_mismatch_keeps_existing_output(tmp_path, versions):
+    """补丁与旧版本不匹配时不改动已有的输出文件"""
+    old, new = versions
+    patch = str(tmp_path / 'p.crxdelta')
+    make_delta(old, new, patch)
+    output = tmp_path / 'out.zip'
+    output.write_bytes(b'previous')
+    with pytest.raises(ValueError):
+        apply_delta(new, patch, str(output))
+    assert output.read_bytes() == b'previous'
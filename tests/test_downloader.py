@@ -0,0 +1,148 @@
+import io
+import os
+import zipfile
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+from cryptography.hazmat.primitives.asymmetric import rsa
+from crx_toolkit import downloader
+from crx_toolkit.download_cache import DownloadCache
+from crx_toolkit.crx3 import KeySigner, extension_id_from_public_key
+from crx_toolkit.packer import write_crx
+
+URL = 'https://mirror.example/crx'
+OTHER_URL = 'https://other.example/crx'
+ETAG = '"v1"'
+
+
+class FakeSession:
+    """按 URL 返回固定内容的 requests.Session 替身
+
+    statuses 指定各链接的状态码（默认 200）；带匹配 If-None-Match 的请求返回 304。
+    requests 记录每个请求的 (方法, 链接, 请求头)。
+    """
+
+    def __init__(self, body: bytes, statuses=None):
+        self.body = body
+        self.statuses = statuses or {}
+        self.requests = []
+
+    def _response(self, method: str, url: str, headers, body: bytes) -> requests.Response:
+        self.requests.append((method, url, dict(headers or {})))
+        response = requests.Response()
+        response.status_code = self.statuses.get(url, 200)
+        if response.status_code == 200 and (headers or {}).get('If-None-Match') == ETAG:
+            response.status_code = 304
+        if response.status_code != 200:
+            body = b''
+        response.headers = CaseInsensitiveDict({'content-type': 'application/x-chrome-extension',
+                                                'content-length': str(len(body)), 'etag': ETAG})
+        response.raw = io.BytesIO(body)
+        response.url = url
+        return response
+
+    def head(self, url, headers=None, **kwargs):
+        return self._response('HEAD', url, headers, b'')
+
+    def get(self, url, headers=None, **kwargs):
+        return self._response('GET', url, headers, self.body)
+
+
+@pytest.fixture(scope='module')
+def keys():
+    return [rsa.generate_private_key(public_exponent=65537, key_size=2048) for _ in range(2)]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'manifest.json'
+    path.write_text('{"name": "t", "version": "1.0", "manifest_version": 3}' + ' ' * 200)
+    return [('manifest.json', str(path))]
+
+
+@pytest.fixture(autouse=True)
+def single_mirror(monkeypatch):
+    monkeypatch.setattr(downloader, 'DOWNLOAD_URLS', [URL])
+
+
+def _crx(tmp_path, source, key) -> bytes:
+    output = tmp_path / 'src.crx'
+    write_crx(str(output), source, private_key=key)
+    return output.read_bytes()
+
+
+def _zip(source) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        for name, path in source:
+            zf.write(path, name)
+    return buf.getvalue()
+
+
+def _id(key) -> str:
+    return extension_id_from_public_key(KeySigner(key).public_key_der)
+
+
+def test_accepts_crx_signed_for_requested_id(tmp_path, source, keys):
+    body = _crx(tmp_path, source, keys[0])
+    output = downloader.download_crx(_id(keys[0]), str(tmp_path / 'out'), session=FakeSession(body), retries=0)
+    with open(output, 'rb') as f:
+        assert f.read() == body
+
+
+def test_rejects_crx_of_another_extension(tmp_path, source, keys):
+    """镜像返回其他扩展的有效 CRX 时拒绝"""
+    body = _crx(tmp_path, source, keys[1])
+    with pytest.raises(RuntimeError):
+        downloader.download_crx(_id(keys[0]), str(tmp_path / 'out'), session=FakeSession(body), retries=0)
+
+
+def test_rejects_unsigned_zip_unless_no_verify(tmp_path, source, keys):
+    """未签名的 ZIP 只在 no_verify 时接受"""
+    body = _zip(source)
+    with pytest.raises(RuntimeError):
+        downloader.download_crx(_id(keys[0]), str(tmp_path / 'out'), session=FakeSession(body), retries=0)
+    output = downloader.download_crx(
+        _id(keys[0]), str(tmp_path / 'out'), session=FakeSession(body), retries=0, no_verify=True
+    )
+    with open(output, 'rb') as f:
+        assert f.read() == body
+
+
+def test_cached_output_is_a_separate_copy(tmp_path, source, keys):
+    """304 时输出文件是缓存条目的副本，不共享 inode"""
+    body = _crx(tmp_path, source, keys[0])
+    cache = DownloadCache(str(tmp_path / 'cache'))
+    downloader.download_crx(_id(keys[0]), str(tmp_path / 'first'), session=FakeSession(body), retries=0, cache=cache)
+    session = FakeSession(body)
+    output = downloader.download_crx(_id(keys[0]), str(tmp_path / 'second'), session=session, retries=0, cache=cache)
+    assert cache.hits == 1
+    assert session.requests[0][2].get('If-None-Match') == ETAG
+    entry = cache._entry_path(_id(keys[0]))
+    assert not os.path.samefile(output, entry)
+    with open(output, 'r+b') as f:
+        f.write(b'XXXX')
+    with open(entry, 'rb') as f:
+        assert f.read() == body
+
+
+def test_conditional_headers_only_sent_to_cached_url(tmp_path, source, keys, monkeypatch):
+    """缓存的 ETag 来自 OTHER_URL，不能发给其他镜像"""
+    monkeypatch.setattr(downloader, 'DOWNLOAD_URLS', [URL, OTHER_URL])
+    body = _crx(tmp_path, source, keys[0])
+    cache = DownloadCache(str(tmp_path / 'cache'))
+    downloader.download_crx(
+        _id(keys[0]), str(tmp_path / 'first'), session=FakeSession(body, {URL: 404}), retries=0, cache=cache
+    )
+    assert cache.lookup(_id(keys[0]))['url'] == OTHER_URL
+
+    # 来源链接不可用时退回到其他镜像，其他镜像收到的是无条件请求
+    session = FakeSession(body, {OTHER_URL: 404})
+    output = downloader.download_crx(_id(keys[0]), str(tmp_path / 'second'), session=session, retries=0, cache=cache)
+    assert [url for _, url, _ in session.requests][0] == OTHER_URL
+    for _, url, headers in session.requests:
+        if url != OTHER_URL:
+            assert 'If-None-Match' not in headers and 'If-Modified-Since' not in headers
+    assert any(url == URL for _, url, _ in session.requests)
+    with open(output, 'rb') as f:
+        assert f.read() == body
@@ -0,0 +1,24 @@
+import zipfile
+from crx_toolkit.extractor import extract_many
+
+
+def _zip(path, content: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(str(path), 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('manifest.json', content)
+    return str(path)
+
+
+def test_extract_many_disambiguates_same_basename(tmp_path):
+    """a/foo.crx 和 b/foo.crx 解压到不同目录，互不覆盖"""
+    first = _zip(tmp_path / 'a' / 'foo.crx', b'{"name": "a"}')
+    second = _zip(tmp_path / 'b' / 'foo.crx', b'{"name": "b"}')
+    third = _zip(tmp_path / 'c' / 'foo-2.crx', b'{"name": "c"}')
+    out = tmp_path / 'out'
+    results = extract_many([first, second, third], str(out), jobs=2)
+    assert [r['error'] for r in results] == [None, None, None]
+    outputs = [r['output'] for r in results]
+    assert outputs == [str(out / 'foo'), str(out / 'foo-2'), str(out / 'foo-2-2')]
+    for output, name in zip(outputs, (b'a', b'b', b'c')):
+        with open(f"{output}/manifest.json", 'rb') as f:
+            assert f.read() == b'{"name": "' + name + b'"}'
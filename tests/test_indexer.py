@@ -0,0 +1,25 @@
+from crx_toolkit.indexer import connect, _write_record, query_index
+
+
+def _record(path, version, permissions):
+    return {
+        'path': path, 'size': 1, 'mtime_ns': 1, 'sha256': None, 'extension_id': 'a' * 32,
+        'format_version': 3, 'name': 'ext', 'version': version, 'manifest_version': 3,
+        'description': '', 'manifest': '{}', 'file_count': 0, 'unpacked_size': 0, 'error': None,
+        'permissions': [(p, 'permissions') for p in permissions], 'files': [],
+    }
+
+
+def test_latest_is_selected_before_filters(tmp_path):
+    """旧版本声明了某权限而最新版本没有时，latest 查询不返回旧版本"""
+    db = str(tmp_path / 'index.sqlite')
+    conn = connect(db)
+    with conn:
+        _write_record(conn, _record('/old.crx', '1.9', ['tabs', 'history']))
+        _write_record(conn, _record('/new.crx', '1.10', ['tabs']))
+    conn.close()
+
+    assert [r['path'] for r in query_index(db, permission='history')] == ['/old.crx']
+    assert query_index(db, permission='history', latest=True) == []
+    assert [r['path'] for r in query_index(db, permission='tabs', latest=True)] == ['/new.crx']
+    assert [r['version'] for r in query_index(db, latest=True)] == ['1.10']